@@ -0,0 +1,289 @@
+from abc import ABC, abstractmethod
+from log_setup import get_logger
+from config import settings
+import datetime
+import json
+import os
+import sqlite3
+
+logger = get_logger(__name__)
+
+# Constants
+ACCOUNT_DB_FILE = settings.account_db_file
+LEGACY_ACCOUNT_FILE = "new_account.json"
+# Allowed status transitions; "funding" is the in-flight step of the warm pool
+STATUS_TRANSITIONS = {
+    "created": {"funding", "funded"},
+    "funding": {"created", "funded"},
+    "funded": {"deployed"},
+    "deployed": set(),
+}
+FIELDS = (
+    "address", "parent", "private_key", "public_key", "status", "pooled",
+    "funding_tx_hash", "deployment_tx_hash", "timestamp", "updated_at",
+)
+
+
+def normalize_address(address):
+    if isinstance(address, int):
+        return hex(address)
+    return hex(int(address, 16))
+
+
+def public_account(account_data):
+    # Row without its private key, for every response but the one handing
+    # a new account to its owner
+    return {field: value for field, value in account_data.items() if field != "private_key"}
+
+
+class AccountStore(ABC):
+    # Interface for child-account storage; the request path only relies on
+    # these methods
+
+    @abstractmethod
+    def add(self, account_data, parent=None, pooled=False):
+        pass
+
+    @abstractmethod
+    def add_many(self, accounts, parent=None, pooled=False):
+        pass
+
+    @abstractmethod
+    def get(self, address):
+        pass
+
+    @abstractmethod
+    def latest(self, parent=None):
+        pass
+
+    @abstractmethod
+    def list_by_parent(self, parent):
+        pass
+
+    @abstractmethod
+    def list_pooled(self, status=None):
+        pass
+
+    @abstractmethod
+    def list_by_status(self, status):
+        pass
+
+    @abstractmethod
+    def addresses(self):
+        pass
+
+    @abstractmethod
+    def claim_pooled(self, parent=None):
+        pass
+
+    @abstractmethod
+    def update(self, address, **fields):
+        pass
+
+    @abstractmethod
+    def transition(self, address, to_status, **fields):
+        pass
+
+
+class SQLiteAccountStore(AccountStore):
+    # SQLite in WAL mode with an in-memory read-through cache by address.
+    # Meant for a single app process; the cache is the source of truth for
+    # reads once a row has been loaded
+
+    def __init__(self, db_file=ACCOUNT_DB_FILE):
+        self.db_file = db_file
+        self._conn = None
+        self._cache = {}
+        self._latest = {}
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_file, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS accounts (
+                    address TEXT PRIMARY KEY,
+                    parent TEXT,
+                    private_key TEXT NOT NULL,
+                    public_key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    pooled INTEGER NOT NULL DEFAULT 0,
+                    funding_tx_hash TEXT,
+                    deployment_tx_hash TEXT,
+                    timestamp TEXT,
+                    updated_at TEXT
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accounts_parent ON accounts(parent)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accounts_pool ON accounts(pooled, status)")
+            self._migrate_legacy_file()
+        return self._conn
+
+    def _migrate_legacy_file(self):
+        # One-time import of the old single-account JSON file
+        if not os.path.exists(LEGACY_ACCOUNT_FILE):
+            return
+        try:
+            with open(LEGACY_ACCOUNT_FILE, 'r') as f:
+                account_data = json.load(f)
+            if account_data.get("address") and account_data.get("private_key"):
+                self._insert([account_data], parent=None, pooled=False, ignore_existing=True)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not import {LEGACY_ACCOUNT_FILE}: {e}")
+
+    def _row(self, account_data, parent, pooled):
+        now = datetime.datetime.now().isoformat()
+        return {
+            "address": normalize_address(account_data["address"]),
+            "parent": normalize_address(parent) if parent else account_data.get("parent"),
+            "private_key": account_data["private_key"],
+            "public_key": account_data["public_key"],
+            "status": account_data.get("status", "created"),
+            "pooled": 1 if pooled else 0,
+            "funding_tx_hash": account_data.get("funding_tx_hash"),
+            "deployment_tx_hash": account_data.get("deployment_tx_hash"),
+            "timestamp": account_data.get("timestamp", now),
+            "updated_at": now,
+        }
+
+    def _insert(self, accounts, parent, pooled, ignore_existing=False):
+        rows = [self._row(account_data, parent, pooled) for account_data in accounts]
+        verb = "INSERT OR IGNORE" if ignore_existing else "INSERT"
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                f"{verb} INTO accounts ({', '.join(FIELDS)}) VALUES ({', '.join('?' for _ in FIELDS)})",
+                [tuple(row[field] for field in FIELDS) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        for row in rows:
+            self._cache.pop(row["address"], None)
+            if not row["pooled"]:
+                self._latest[row["parent"]] = row["address"]
+                self._latest[None] = row["address"]
+        return [self.get(row["address"]) for row in rows]
+
+    def add(self, account_data, parent=None, pooled=False):
+        self.conn
+        return self._insert([account_data], parent, pooled)[0]
+
+    def add_many(self, accounts, parent=None, pooled=False):
+        # All accounts are written in a single transaction
+        self.conn
+        return self._insert(accounts, parent, pooled)
+
+    def get(self, address):
+        address = normalize_address(address)
+        account = self._cache.get(address)
+        if account is None:
+            row = self.conn.execute("SELECT * FROM accounts WHERE address = ?", (address,)).fetchone()
+            if row is None:
+                return None
+            account = dict(row)
+            self._cache[address] = account
+        return dict(account)
+
+    def latest(self, parent=None):
+        parent = normalize_address(parent) if parent else None
+        if parent not in self._latest:
+            if parent is None:
+                row = self.conn.execute(
+                    "SELECT address FROM accounts WHERE pooled = 0 ORDER BY rowid DESC LIMIT 1"
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    "SELECT address FROM accounts WHERE pooled = 0 AND parent = ? ORDER BY rowid DESC LIMIT 1",
+                    (parent,)
+                ).fetchone()
+            self._latest[parent] = row["address"] if row else None
+        address = self._latest[parent]
+        return self.get(address) if address else None
+
+    def list_by_parent(self, parent):
+        rows = self.conn.execute(
+            "SELECT * FROM accounts WHERE parent = ? AND pooled = 0 ORDER BY rowid",
+            (normalize_address(parent),)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_pooled(self, status=None):
+        if status is None:
+            rows = self.conn.execute("SELECT * FROM accounts WHERE pooled = 1 ORDER BY rowid").fetchall()
+        else:
+            rows = self.conn.execute(
+                "SELECT * FROM accounts WHERE pooled = 1 AND status = ? ORDER BY rowid", (status,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_by_status(self, status):
+        # Claimed (non-pool) accounts in one status, across all parents
+        rows = self.conn.execute(
+            "SELECT * FROM accounts WHERE pooled = 0 AND status = ? ORDER BY rowid", (status,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def addresses(self):
+        # Every stored address, pooled or not
+        rows = self.conn.execute("SELECT address FROM accounts ORDER BY rowid").fetchall()
+        return [row["address"] for row in rows]
+
+    def claim_pooled(self, parent=None):
+        # Atomically take the oldest funded account out of the warm pool
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT address FROM accounts WHERE pooled = 1 AND status = 'funded' ORDER BY rowid LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            parent = normalize_address(parent) if parent else None
+            conn.execute(
+                "UPDATE accounts SET pooled = 0, parent = ?, updated_at = ? WHERE address = ?",
+                (parent, datetime.datetime.now().isoformat(), row["address"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._cache.pop(row["address"], None)
+        self._latest[parent] = row["address"]
+        self._latest[None] = row["address"]
+        return self.get(row["address"])
+
+    def update(self, address, **fields):
+        address = normalize_address(address)
+        fields["updated_at"] = datetime.datetime.now().isoformat()
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        self.conn.execute(
+            f"UPDATE accounts SET {assignments} WHERE address = ?",
+            (*fields.values(), address)
+        )
+        self._cache.pop(address, None)
+        return self.get(address)
+
+    def transition(self, address, to_status, **fields):
+        # Compare-and-set on status: only succeeds from a status that may move
+        # to to_status, so concurrent workers cannot apply the same step twice
+        address = normalize_address(address)
+        from_statuses = [status for status, targets in STATUS_TRANSITIONS.items() if to_status in targets]
+        fields["status"] = to_status
+        fields["updated_at"] = datetime.datetime.now().isoformat()
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        cursor = self.conn.execute(
+            f"UPDATE accounts SET {assignments} WHERE address = ? AND status IN ({', '.join('?' for _ in from_statuses)})",
+            (*fields.values(), address, *from_statuses)
+        )
+        self._cache.pop(address, None)
+        return cursor.rowcount == 1
+
+
+account_store = SQLiteAccountStore()
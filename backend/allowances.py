@@ -0,0 +1,516 @@
+from batch_transfer import transfer_batch, TOKENS
+from node_client import get_account, get_wallet_account
+from account_store import account_store, normalize_address
+from job_queue import job_queue
+from read_cache import read_cache
+from tx_tracker import tracker
+from log_setup import get_logger
+from config import settings
+import asyncio
+import datetime
+import sqlite3
+import time
+import uuid
+
+logger = get_logger(__name__)
+
+# Constants
+SCHEDULE_DB_FILE = settings.schedule_db_file
+# How often the head is probed; due payouts are settled once per new block
+SCHEDULE_POLL_INTERVAL = settings.schedule_poll_interval
+SCHEDULE_MIN_INTERVAL = settings.schedule_min_interval
+# Schedules settled per block at most; the rest follow on the next one
+SCHEDULE_MAX_DUE = settings.schedule_max_due
+# Missed periods paid at most when catching up after downtime
+SCHEDULE_MAX_CATCH_UP = settings.schedule_max_catch_up
+# Payouts per settlement job; a job sends them in multicalls
+SCHEDULE_JOB_PAYOUTS = settings.schedule_job_payouts
+# Wait before a schedule whose payout failed is tried again
+SCHEDULE_RETRY_DELAY = settings.schedule_retry_delay
+# Consecutive failures after which a schedule is paused
+SCHEDULE_MAX_FAILURES = settings.schedule_max_failures
+ALLOWANCE_JOB_PRIORITY = 0
+CATCH_UP_POLICIES = ("all", "latest")
+SCHEDULE_FIELDS = (
+    "id", "sender", "recipient", "token", "amount", "interval", "next_run", "end_at",
+    "max_runs", "catch_up", "status", "created_at", "updated_at",
+)
+PAYOUT_FIELDS = (
+    "schedule_id", "sender", "recipient", "token", "amount", "periods", "first_due_at",
+    "due_at", "status", "created_at", "updated_at",
+)
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _placeholders(items):
+    return ", ".join("?" for _ in items)
+
+
+class AllowanceScheduler:
+    # One-off and recurring payouts from the treasury or a managed account.
+    # Schedules live in SQLite, indexed by due time. On every new block the
+    # due ones are read with one index range scan and, in one transaction,
+    # turned into payout rows while their next due time moves on; missed
+    # periods (e.g. after downtime) are caught up in a single payout. The
+    # payouts then go to the job queue, one job per sender, which pays them
+    # with transfer_batch: payouts to the same recipient and token are merged
+    # into one transfer and the transfers packed into multicalls, so
+    # thousands of allowances cost a handful of transactions. Failed or
+    # reverted payouts give their periods back to the schedule, which is
+    # retried after SCHEDULE_RETRY_DELAY and paused after
+    # SCHEDULE_MAX_FAILURES failures in a row. A payout is marked "sending"
+    # before it is submitted and never sent twice: one cut short by a
+    # restart is left "interrupted" for review
+
+    def __init__(self, db_file=SCHEDULE_DB_FILE, store=account_store, queue=job_queue):
+        self.db_file = db_file
+        self.store = store
+        self.queue = queue
+        self._conn = None
+        self._task = None
+        self.block_number = None
+        self.ticks = 0
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_file, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS schedules (
+                    id TEXT PRIMARY KEY,
+                    sender TEXT NOT NULL,
+                    recipient TEXT NOT NULL,
+                    token TEXT NOT NULL,
+                    amount REAL NOT NULL,
+                    interval REAL,
+                    next_run REAL NOT NULL,
+                    end_at REAL,
+                    max_runs INTEGER,
+                    runs INTEGER NOT NULL DEFAULT 0,
+                    catch_up TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    retry_at REAL NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at TEXT,
+                    updated_at TEXT
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_schedules_due ON schedules(status, next_run)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_schedules_sender ON schedules(sender, next_run)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_schedules_recipient ON schedules(recipient, next_run)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS payouts (
+                    id INTEGER PRIMARY KEY,
+                    schedule_id TEXT NOT NULL,
+                    sender TEXT NOT NULL,
+                    recipient TEXT NOT NULL,
+                    token TEXT NOT NULL,
+                    amount REAL NOT NULL,
+                    periods INTEGER NOT NULL,
+                    first_due_at REAL NOT NULL,
+                    due_at REAL NOT NULL,
+                    status TEXT NOT NULL,
+                    job_id TEXT,
+                    transaction_hash TEXT,
+                    error TEXT,
+                    created_at TEXT,
+                    updated_at TEXT
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_payouts_schedule ON payouts(schedule_id, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_payouts_status ON payouts(status)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_payouts_tx ON payouts(transaction_hash)")
+        return self._conn
+
+    def start(self):
+        now = datetime.datetime.now().isoformat()
+        interrupted = self.conn.execute(
+            "UPDATE payouts SET status = 'interrupted', error = ?, updated_at = ? WHERE status = 'sending'",
+            ("Stopped while sending; check the sender's history before paying again", now)
+        ).rowcount
+        if interrupted:
+            logger.warning(f"{interrupted} allowance payouts were cut short by a restart and need review")
+        # The tracker starts empty: follow what was submitted before the restart
+        for row in self.conn.execute(
+            "SELECT transaction_hash, sender, COUNT(*) AS payouts FROM payouts "
+            "WHERE status = 'submitted' GROUP BY transaction_hash, sender"
+        ).fetchall():
+            tracker.track(row["transaction_hash"], "allowance", sender_address=row["sender"], payouts=row["payouts"])
+        # Payouts planned right before a restart, before their job was queued
+        orphans = {}
+        for row in self.conn.execute("SELECT id, sender FROM payouts WHERE status = 'pending' AND job_id IS NULL").fetchall():
+            orphans.setdefault(row["sender"], []).append(row["id"])
+        for sender, payout_ids in orphans.items():
+            self._enqueue(sender, payout_ids)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _sender(self, sender):
+        if sender is None:
+            if settings.treasury_address is None:
+                raise ValueError("No treasury wallet configured; give a sender")
+            return settings.treasury_address
+        sender = normalize_address(sender)
+        if sender != settings.treasury_address and self.store.get(sender) is None:
+            raise ValueError(f"Sender {sender} is not a managed account")
+        return sender
+
+    def _schedule_row(self, request, now, created_at):
+        token = request.get("token", "STRK").upper()
+        if token not in TOKENS:
+            raise ValueError(f"Unsupported token: {token}")
+        amount = float(request["amount"])
+        if amount <= 0:
+            raise ValueError("amount must be positive")
+        interval = request.get("interval_seconds")
+        if interval is not None and interval < SCHEDULE_MIN_INTERVAL:
+            raise ValueError(f"interval_seconds must be at least {SCHEDULE_MIN_INTERVAL}")
+        start_at = request.get("start_at") or now
+        if interval is not None and start_at < now - SCHEDULE_MAX_CATCH_UP * interval:
+            raise ValueError(f"start_at is more than {SCHEDULE_MAX_CATCH_UP} intervals ago")
+        end_at = request.get("end_at")
+        if end_at is not None and end_at < start_at:
+            raise ValueError("end_at is before start_at")
+        max_runs = request.get("max_runs")
+        if max_runs is not None and max_runs < 1:
+            raise ValueError("max_runs must be at least 1")
+        catch_up = request.get("catch_up", "all")
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"catch_up must be one of {', '.join(CATCH_UP_POLICIES)}")
+        return {
+            "id": uuid.uuid4().hex,
+            "sender": self._sender(request.get("sender")),
+            "recipient": normalize_address(request["recipient"]),
+            "token": token,
+            "amount": amount,
+            "interval": interval,
+            "next_run": start_at,
+            "end_at": end_at,
+            "max_runs": max_runs,
+            "catch_up": catch_up,
+            "status": "active",
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+    def create(self, requests):
+        # requests: dicts with recipient, amount, and optionally token, sender,
+        # interval_seconds, start_at, end_at (Unix time), max_runs and
+        # catch_up. All are validated first and stored in one transaction
+        now = time.time()
+        created_at = datetime.datetime.now().isoformat()
+        rows = [self._schedule_row(request, now, created_at) for request in requests]
+        if not rows:
+            raise ValueError("No allowances given")
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                f"INSERT INTO schedules ({', '.join(SCHEDULE_FIELDS)}) VALUES ({_placeholders(SCHEDULE_FIELDS)})",
+                [tuple(row[field] for field in SCHEDULE_FIELDS) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"Scheduled {len(rows)} allowances")
+        return [self.get(row["id"]) for row in rows]
+
+    def get(self, schedule_id, payouts=0):
+        row = self.conn.execute("SELECT * FROM schedules WHERE id = ?", (schedule_id,)).fetchone()
+        if row is None:
+            return None
+        schedule = dict(row)
+        if payouts:
+            schedule["payouts"] = [dict(payout) for payout in self.conn.execute(
+                "SELECT * FROM payouts WHERE schedule_id = ? ORDER BY id DESC LIMIT ?", (schedule_id, payouts)
+            ).fetchall()]
+        return schedule
+
+    def list(self, sender=None, recipient=None, status=None, limit=100):
+        # Soonest due first
+        query = "SELECT * FROM schedules WHERE 1 = 1"
+        params = []
+        if sender:
+            query += " AND sender = ?"
+            params.append(normalize_address(sender))
+        if recipient:
+            query += " AND recipient = ?"
+            params.append(normalize_address(recipient))
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY next_run LIMIT ?"
+        params.append(max(1, min(limit, 1000)))
+        return [dict(row) for row in self.conn.execute(query, params).fetchall()]
+
+    def _set_status(self, schedule_id, status, from_statuses):
+        updated = self.conn.execute(
+            f"UPDATE schedules SET status = ?, failures = 0, retry_at = 0, updated_at = ? "
+            f"WHERE id = ? AND status IN ({_placeholders(from_statuses)})",
+            (status, datetime.datetime.now().isoformat(), schedule_id, *from_statuses)
+        ).rowcount
+        return self.get(schedule_id) if updated else None
+
+    def cancel(self, schedule_id):
+        # Payouts already planned still go out
+        return self._set_status(schedule_id, "cancelled", ("active", "paused"))
+
+    def resume(self, schedule_id):
+        return self._set_status(schedule_id, "active", ("paused",))
+
+    def _plan(self, row, now):
+        # Due times of the periods to pay now, the schedule's next due time,
+        # and whether it is finished afterwards
+        next_run, interval = row["next_run"], row["interval"]
+        if interval is None:
+            return [next_run], next_run, True
+        periods = int((now - next_run) // interval) + 1
+        if row["end_at"] is not None:
+            periods = min(periods, max(int((row["end_at"] - next_run) // interval) + 1, 0))
+        # Only the periods that are paid are built, however many were missed
+        keep = min(periods, 1 if row["catch_up"] == "latest" else SCHEDULE_MAX_CATCH_UP)
+        due = [next_run + i * interval for i in range(periods - keep, periods)]
+        if row["max_runs"] is not None:
+            due = due[:row["max_runs"] - row["runs"]]
+        next_run += periods * interval
+        done = (
+            (row["end_at"] is not None and next_run > row["end_at"])
+            or (row["max_runs"] is not None and row["runs"] + len(due) >= row["max_runs"])
+        )
+        return due, next_run, done
+
+    def tick(self, now=None):
+        # Turns every due schedule into a payout and queues the payouts, one
+        # job per sender (and SCHEDULE_JOB_PAYOUTS); returns how many
+        now = now or time.time()
+        conn = self.conn
+        rows = conn.execute(
+            "SELECT * FROM schedules WHERE status = 'active' AND next_run <= ? AND retry_at <= ? "
+            "ORDER BY next_run LIMIT ?",
+            (now, now, SCHEDULE_MAX_DUE)
+        ).fetchall()
+        if not rows:
+            return 0
+        updated_at = datetime.datetime.now().isoformat()
+        by_sender = {}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row in rows:
+                due, next_run, done = self._plan(row, now)
+                if due:
+                    payout = {
+                        "schedule_id": row["id"],
+                        "sender": row["sender"],
+                        "recipient": row["recipient"],
+                        "token": row["token"],
+                        "amount": row["amount"] * len(due),
+                        "periods": len(due),
+                        "first_due_at": due[0],
+                        "due_at": due[-1],
+                        "status": "pending",
+                        "created_at": updated_at,
+                        "updated_at": updated_at,
+                    }
+                    cursor = conn.execute(
+                        f"INSERT INTO payouts ({', '.join(PAYOUT_FIELDS)}) VALUES ({_placeholders(PAYOUT_FIELDS)})",
+                        tuple(payout[field] for field in PAYOUT_FIELDS)
+                    )
+                    by_sender.setdefault(row["sender"], []).append(cursor.lastrowid)
+                conn.execute(
+                    "UPDATE schedules SET next_run = ?, runs = runs + ?, status = ?, updated_at = ? WHERE id = ?",
+                    (next_run, len(due), "completed" if done else "active", updated_at, row["id"])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        for sender, payout_ids in by_sender.items():
+            self._enqueue(sender, payout_ids)
+        self.ticks += 1
+        count = sum(len(payout_ids) for payout_ids in by_sender.values())
+        logger.info(f"Queued {count} allowance payouts from {len(by_sender)} senders")
+        return count
+
+    def _enqueue(self, sender, payout_ids):
+        for chunk in _chunks(payout_ids, SCHEDULE_JOB_PAYOUTS):
+            # The job queue runs one job per account at a time, after the
+            # sender's other writes
+            job = self.queue.enqueue("allowance", {"payouts": chunk}, account=sender, priority=ALLOWANCE_JOB_PRIORITY)
+            self.conn.execute(
+                f"UPDATE payouts SET job_id = ? WHERE id IN ({_placeholders(chunk)})", (job["id"], *chunk)
+            )
+
+    async def _account(self, sender):
+        if sender == settings.treasury_address:
+            return await get_wallet_account()
+        account_data = self.store.get(sender)
+        if account_data is None:
+            raise Exception(f"Sender {sender} is not a managed account")
+        return await get_account(sender, account_data["private_key"])
+
+    def _update_payouts(self, payout_ids, **fields):
+        fields["updated_at"] = datetime.datetime.now().isoformat()
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        self.conn.execute(
+            f"UPDATE payouts SET {assignments} WHERE id IN ({_placeholders(payout_ids)})",
+            (*fields.values(), *payout_ids)
+        )
+
+    def _fail(self, payout, error):
+        # Nothing was paid: hand the periods back to the schedule and retry
+        # it later
+        self._update_payouts([payout["id"]], status="failed", error=error)
+        self.conn.execute(
+            """
+            UPDATE schedules SET
+                next_run = MIN(next_run, ?),
+                runs = runs - ?,
+                failures = failures + 1,
+                retry_at = ?,
+                last_error = ?,
+                status = CASE
+                    WHEN status = 'cancelled' THEN status
+                    WHEN failures + 1 >= ? THEN 'paused'
+                    ELSE 'active'
+                END,
+                updated_at = ?
+            WHERE id = ?
+            """,
+            (payout["first_due_at"], payout["periods"], time.time() + SCHEDULE_RETRY_DELAY, error,
+             SCHEDULE_MAX_FAILURES, datetime.datetime.now().isoformat(), payout["schedule_id"])
+        )
+
+    async def settle(self, payout_ids):
+        # Job handler: pays the still pending payouts of one sender
+        rows = self.conn.execute(
+            f"SELECT * FROM payouts WHERE status = 'pending' AND id IN ({_placeholders(payout_ids)})", payout_ids
+        ).fetchall()
+        if not rows:
+            return {"payouts": 0, "transactions": []}
+        sender = rows[0]["sender"]
+        groups = {}
+        for row in rows:
+            groups.setdefault((row["recipient"], row["token"]), []).append(dict(row))
+        transfers = [
+            {"address": recipient, "token": token, "amount": sum(payout["amount"] for payout in group)}
+            for (recipient, token), group in groups.items()
+        ]
+        self._update_payouts([row["id"] for row in rows], status="sending")
+        group_list = list(groups.values())
+        sent = {}
+
+        def on_sent(indexes, tx_hash):
+            # Marked and tagged before the tracker can see the transaction
+            # land, so its confirmation settles these payouts
+            sent.update((index, tx_hash) for index in indexes)
+            payouts = [payout for index in indexes for payout in group_list[index]]
+            self._update_payouts([payout["id"] for payout in payouts], status="submitted", transaction_hash=tx_hash)
+            record = tracker.track(tx_hash, "allowance", sender_address=sender, payouts=len(payouts))
+            if record["status"] != "submitted":
+                self.on_transaction_update(record)
+
+        try:
+            account = await self._account(sender)
+            results = await transfer_batch(transfers, account=account, wait=False, on_sent=on_sent)
+        except Exception as e:
+            logger.error(f"Allowance payouts from {sender} failed: {e}")
+            results = [{"status": "failed", "transaction_hash": None, "error": str(e)}] * len(transfers)
+
+        transactions = []
+        failed = 0
+        for index, (group, result) in enumerate(zip(group_list, results)):
+            if index in sent:
+                if sent[index] not in transactions:
+                    transactions.append(sent[index])
+                continue
+            failed += len(group)
+            if result.get("maybe_sent"):
+                # The node may have it: left for review like a lost
+                # confirmation, not paid again
+                self._update_payouts([payout["id"] for payout in group], status="unconfirmed", error=result["error"])
+                continue
+            # Never reached the node: the periods go back to the schedule
+            for payout in group:
+                self._fail(payout, result["error"] or "Not sent")
+        return {
+            "payouts": len(rows),
+            "transfers": len(transfers),
+            "failed": failed,
+            "transactions": transactions,
+        }
+
+    def on_transaction_update(self, record):
+        if record.get("kind") != "allowance":
+            return
+        tx_hash = record["transaction_hash"]
+        if record["status"] == "accepted":
+            payout_ids = [row["id"] for row in self.conn.execute(
+                "SELECT id FROM payouts WHERE transaction_hash = ? AND status = 'submitted'", (tx_hash,)
+            ).fetchall()]
+            if not payout_ids:
+                return
+            self._update_payouts(payout_ids, status="paid")
+            self.conn.execute(
+                "UPDATE schedules SET failures = 0, last_error = NULL "
+                "WHERE id IN (SELECT schedule_id FROM payouts WHERE transaction_hash = ?)",
+                (tx_hash,)
+            )
+        elif record["status"] in ("reverted", "rejected"):
+            error = record.get("revert_reason") or f"Transaction {record['status']}"
+            for row in self.conn.execute(
+                "SELECT * FROM payouts WHERE transaction_hash = ? AND status = 'submitted'", (tx_hash,)
+            ).fetchall():
+                self._fail(dict(row), error)
+        elif record["status"] in ("timeout", "failed"):
+            # It may still land: not retried, left for review
+            payout_ids = [row["id"] for row in self.conn.execute(
+                "SELECT id FROM payouts WHERE transaction_hash = ? AND status = 'submitted'", (tx_hash,)
+            ).fetchall()]
+            if payout_ids:
+                self._update_payouts(payout_ids, status="unconfirmed", error=f"Transaction {record['status']}")
+
+    async def _run(self):
+        while True:
+            try:
+                block_number = await read_cache.current_block()
+                if block_number != self.block_number:
+                    self.block_number = block_number
+                    self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Error settling allowances: {e}")
+            await asyncio.sleep(SCHEDULE_POLL_INTERVAL)
+
+    def stats(self):
+        schedules = self.conn.execute("SELECT status, COUNT(*) AS count FROM schedules GROUP BY status").fetchall()
+        payouts = self.conn.execute("SELECT status, COUNT(*) AS count FROM payouts GROUP BY status").fetchall()
+        next_due = self.conn.execute("SELECT MIN(next_run) AS next FROM schedules WHERE status = 'active'").fetchone()
+        return {
+            "schedules": {row["status"]: row["count"] for row in schedules},
+            "payouts": {row["status"]: row["count"] for row in payouts},
+            "next_due": next_due["next"],
+            "block_number": self.block_number,
+            "ticks": self.ticks,
+        }
+
+
+allowance_scheduler = AllowanceScheduler()
+tracker.add_listener(allowance_scheduler.on_transaction_update)
@@ -1,19 +1,85 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, WebSocket
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
-from CreateAcc import main as create_account_main
-from transfer import main as transfer_main
 from transfer_amount import transfer_exact_amount
-from deployAcc import deploy_contract as deploy_main
 import json
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from send_gift import send_gift  # Add this import
-from stake_validator2 import main as stake_main  # Use stake_validator2.py instead of stake.py
+from staking import staking_engine
+from node_client import registry
+from contract_cache import contract_cache
+from batch_transfer import transfer_batch
+from tx_tracker import tracker, wait_for_tx
+from onboarding import onboarding_pool
+from bulk_accounts import bulk_provisioner, account_line, funding_batches
+from account_store import account_store, normalize_address, public_account
+from balances import get_balances
+from read_cache import read_cache
+from fee_cache import fee_cache
+from event_indexer import event_indexer
+from allowances import allowance_scheduler
+from block_feed import block_feed
+from warmup import warmup
+from signer import signer_pool
+from price_oracle import price_oracle, PriceUnavailable, PRICE_IDS
+from job_queue import job_queue, IdempotencyConflict, JOB_RESPONSE_TIMEOUT
+from config import settings
+from log_setup import get_logger
+import metrics
+import time
+
+logger = get_logger(__name__)
 
 # Add this class for request validation
 class TransferRequest(BaseModel):
     address: str
     amount_strk: float
+    # Same key -> same transfer; may also be sent as an Idempotency-Key header
+    idempotency_key: Optional[str] = None
+
+class GiftRequest(TransferRequest):
+    from_address: Optional[str] = None
+
+class StakeRequest(BaseModel):
+    amount_strk: Optional[float] = None
+    validator_address: Optional[str] = None
+    account_address: Optional[str] = None
+
+class BulkAccountsRequest(BaseModel):
+    count: int
+    parent: Optional[str] = None
+    # Queue funding and deployment; otherwise the accounts are only created
+    fund: bool = True
+
+class BatchTransferItem(BaseModel):
+    address: str
+    amount: float
+    token: str = "STRK"
+
+class BatchTransferRequest(BaseModel):
+    transfers: List[BatchTransferItem]
+    max_calls_per_tx: Optional[int] = Field(default=None, ge=1)
+
+class AllowanceItem(BaseModel):
+    recipient: str
+    amount: float
+    token: str = "STRK"
+    # The treasury wallet by default, or a managed account
+    sender: Optional[str] = None
+    # Seconds between payouts; a single payout when unset
+    interval_seconds: Optional[float] = None
+    # Unix time of the first payout (now by default) and of the last
+    start_at: Optional[float] = None
+    end_at: Optional[float] = None
+    max_runs: Optional[int] = None
+    # Periods missed while the backend was down: "all" pays each of them,
+    # "latest" only one
+    catch_up: str = "all"
+
+class AllowancesRequest(BaseModel):
+    allowances: List[AllowanceItem]
 
 app = FastAPI()
 
@@ -26,168 +92,693 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template so /tx/{tx_hash} is one series
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            path=route.path if route else "unmatched",
+            status=status
+        )
+
+def collect_service_state():
+    # Queue depth, pending transactions and cache counters, read on scrape
+    reads = read_cache.stats()
+    fees = fee_cache.stats()
+    signer = signer_pool.stats()
+    prices = price_oracle.stats()
+    allowances = allowance_scheduler.stats()
+    return [
+        ("job_queue_jobs", "gauge", "Jobs in the write queue by status",
+         [({"status": status}, count) for status, count in job_queue.counts().items()]),
+        ("tx_tracker_pending", "gauge", "Submitted transactions not yet final",
+         [({}, tracker.pending_count())]),
+        ("read_cache_lookups_total", "counter", "Block read cache lookups by result",
+         [({"result": "hit"}, reads["hits"]), ({"result": "miss"}, reads["misses"]), ({"result": "coalesced"}, reads["coalesced"])]),
+        ("fee_cache_lookups_total", "counter", "Fee estimate cache lookups by result",
+         [({"result": "hit"}, fees["hits"]), ({"result": "miss"}, fees["misses"])]),
+        ("fee_estimate_requests_total", "counter", "estimateFee requests sent to the node",
+         [({}, fees["estimate_requests"])]),
+        ("event_indexer_lag_blocks", "gauge", "Blocks between the node head and the history index",
+         [({}, event_indexer.lag() or 0)]),
+        ("block_feed_subscribers", "gauge", "Clients subscribed to block updates",
+         [({}, block_feed.stats()["subscribers"])]),
+        ("signer_pending", "gauge", "Transactions waiting for or being signed in the signer processes",
+         [({}, signer["queued"] + signer["in_flight"])]),
+        ("signer_transactions_total", "counter", "Transactions signed by the signer processes by result",
+         [({"result": "signed"}, signer["signed"]), ({"result": "failed"}, signer["failed"])]),
+        ("signer_restarts_total", "counter", "Times the signer processes were replaced after a worker died",
+         [({}, signer["restarts"])]),
+        ("price_lookups_total", "counter", "Price quote lookups by result",
+         [({"result": "fresh"}, prices["fresh"]), ({"result": "stale"}, prices["stale"]), ({"result": "miss"}, prices["misses"])]),
+        ("allowance_payouts", "gauge", "Allowance payouts by status",
+         [({"status": status}, count) for status, count in allowances["payouts"].items()]),
+        ("price_upstream_requests_total", "counter", "Requests sent to the price provider",
+         [({}, prices["upstream_requests"])]),
+    ]
+
+metrics.register_collector(collect_service_state)
+
+@app.get("/metrics")
+async def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("startup")
+async def startup():
+    # Open the shared node connection pool once for the app lifetime
+    await registry.start()
+    # Reuse ABIs from the last run so the first requests skip the class fetch
+    contract_cache.load_snapshot()
+    tracker.start()
+    # Load the warm account pool and top it up in the background
+    onboarding_pool.start()
+    # Resume jobs left over from the last run
+    job_queue.start()
+    # Finish deployments of accounts funded before a restart
+    bulk_provisioner.start()
+    # Follow transfers and pool events of managed accounts for /history
+    event_indexer.start()
+    # Settle due allowances once per block
+    allowance_scheduler.start()
+    # Connections, ABIs and nonces load in the background; see /ready
+    warmup.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await warmup.stop()
+    await block_feed.stop()
+    await event_indexer.stop()
+    await allowance_scheduler.stop()
+    await job_queue.stop()
+    await bulk_provisioner.stop()
+    await onboarding_pool.stop()
+    await tracker.stop()
+    await signer_pool.stop()
+    await price_oracle.close()
+    await registry.close()
+
+# On-chain writes run as queued jobs. Handlers only submit; waiting for
+# confirmation happens in the endpoint so a slow block never holds a worker
+# or an account's queue
+JOB_PRIORITIES = {"transfer": 10, "gift": 5, "create-deploy": 5, "stake": 0}
+
+def treasury_address():
+    return settings.treasury_address
+
+async def run_transfer_job(payload):
+    tx_hash = await transfer_exact_amount(
+        to_address=payload["address"],
+        amount_strk=payload["amount_strk"],
+        wait=False
+    )
+    tracker.track(tx_hash, "transfer", to_address=payload["address"], amount=payload["amount_strk"])
+    return {"transaction_hash": tx_hash}
+
+async def run_gift_job(payload):
+    tx_hash = await send_gift(
+        to_address=payload["address"],
+        amount_strk=payload["amount_strk"],
+        wait=False,
+        from_address=payload["from_address"]
+    )
+    tracker.track(tx_hash, "gift", to_address=payload["address"], amount=payload["amount_strk"])
+    return {"transaction_hash": tx_hash}
+
+async def run_stake_job(payload):
+    result = await staking_engine.stake(wait=False, **payload)
+    tracker.track(result["transaction_hash"], "stake")
+    return result
+
+async def run_create_deploy_job(payload):
+    # Hand out a pre-created, pre-funded account from the warm pool and
+    # deploy it in the background
+    account_data = await onboarding_pool.claim(payload["parent"])
+    return {
+        "address": account_data["address"],
+        "public_key": account_data["public_key"],
+        "funding_tx": account_data.get("funding_tx_hash"),
+        "deployment_tx": None
+    }
+
+async def run_allowance_job(payload):
+    # Due allowance payouts of one sender, paid in multicalls
+    return await allowance_scheduler.settle(payload["payouts"])
+
+job_queue.register("transfer", run_transfer_job)
+job_queue.register("gift", run_gift_job)
+job_queue.register("stake", run_stake_job)
+job_queue.register("create-deploy", run_create_deploy_job)
+job_queue.register("allowance", run_allowance_job)
+
+async def submit_job(kind, payload, account, idempotency_key=None):
+    # Enqueue and wait briefly for the job; returns the job, which is still
+    # queued or running if it did not finish within JOB_RESPONSE_TIMEOUT.
+    # Repeats of an idempotency key get the original job back, and
+    # simultaneous duplicates wait on the same one
+    job = job_queue.enqueue(
+        kind,
+        payload,
+        account=account,
+        priority=JOB_PRIORITIES[kind],
+        idempotency_key=f"{kind}:{idempotency_key}" if idempotency_key else None
+    )
+    try:
+        job = await job_queue.wait(job["id"], timeout=JOB_RESPONSE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return job_queue.get(job["id"])
+    if job["status"] == "failed":
+        raise Exception(job["error"])
+    return job
+
+def queued_response(job):
+    if job["status"] == "interrupted":
+        # Not an error the caller may simply retry: the write may have landed
+        message = "Sending was interrupted and the transaction may have gone through; poll /jobs/{job_id} for the outcome"
+    else:
+        message = "Request queued, poll /jobs/{job_id} for the result"
+    return JSONResponse(status_code=202, content={
+        "status": "queued",
+        "message": message,
+        "job_id": job["id"],
+        "job_status": job["status"]
+    })
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @app.post("/create-deploy")
-async def create_and_deploy():
+async def create_and_deploy(wait: bool = False, parent: Optional[str] = None):
     try:
-        # Step 1: Create Account
-        print("\n=== 1. Creating New Account ===")
-        await create_account_main()
-        
-        # Get the created account details
-        with open('new_account.json', 'r') as f:
-            account_data = json.load(f)
+        logger.info("Claiming account from onboarding pool", extra={"parent": parent})
+        job = await submit_job("create-deploy", {"parent": parent}, treasury_address())
+        if job["status"] != "succeeded":
+            return queued_response(job)
+        # The only response carrying the new account's key; it is not kept
+        # in the job result
+        data = {**job["result"], "private_key": account_store.get(job["result"]["address"])["private_key"]}
         
-        # Step 2: Fund Account
-        print("\n=== 2. Funding Account ===")
-        await transfer_main()
-        
-        # Step 3: Deploy Account
-        print("\n=== 3. Deploying Account ===")
-        deploy_result = await deploy_main()
+        if not wait:
+            return {
+                "status": "success",
+                "message": "Account created and funded, deployment in progress",
+                "job_id": job["id"],
+                "data": data
+            }
         
-        # Return all relevant information
+        # Wait for the background funding and deployment to finish
+        account_data = await onboarding_pool.wait_deployed(data["address"])
+        if account_data["status"] != "deployed":
+            raise Exception(f"Deployment of {data['address']} did not complete")
         return {
             "status": "success",
             "message": "Account created, funded, and deployed successfully",
+            "job_id": job["id"],
             "data": {
-                "address": account_data["address"],
-                "public_key": account_data["public_key"],
+                **data,
                 "funding_tx": account_data.get("funding_tx_hash"),
-                "deployment_tx": deploy_result if deploy_result else None
+                "deployment_tx": account_data.get("deployment_tx_hash")
             }
         }
         
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.error(f"Create-deploy failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/")
 async def read_root():
     return {"status": "online", "message": "API is running"} 
 
+@app.get("/ready")
+async def read_ready():
+    # 200 once warm-up has finished, 503 with the stage report until then
+    status = warmup.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 @app.post("/execute-transfer")
-async def execute_transfer(request: TransferRequest):
+async def execute_transfer(
+    request: TransferRequest,
+    wait: bool = False,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     try:
-        print(f"Received transfer request: {request}")  # Log the request
-        tx_hash = await transfer_exact_amount(
-            to_address=request.address,
-            amount_strk=request.amount_strk
+        logger.info("Received transfer request", extra={"to_address": request.address, "amount": request.amount_strk})
+        job = await submit_job(
+            "transfer",
+            request.model_dump(exclude={"idempotency_key"}),
+            treasury_address(),
+            idempotency_key or request.idempotency_key
         )
-        print(f"Transfer successful, hash: {tx_hash}")  # Log success
+        if job["status"] != "succeeded":
+            return queued_response(job)
+        tx_hash = job["result"]["transaction_hash"]
+        
+        if wait:
+            await wait_for_tx(tx_hash)
+            return {
+                "status": "success",
+                "message": "Transfer completed successfully",
+                "transaction_hash": tx_hash,
+                "job_id": job["id"]
+            }
         
         return {
             "status": "success",
-            "message": "Transfer completed successfully",
-            "transaction_hash": tx_hash
+            "message": "Transfer submitted",
+            "transaction_hash": tx_hash,
+            # track() rather than get(): a job repeated by idempotency key may
+            # predate this process or the tracker's retention
+            "transaction_status": tracker.track(tx_hash, "transfer")["status"],
+            "job_id": job["id"]
         }
         
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        print(f"Detailed transfer error: {str(e)}")  # Log detailed error
+        logger.error(f"Transfer failed: {e}")
         raise HTTPException(
             status_code=500,
             detail=f"Transfer failed: {str(e)}"
         ) 
 
-@app.post("/send-gift")
-async def execute_gift(request: TransferRequest):
+@app.post("/execute-transfers-batch")
+async def execute_transfers_batch(request: BatchTransferRequest, wait: bool = False):
     try:
-        print(f"\n=== Starting Gift Transfer ===")
-        print(f"To address: {request.address}")
-        print(f"Amount: {request.amount_strk} STRK")
+        logger.info(f"Received batch transfer request for {len(request.transfers)} recipients")
+        results = await transfer_batch(
+            [transfer.model_dump() for transfer in request.transfers],
+            max_calls_per_tx=request.max_calls_per_tx,
+            wait=wait
+        )
+        if not wait:
+            for tx_hash in {r["transaction_hash"] for r in results if r["transaction_hash"]}:
+                tracker.track(tx_hash, "batch-transfer")
+        failed = [result for result in results if result["status"] == "failed"]
+        
+        return {
+            "status": "success" if not failed else ("failed" if len(failed) == len(results) else "partial"),
+            "message": f"{len(results) - len(failed)} of {len(results)} transfers completed",
+            "transaction_hashes": sorted({r["transaction_hash"] for r in results if r["transaction_hash"]}),
+            "results": results
+        }
         
-        # Read sender's details for logging
-        with open('new_account.json', 'r') as f:
-            account_data = json.load(f)
-        print(f"From address: {account_data['address']}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Batch transfer failed: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Batch transfer failed: {str(e)}"
+        )
+
+@app.post("/send-gift")
+async def execute_gift(
+    request: GiftRequest,
+    wait: bool = False,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    try:
+        # Look up sender's details for logging
+        account_data = (
+            account_store.get(request.from_address) if request.from_address
+            else account_store.latest()
+        )
+        if account_data is None:
+            raise HTTPException(status_code=404, detail="Sender account not found")
+        logger.info(
+            "Received gift request",
+            extra={"from_address": account_data['address'], "to_address": request.address, "amount": request.amount_strk}
+        )
             
-        tx_hash = await send_gift(
-            to_address=request.address,
-            amount_strk=request.amount_strk
+        job = await submit_job(
+            "gift",
+            {**request.model_dump(exclude={"idempotency_key"}), "from_address": account_data['address']},
+            account_data['address'],
+            idempotency_key or request.idempotency_key
         )
+        if job["status"] != "succeeded":
+            return queued_response(job)
+        tx_hash = job["result"]["transaction_hash"]
         
-        print(f"Transaction hash: {tx_hash}")
+        if wait:
+            await wait_for_tx(tx_hash)
         
         return {
             "status": "success",
             "message": "Gift sent successfully! 🎁",
             "transaction_hash": tx_hash,
+            "transaction_status": "accepted" if wait else tracker.track(tx_hash, "gift")["status"],
+            "job_id": job["id"],
             "from_address": account_data['address'],
             "to_address": request.address,
             "amount": request.amount_strk
         }
         
+    except HTTPException:
+        raise
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        print(f"\n=== Gift Transfer Error ===")
-        print(f"Error type: {type(e)}")
-        print(f"Error message: {str(e)}")
-        print(f"Full error: {e}")
+        logger.error(f"Gift transfer failed: {e}", extra={"error_type": type(e).__name__})
         raise HTTPException(
             status_code=500,
             detail=f"Failed to send gift: {str(e)}"
         ) 
 
 @app.post("/stake")
-async def execute_stake():
+async def execute_stake(request: Optional[StakeRequest] = None, wait: bool = False):
+    # Amount, pool and staking account come from the body; any of them may be
+    # omitted to use the defaults (1 STRK from the treasury wallet)
+    request = request or StakeRequest()
+    if request.amount_strk is not None and request.amount_strk <= 0:
+        raise HTTPException(status_code=400, detail="amount_strk must be positive")
     try:
-        print(f"\n=== Starting Staking Process ===")
-        
-        # Execute the staking function and get the transaction hash
-        result = await stake_main()
-        
-        # Convert the transaction hash to hex string if it's a number
-        if isinstance(result, int):
-            tx_hash = hex(result)  # Convert to hex string
-        elif isinstance(result, str):
-            tx_hash = result
-        else:
-            print(f"Warning: Unexpected transaction hash type: {type(result)}")
-            raise HTTPException(
-                status_code=500,
-                detail="Invalid transaction hash format"
-            )
+        account = normalize_address(request.account_address) if request.account_address else treasury_address()
+        job = await submit_job("stake", request.model_dump(), account)
+        if job["status"] != "succeeded":
+            return queued_response(job)
+        result = job["result"]
+        tx_hash = result["transaction_hash"]
         
-        print(f"Transaction hash: {tx_hash}")
+        if wait:
+            await wait_for_tx(tx_hash)
         
         return {
             "status": "success",
-            "message": "Staking completed successfully! 🎯",
-            "transaction_hash": tx_hash
+            "message": "Staking completed successfully! 🎯" if wait else "Staking submitted! 🎯",
+            **result,
+            "transaction_status": "accepted" if wait else tracker.track(tx_hash, "stake")["status"],
+            "job_id": job["id"]
         }
         
     except Exception as e:
-        print(f"\n=== Staking Error ===")
-        print(f"Error type: {type(e)}")
-        print(f"Error message: {str(e)}")
+        logger.error(f"Staking failed: {e}", extra={"error_type": type(e).__name__})
         raise HTTPException(
             status_code=500,
             detail=f"Staking failed: {str(e)}"
         ) 
 
+@app.get("/tx/stream")
+async def stream_transactions(hashes: Optional[str] = None):
+    # Server-sent events with every status change of tracked transactions,
+    # optionally limited to a comma separated list of hashes
+    try:
+        watched = {int(h, 16) for h in hashes.split(",")} if hashes else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="hashes must be comma separated hex transaction hashes")
+    queue = tracker.subscribe()
+    
+    async def events():
+        try:
+            if watched:
+                for tx_hash in watched:
+                    record = tracker.get(tx_hash)
+                    if record:
+                        yield f"data: {json.dumps(record)}\n\n"
+            while True:
+                record = await queue.get()
+                if watched is None or int(record["transaction_hash"], 16) in watched:
+                    yield f"data: {json.dumps(record)}\n\n"
+        finally:
+            tracker.unsubscribe(queue)
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+def _split(values):
+    return [value for value in (values or "").split(",") if value]
+
+@app.get("/stream")
+async def stream_updates(accounts: Optional[str] = None, positions: bool = False, txs: Optional[str] = None):
+    # Server-sent events with the balances (and optionally delegation
+    # positions) of comma separated accounts and the status of transactions:
+    # the current values first, then what changed on each new block
+    try:
+        subscription = await block_feed.subscribe(_split(accounts), positions, _split(txs))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        try:
+            while True:
+                message = await subscription.queue.get()
+                if message is None:
+                    break
+                yield f"data: {json.dumps(message)}\n\n"
+        finally:
+            block_feed.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.websocket("/ws")
+async def websocket_updates(websocket: WebSocket):
+    # Same updates as /stream. Each message from the client replaces what it
+    # watches: {"accounts": [...], "positions": bool, "transactions": [...]}
+    await websocket.accept()
+    subscription = await block_feed.subscribe()
+
+    async def receive():
+        while True:
+            request = await websocket.receive_json()
+            try:
+                await block_feed.update(
+                    subscription,
+                    request.get("accounts", []),
+                    bool(request.get("positions")),
+                    request.get("transactions", [])
+                )
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+
+    async def send():
+        while True:
+            message = await subscription.queue.get()
+            if message is None:
+                break
+            await websocket.send_json(message)
+
+    # Runs until the client disconnects or the feed drops it
+    tasks = [asyncio.ensure_future(receive()), asyncio.ensure_future(send())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        block_feed.unsubscribe(subscription)
+    if subscription.closed:
+        await websocket.close(code=1013)
+
+@app.get("/stream/stats")
+async def stream_stats():
+    return block_feed.stats()
+
+@app.get("/tx/{tx_hash}")
+async def get_transaction(tx_hash: str):
+    record = tracker.get(tx_hash)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Transaction not tracked")
+    return record
+
 @app.get("/get-account")
-async def get_account():
+async def get_account(address: Optional[str] = None):
     try:
-        with open('new_account.json', 'r') as f:
-            account_data = json.load(f)
-        return account_data
-    except FileNotFoundError:
+        account_data = account_store.get(address) if address else account_store.latest()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if account_data is None:
         raise HTTPException(status_code=404, detail="Account data not found")
+    return public_account(account_data)
+
+@app.get("/accounts")
+async def list_accounts(parent: str):
+    try:
+        return {"parent": parent, "accounts": [public_account(account_data) for account_data in account_store.list_by_parent(parent)]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
 
+@app.post("/accounts/bulk")
+async def create_accounts_bulk(request: BulkAccountsRequest):
+    # Creates the accounts in one go and streams them back as NDJSON, one
+    # line per account with the job that funds it
+    try:
+        accounts = await bulk_provisioner.create(request.count, request.parent)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Bulk account creation failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    funding_jobs = {}
+    if request.fund:
+        for addresses in funding_batches(accounts):
+            job = bulk_provisioner.enqueue_funding(addresses)
+            funding_jobs.update({address: job["id"] for address in addresses})
+
+    async def lines():
+        for account_data in accounts:
+            yield account_line(account_data, funding_job_id=funding_jobs.get(account_data["address"]))
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/balances")
+async def read_balances(
+    addresses: Optional[str] = None,
+    parent: Optional[str] = None,
+    tokens: str = "ETH,STRK",
+    block_number: Optional[int] = None
+):
+    # Balance matrix for a comma separated list of addresses and/or every
+    # child of a parent, fetched in one batched round-trip at one block
+    address_list = [a for a in (addresses or "").split(",") if a]
+    if parent:
+        address_list += [account["address"] for account in account_store.list_by_parent(parent)]
+    if not address_list:
+        raise HTTPException(status_code=400, detail="Provide addresses or parent")
+    try:
+        result = await get_balances(
+            list(dict.fromkeys(address_list)),
+            [t for t in tokens.split(",") if t],
+            block_number
+        )
+        return {"status": "success", **result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to get balances: {str(e)}"
+        )
+
+async def _price_quotes(symbols):
+    try:
+        return await price_oracle.get_quotes(symbols)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PriceUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/price")
+async def read_prices(symbols: str = ",".join(PRICE_IDS)):
+    # Cached USD quotes for comma separated symbols, with their age; stale
+    # quotes are served while a refresh runs
+    return {"status": "success", "prices": await _price_quotes(_split(symbols))}
+
+@app.get("/price/stats")
+async def price_stats():
+    return price_oracle.stats()
+
+@app.get("/price/{symbol}")
+async def read_price(symbol: str):
+    return (await _price_quotes([symbol]))[symbol.upper()]
+
+@app.get("/rpc/endpoints")
+async def rpc_endpoints():
+    # Health, breaker state and latency histogram of every node endpoint
+    if registry.transport is None:
+        raise HTTPException(status_code=503, detail="Node transport not started")
+    return registry.transport.stats()
+
+@app.get("/read-cache/stats")
+async def read_cache_stats():
+    return {"reads": read_cache.stats(), "fees": fee_cache.stats()}
+
+@app.get("/history/{address}")
+async def get_history(address: str, limit: int = 50, cursor: Optional[str] = None, kind: Optional[str] = None):
+    # Served from the local event index; pass next_cursor back as cursor for
+    # the next (older) page
+    try:
+        return event_indexer.history(address, limit=limit, before=cursor, kind=kind)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/allowances")
+async def create_allowances(request: AllowancesRequest):
+    # Schedules one-off or recurring payouts, all or none of them
+    try:
+        schedules = allowance_scheduler.create([item.model_dump() for item in request.allowances])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", "allowances": schedules}
+
+@app.get("/allowances")
+async def list_allowances(
+    sender: Optional[str] = None,
+    recipient: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 100
+):
+    try:
+        return {"allowances": allowance_scheduler.list(sender, recipient, status, limit)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/allowances/stats")
+async def allowance_stats():
+    return allowance_scheduler.stats()
+
+@app.get("/allowances/{schedule_id}")
+async def get_allowance(schedule_id: str):
+    # The schedule with its latest payouts
+    schedule = allowance_scheduler.get(schedule_id, payouts=20)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="Allowance not found")
+    return schedule
+
+@app.delete("/allowances/{schedule_id}")
+async def cancel_allowance(schedule_id: str):
+    schedule = allowance_scheduler.cancel(schedule_id)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="No active or paused allowance with this id")
+    return schedule
+
+@app.post("/allowances/{schedule_id}/resume")
+async def resume_allowance(schedule_id: str):
+    # Restarts a schedule paused after repeated failures
+    schedule = allowance_scheduler.resume(schedule_id)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="No paused allowance with this id")
+    return schedule
+
+@app.get("/history-index/stats")
+async def history_index_stats():
+    return event_indexer.stats()
+
 @app.get("/get-staked-amount")
-async def get_staked_amount():
+async def get_staked_amount(
+    accounts: Optional[str] = None,
+    parent: Optional[str] = None,
+    validators: Optional[str] = None
+):
+    # Delegation positions for a comma separated list of accounts and/or
+    # every child of a parent, in one or more pools; defaults to the
+    # treasury wallet in the default pool
+    account_list = [a for a in (accounts or "").split(",") if a]
+    if parent:
+        account_list += [account["address"] for account in account_store.list_by_parent(parent)]
+    elif not account_list:
+        account_list = [settings.wallet_address]
+    validator_list = [v for v in (validators or "").split(",") if v] or None
     try:
-        # Import your staking contract interaction code
-        from stake_validator2 import get_staked_amount
-        
-        # Get the staked amount
-        amount = await get_staked_amount()
+        positions = await staking_engine.get_positions(list(dict.fromkeys(account_list)), validator_list)
         return {
             "status": "success",
-            "staked_amount": str(amount)
+            "staked_amount": str(sum(int(p["staked_amount"]) for p in positions if "error" not in p)),
+            "positions": positions
         }
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to get staked amount: {str(e)}"
-        ) 
\ No newline at end of file
+        )
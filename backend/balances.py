@@ -0,0 +1,93 @@
+from starknet_py.hash.selector import get_selector_from_name
+from batch_transfer import TOKENS
+from node_client import rpc_batch
+from read_cache import make_key, read_cache
+from log_setup import get_logger
+
+logger = get_logger(__name__)
+
+# Constants
+BALANCE_OF_SELECTOR = hex(get_selector_from_name("balanceOf"))
+
+
+def _token_address(token):
+    # A symbol from TOKENS or a 0x-prefixed token contract address
+    if token.upper() in TOKENS:
+        return TOKENS[token.upper()]
+    try:
+        if not token.lower().startswith("0x"):
+            raise ValueError
+        return hex(int(token, 16))
+    except ValueError:
+        raise ValueError(f"Unsupported token: {token}")
+
+
+def _check_address(address):
+    try:
+        int(address, 16)
+    except ValueError:
+        raise ValueError(f"Invalid address: {address}")
+    return address
+
+
+def block_id(block_number):
+    if isinstance(block_number, int):
+        return {"block_number": block_number}
+    return block_number
+
+
+def balance_of_request(token_address, address, block_number="latest"):
+    # Raw starknet_call for balanceOf, no ABI needed
+    return ("starknet_call", {
+        "request": {
+            "contract_address": hex(int(token_address, 16)),
+            "entry_point_selector": BALANCE_OF_SELECTOR,
+            "calldata": [hex(int(address, 16))],
+        },
+        "block_id": block_id(block_number),
+    })
+
+
+def parse_u256(result):
+    # balanceOf returns a u256 as (low, high)
+    low = int(result[0], 16)
+    high = int(result[1], 16) if len(result) > 1 else 0
+    return low + (high << 128)
+
+
+async def get_balances(addresses, tokens=("ETH", "STRK"), block_number=None):
+    # N accounts x M tokens pinned to the same block; pairs not already in
+    # the block cache go out in one JSON-RPC batch. Unknown tokens and
+    # addresses that are not hex raise ValueError before any request
+    token_addresses = {token: _token_address(token) for token in tokens}
+    for address in addresses:
+        _check_address(address)
+    if block_number is None:
+        block_number = await read_cache.current_block()
+
+    pairs = [(address, token) for address in addresses for token in tokens]
+    keys = [make_key(token_addresses[token], "balanceOf", (address,)) for address, token in pairs]
+
+    async def fetch_many(missing):
+        responses = await rpc_batch([
+            balance_of_request(contract, args[0], block_number)
+            for contract, _, args in missing
+        ])
+        # Stored as (balance,) like a decoded balanceOf call, since
+        # cached_call reads share these cache entries
+        return [
+            response if isinstance(response, Exception) else (parse_u256(response),)
+            for response in responses
+        ]
+
+    results = await read_cache.get_many(keys, fetch_many, block_number)
+
+    balances = {address: {} for address in addresses}
+    for (address, token), result in zip(pairs, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Error fetching {token} balance for {address}: {result}")
+            balances[address][token] = {"raw": None, "balance": None, "error": str(result)}
+            continue
+        raw = result[0]
+        balances[address][token] = {"raw": str(raw), "balance": raw / 10**18}
+    return {"block_number": block_number, "balances": balances}
@@ -0,0 +1,117 @@
+from contract_cache import get_contract
+from nonce_manager import send_invoke_v3, SendOutcomeUnknown
+from tx_tracker import wait_for_tx
+from node_client import get_wallet_account
+from log_setup import get_logger
+import metrics
+import asyncio
+from config import settings
+
+logger = get_logger(__name__)
+
+# Constants
+STRK_CONTRACT = settings.strk_contract_address
+ETH_CONTRACT = settings.eth_contract_address
+TOKENS = {"STRK": STRK_CONTRACT, "ETH": ETH_CONTRACT}
+BATCH_MAX_CALLS_PER_TX = settings.batch_max_calls_per_tx
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+async def transfer_batch(transfers, max_calls_per_tx=None, account=None, wait=True, on_sent=None):
+    # transfers: list of {"address": str, "amount": float, "token": "STRK" | "ETH"}
+    # Invalid transfers and a short balance raise ValueError before anything
+    # is sent
+    # Packs the transfers into multicall invokes of at most max_calls_per_tx
+    # calls and returns one result per transfer, in input order. on_sent is
+    # called with the input indexes and tx hash of each invoke as soon as
+    # the node accepts it
+    max_calls_per_tx = max_calls_per_tx or BATCH_MAX_CALLS_PER_TX
+    if account is None:
+        account = await get_wallet_account()
+
+    items = []
+    totals = {}
+    for index, transfer in enumerate(transfers):
+        token = transfer.get("token", "STRK").upper()
+        if token not in TOKENS:
+            raise ValueError(f"Unsupported token: {token}")
+        try:
+            int(transfer["address"], 16)
+        except ValueError:
+            raise ValueError(f"Invalid address: {transfer['address']}")
+        amount_wei = int(float(transfer["amount"]) * 10**18)
+        if amount_wei <= 0:
+            raise ValueError(f"amount must be positive: {transfer['amount']}")
+        items.append({
+            "index": index,
+            "address": transfer["address"],
+            "amount": transfer["amount"],
+            "amount_wei": amount_wei,
+            "token": token,
+        })
+        totals[token] = totals.get(token, 0) + amount_wei
+
+    contracts = {}
+    with metrics.TRANSFER_PHASE_DURATION.time(phase="abi_fetch"):
+        for token in totals:
+            contracts[token] = await get_contract(TOKENS[token], account)
+
+    # One balance check per token for the whole batch
+    with metrics.TRANSFER_PHASE_DURATION.time(phase="balance_check"):
+        balances = await asyncio.gather(*[
+            contracts[token].functions["balanceOf"].call(account.address)
+            for token in totals
+        ])
+    for token, balance_response in zip(totals, balances):
+        balance = balance_response[0]
+        logger.debug(f"Current sender {token} balance: {balance / 1e18}")
+        if balance < totals[token]:
+            raise ValueError(f"Insufficient {token} balance for batch transfer")
+
+    async def send_chunk(chunk):
+        calls = [
+            contracts[item["token"]].functions["transfer"].prepare_call(
+                recipient=int(item["address"], 16),
+                amount=item["amount_wei"]
+            )
+            for item in chunk
+        ]
+        result = {"transaction_hash": None, "status": "pending", "error": None, "maybe_sent": False}
+        try:
+            resp = await send_invoke_v3(account, calls)
+            result["transaction_hash"] = hex(resp.transaction_hash)
+            if on_sent is not None:
+                on_sent([item["index"] for item in chunk], result["transaction_hash"])
+            logger.info(f"Batch of {len(calls)} transfers sent", extra={"tx_hash": result['transaction_hash']})
+            if wait:
+                await wait_for_tx(resp.transaction_hash)
+                result["status"] = "success"
+            else:
+                result["status"] = "submitted"
+        except Exception as e:
+            logger.error(f"Error sending batch of {len(calls)} transfers: {e}")
+            result["status"] = "failed"
+            result["error"] = str(e)
+            # Not to be resent blindly
+            result["maybe_sent"] = isinstance(e, SendOutcomeUnknown)
+        return [(item, result) for item in chunk]
+
+    # Chunks get consecutive nonces from the nonce manager and go out together
+    chunk_results = await asyncio.gather(*[
+        send_chunk(chunk) for chunk in _chunks(items, max_calls_per_tx)
+    ])
+
+    results = [None] * len(items)
+    for chunk in chunk_results:
+        for item, result in chunk:
+            results[item["index"]] = {
+                "address": item["address"],
+                "amount": item["amount"],
+                "token": item["token"],
+                **result,
+            }
+    return results
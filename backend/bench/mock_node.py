@@ -0,0 +1,472 @@
+from starknet_py.hash.address import compute_address
+from starknet_py.hash.selector import get_selector_from_name
+from aiohttp import web
+import argparse
+import asyncio
+import json
+import random
+
+# Constants
+SEPOLIA_CHAIN_ID = "0x534e5f5345504f4c4941"
+SPEC_VERSION = "0.7.1"
+STRK_CONTRACT = "0x04718f5a0fc34cc1af16a1cdee98ffb20c31f5cd61d6ab07201858f4287c938d"
+ETH_CONTRACT = "0x049d36570d4e46f48e99674bd3fcc84644ddd6b96f7c741b1562b82f9e004dc7"
+POOL_CONTRACT = "0x00f5857f8976347f66a56b6da5de85784b2b12d7722eba29e1ff659cb04b57e7"
+ERC20_CLASS_HASH = 0xe4c20
+POOL_CLASS_HASH = 0x9001
+ACCOUNT_CLASS_HASH = 0xacc0
+# Every address starts with this much of each token (wei)
+INITIAL_BALANCE = 10**24
+# Returned for every estimateFee entry
+ESTIMATED_FEE = {
+    "gas_consumed": hex(1200),
+    "gas_price": hex(10**11),
+    "data_gas_consumed": hex(128),
+    "data_gas_price": hex(10**5),
+    "overall_fee": hex(1200 * 10**11 + 128 * 10**5),
+    "unit": "FRI",
+}
+# Misbehaving stand-in endpoints served under /fault/<mode>, all backed by
+# the same chain: throttled answers 429, down answers 503, stalled answers
+# after slow_latency and lagging reports a head LAG_BLOCKS behind
+FAULT_MODES = ("throttled", "down", "stalled", "lagging")
+FAULT_STATUSES = {"throttled": 429, "down": 503}
+LAG_BLOCKS = 2
+HEAD_METHODS = ("starknet_blockNumber", "starknet_blockHashAndNumber")
+# USD prices served by the CoinGecko style /api/v3/simple/price stand-in
+MOCK_PRICES = {"ethereum": 3200.0, "starknet": 0.45}
+
+U256 = "core::integer::u256"
+ADDRESS = "core::starknet::contract_address::ContractAddress"
+POOL_MEMBER_INFO = "staking::pool::interface::PoolMemberInfo"
+
+
+def _block_hash(block_number):
+    return hex((0xb10c << 64) + block_number)
+
+
+def _u256(value):
+    return [hex(value & (2**128 - 1)), hex(value >> 128)]
+
+
+def _function(name, inputs, outputs, state_mutability="view"):
+    return {
+        "type": "function",
+        "name": name,
+        "inputs": [{"name": arg, "type": cairo_type} for arg, cairo_type in inputs],
+        "outputs": [{"type": cairo_type} for cairo_type in outputs],
+        "state_mutability": state_mutability,
+    }
+
+
+def _interface(name, items):
+    return [
+        {"type": "impl", "name": f"{name}Impl", "interface_name": name},
+        {"type": "interface", "name": name, "items": items},
+    ]
+
+
+# Just the entry points the backend uses, in the Cairo 1 (v2) ABI format
+ERC20_ABI = _interface("openzeppelin::token::erc20::interface::IERC20", [
+    _function("balanceOf", [("account", ADDRESS)], [U256]),
+    _function("balance_of", [("account", ADDRESS)], [U256]),
+    _function("allowance", [("owner", ADDRESS), ("spender", ADDRESS)], [U256]),
+    _function("transfer", [("recipient", ADDRESS), ("amount", U256)], ["core::bool"], "external"),
+    _function("approve", [("spender", ADDRESS), ("amount", U256)], ["core::bool"], "external"),
+])
+POOL_ABI = [
+    {
+        "type": "struct",
+        "name": POOL_MEMBER_INFO,
+        "members": [
+            {"name": "reward_address", "type": ADDRESS},
+            {"name": "amount", "type": "core::integer::u128"},
+            {"name": "index", "type": "core::integer::u128"},
+            {"name": "unclaimed_rewards", "type": "core::integer::u128"},
+            {"name": "commission", "type": "core::integer::u16"},
+            {"name": "unpool_amount", "type": "core::integer::u128"},
+            {"name": "unpool_time", "type": "core::option::Option::<core::integer::u64>"},
+        ],
+    },
+    *_interface("staking::pool::interface::IPool", [
+        _function("enter_delegation_pool", [("reward_address", ADDRESS), ("amount", "core::integer::u128")], [], "external"),
+        _function("add_to_delegation_pool", [("pool_member", ADDRESS), ("amount", "core::integer::u128")], ["core::integer::u128"], "external"),
+        _function("get_pool_member_info", [("pool_member", ADDRESS)], [f"core::option::Option::<{POOL_MEMBER_INFO}>"]),
+    ]),
+]
+CLASSES = {ERC20_CLASS_HASH: ERC20_ABI, POOL_CLASS_HASH: POOL_ABI, ACCOUNT_CLASS_HASH: []}
+EVENT_SELECTORS = {
+    name: hex(get_selector_from_name(name))
+    for name in ("Transfer", "NewPoolMember", "PoolMemberBalanceChanged")
+}
+SELECTORS = {
+    get_selector_from_name(name): name
+    for name in (
+        "balanceOf", "balance_of", "allowance", "transfer", "approve",
+        "enter_delegation_pool", "add_to_delegation_pool", "get_pool_member_info",
+    )
+}
+
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class MockNode:
+    # In-memory Starknet JSON-RPC node for benchmarks: token balances,
+    # allowances, nonces, pool positions and the events they emit are
+    # tracked per address, a new
+    # block is produced every block_time seconds and transactions are
+    # accepted in the first block after they arrive. Signatures and fees are
+    # not checked. Latency and failures are injected per HTTP request, and
+    # the /fault/<mode> endpoints misbehave on every request so failover and
+    # circuit breakers can be exercised. Also stands in for the price
+    # provider
+
+    def __init__(self, latency=0.02, jitter=0.01, block_time=2.0, fail_rate=0.0,
+                 slow_rate=0.0, slow_latency=2.0, tokens=(STRK_CONTRACT, ETH_CONTRACT), pools=(POOL_CONTRACT,)):
+        self.latency = latency
+        self.jitter = jitter
+        self.block_time = block_time
+        self.fail_rate = fail_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.class_hashes = {int(address, 16): ERC20_CLASS_HASH for address in tokens}
+        self.class_hashes.update({int(address, 16): POOL_CLASS_HASH for address in pools})
+        self.block_number = 1
+        self.balances = {}
+        self.allowances = {}
+        self.nonces = {}
+        self.members = {}
+        self.transactions = {}
+        self.events = []
+        self.calls = {}
+        self.http_requests = 0
+        self.injected_failures = 0
+        self.fault_requests = {}
+        self.price_requests = 0
+        self._handlers = {
+            "starknet_specVersion": lambda params: SPEC_VERSION,
+            "starknet_chainId": lambda params: SEPOLIA_CHAIN_ID,
+            "starknet_blockNumber": lambda params: self.block_number,
+            "starknet_blockHashAndNumber": self.block_hash_and_number,
+            "starknet_getBlockWithTxHashes": self.get_block,
+            "starknet_getEvents": self.get_events,
+            "starknet_getNonce": self.get_nonce,
+            "starknet_getClassHashAt": self.get_class_hash_at,
+            "starknet_getClassAt": self.get_class_at,
+            "starknet_getClass": self.get_class,
+            "starknet_call": self.call,
+            "starknet_estimateFee": self.estimate_fee,
+            "starknet_addInvokeTransaction": self.add_invoke,
+            "starknet_addDeployAccountTransaction": self.add_deploy_account,
+            "starknet_getTransactionStatus": self.get_transaction_status,
+        }
+
+    # State
+
+    def balance(self, token, address):
+        return self.balances.get((token, address), INITIAL_BALANCE)
+
+    def _class_hash(self, address):
+        return self.class_hashes.get(address, ACCOUNT_CLASS_HASH)
+
+    def _new_hash(self):
+        return random.getrandbits(250)
+
+    def _execute(self, sender, calldata):
+        # Cairo 1 __execute__ calldata: count, then (to, selector, len, data).
+        # Returns (revert reason, events); on a revert no call takes effect
+        balances, allowances, members = dict(self.balances), dict(self.allowances), dict(self.members)
+        events = []
+        count, offset = calldata[0], 1
+        for _ in range(count):
+            to, entry_point, length = calldata[offset:offset + 3]
+            data = calldata[offset + 3:offset + 3 + length]
+            offset += 3 + length
+            name = SELECTORS.get(entry_point)
+            if name == "transfer":
+                amount = data[1] + (data[2] << 128)
+                if balances.get((to, sender), INITIAL_BALANCE) < amount:
+                    return "u256_sub Overflow", []
+                balances[(to, sender)] = balances.get((to, sender), INITIAL_BALANCE) - amount
+                balances[(to, data[0])] = balances.get((to, data[0]), INITIAL_BALANCE) + amount
+                events.append((to, ["Transfer", sender, data[0]], _u256(amount)))
+            elif name == "approve":
+                allowances[(to, sender, data[0])] = data[1] + (data[2] << 128)
+            elif name == "enter_delegation_pool":
+                if (to, sender) in members:
+                    return "Pool member exists", []
+                members[(to, sender)] = data[1]
+                events.append((to, ["NewPoolMember", sender, 0], [hex(data[0]), hex(data[1])]))
+            elif name == "add_to_delegation_pool":
+                if (to, data[0]) not in members:
+                    return "Pool member does not exist", []
+                old = members[(to, data[0])]
+                members[(to, data[0])] += data[1]
+                events.append((to, ["PoolMemberBalanceChanged", data[0]], [hex(old), hex(old + data[1])]))
+        self.balances, self.allowances, self.members = balances, allowances, members
+        return None, events
+
+    async def produce_blocks(self):
+        while True:
+            await asyncio.sleep(self.block_time)
+            self.block_number += 1
+
+    # JSON-RPC methods
+
+    def get_nonce(self, params):
+        return hex(self.nonces.get(int(params["contract_address"], 16), 0))
+
+    def get_class_hash_at(self, params):
+        return hex(self._class_hash(int(params["contract_address"], 16)))
+
+    def get_class(self, params):
+        class_hash = int(params["class_hash"], 16)
+        if class_hash not in CLASSES:
+            raise RpcError(28, "Class hash not found")
+        return {
+            "sierra_program": ["0x1"],
+            "contract_class_version": "0.1.0",
+            "entry_points_by_type": {"CONSTRUCTOR": [], "EXTERNAL": [], "L1_HANDLER": []},
+            "abi": json.dumps(CLASSES[class_hash]),
+        }
+
+    def get_class_at(self, params):
+        return self.get_class({"class_hash": self.get_class_hash_at(params)})
+
+    def call(self, params):
+        request = params["request"]
+        contract = int(request["contract_address"], 16)
+        name = SELECTORS.get(int(request["entry_point_selector"], 16))
+        args = [int(value, 16) for value in request["calldata"]]
+        if name in ("balanceOf", "balance_of"):
+            value = self.balance(contract, args[0])
+        elif name == "allowance":
+            value = self.allowances.get((contract, args[0], args[1]), 0)
+        elif name == "get_pool_member_info":
+            amount = self.members.get((contract, args[0]))
+            if amount is None:
+                return ["0x1"]
+            # Some(PoolMemberInfo) with no rewards and no pending unpool
+            return [hex(v) for v in (0, args[0], amount, 0, 0, 0, 0, 1)]
+        else:
+            raise RpcError(21, "Invalid message selector")
+        return [hex(value & (2**128 - 1)), hex(value >> 128)]
+
+    def estimate_fee(self, params):
+        return [ESTIMATED_FEE for _ in params["request"]]
+
+    def add_invoke(self, params):
+        transaction = params["invoke_transaction"]
+        sender = int(transaction["sender_address"], 16)
+        nonce = int(transaction["nonce"], 16)
+        expected = self.nonces.get(sender, 0)
+        if nonce != expected:
+            raise RpcError(52, f"Invalid transaction nonce: expected {expected}, got {nonce}")
+        self.nonces[sender] = expected + 1
+        revert_reason, events = self._execute(sender, [int(value, 16) for value in transaction["calldata"]])
+        tx_hash = self._record(revert_reason)
+        for contract, (name, *keys), data in events:
+            self.events.append({
+                "from_address": hex(contract),
+                "keys": [EVENT_SELECTORS[name], *(hex(key) for key in keys)],
+                "data": data,
+                "block_number": self.block_number,
+                "block_hash": _block_hash(self.block_number),
+                "transaction_hash": hex(tx_hash),
+            })
+        return {"transaction_hash": hex(tx_hash)}
+
+    def add_deploy_account(self, params):
+        transaction = params["deploy_account_transaction"]
+        address = compute_address(
+            class_hash=int(transaction["class_hash"], 16),
+            constructor_calldata=[int(value, 16) for value in transaction["constructor_calldata"]],
+            salt=int(transaction["contract_address_salt"], 16)
+        )
+        return {"transaction_hash": hex(self._record(None)), "contract_address": hex(address)}
+
+    def _record(self, revert_reason):
+        tx_hash = self._new_hash()
+        self.transactions[tx_hash] = {"block_number": self.block_number, "revert_reason": revert_reason}
+        return tx_hash
+
+    def block_hash_and_number(self, params):
+        # The last closed block; the current one is still collecting
+        # transactions
+        return {"block_hash": _block_hash(self.block_number - 1), "block_number": self.block_number - 1}
+
+    def get_block(self, params):
+        block_number = params["block_id"]["block_number"]
+        if block_number >= self.block_number:
+            raise RpcError(24, "Block not found")
+        return {
+            "block_hash": _block_hash(block_number),
+            "block_number": block_number,
+            "status": "ACCEPTED_ON_L2",
+            "transactions": [hex(h) for h, tx in self.transactions.items() if tx["block_number"] == block_number],
+        }
+
+    def get_events(self, params):
+        # Events of closed blocks; the continuation token is an offset
+        event_filter = params["filter"]
+        from_block = event_filter.get("from_block", {}).get("block_number", 0)
+        to_block = min(event_filter.get("to_block", {}).get("block_number", self.block_number), self.block_number - 1)
+        address = int(event_filter["address"], 16) if event_filter.get("address") else None
+        keys = [{hex(int(key, 16)) for key in position} for position in event_filter.get("keys", [])]
+        matches = [
+            event for event in self.events
+            if from_block <= event["block_number"] <= to_block
+            and (address is None or int(event["from_address"], 16) == address)
+            and all(
+                not position or (i < len(event["keys"]) and event["keys"][i] in position)
+                for i, position in enumerate(keys)
+            )
+        ]
+        offset = int(event_filter.get("continuation_token") or 0)
+        end = offset + event_filter["chunk_size"]
+        page = {"events": matches[offset:end]}
+        if end < len(matches):
+            page["continuation_token"] = str(end)
+        return page
+
+    def get_transaction_status(self, params):
+        transaction = self.transactions.get(int(params["transaction_hash"], 16))
+        if transaction is None:
+            raise RpcError(29, "Transaction hash not found")
+        if transaction["block_number"] >= self.block_number:
+            return {"finality_status": "RECEIVED"}
+        status = {"finality_status": "ACCEPTED_ON_L2", "execution_status": "SUCCEEDED"}
+        if transaction["revert_reason"]:
+            status.update(execution_status="REVERTED", failure_reason=transaction["revert_reason"])
+        return status
+
+    # HTTP
+
+    def _lagged_head(self, method):
+        block_number = max(self.block_number - 1 - LAG_BLOCKS, 0)
+        if method == "starknet_blockNumber":
+            return block_number
+        return {"block_hash": _block_hash(block_number), "block_number": block_number}
+
+    def _dispatch(self, item, lagging=False):
+        method = item.get("method")
+        self.calls[method] = self.calls.get(method, 0) + 1
+        response = {"jsonrpc": "2.0", "id": item.get("id")}
+        handler = self._handlers.get(method)
+        try:
+            if handler is None:
+                raise RpcError(-32601, f"Method not found: {method}")
+            if lagging and method in HEAD_METHODS:
+                response["result"] = self._lagged_head(method)
+            else:
+                response["result"] = handler(item.get("params") or {})
+        except RpcError as e:
+            response["error"] = {"code": e.code, "message": e.message}
+        return response
+
+    async def handle_rpc(self, request):
+        self.http_requests += 1
+        mode = request.match_info.get("mode")
+        if mode is not None:
+            if mode not in FAULT_MODES:
+                return web.Response(status=404, text=f"Unknown fault mode: {mode}")
+            self.fault_requests[mode] = self.fault_requests.get(mode, 0) + 1
+        # Read before the delay: a client that gave up meanwhile (a lost
+        # hedge) has closed the connection by then
+        payload = await request.json()
+        delay = max(random.gauss(self.latency, self.jitter), 0)
+        if random.random() < self.slow_rate or mode == "stalled":
+            delay = self.slow_latency
+        await asyncio.sleep(delay)
+        if mode in FAULT_STATUSES:
+            return web.Response(status=FAULT_STATUSES[mode], text=f"Injected {mode} endpoint")
+        if random.random() < self.fail_rate:
+            self.injected_failures += 1
+            return web.Response(status=503, text="Injected failure")
+        lagging = mode == "lagging"
+        if isinstance(payload, list):
+            return web.json_response([self._dispatch(item, lagging) for item in payload])
+        return web.json_response(self._dispatch(payload, lagging))
+
+    async def handle_price(self, request):
+        self.price_requests += 1
+        await asyncio.sleep(max(random.gauss(self.latency, self.jitter), 0))
+        if random.random() < self.fail_rate:
+            self.injected_failures += 1
+            return web.Response(status=503, text="Injected failure")
+        ids = [provider_id for provider_id in request.query.get("ids", "").split(",") if provider_id in MOCK_PRICES]
+        currency = request.query.get("vs_currencies", "usd")
+        return web.json_response({provider_id: {currency: MOCK_PRICES[provider_id]} for provider_id in ids})
+
+    async def handle_stats(self, request):
+        return web.json_response({
+            "block_number": self.block_number,
+            "http_requests": self.http_requests,
+            "rpc_calls": sum(self.calls.values()),
+            "calls_by_method": self.calls,
+            "injected_failures": self.injected_failures,
+            "fault_requests": self.fault_requests,
+            "transactions": len(self.transactions),
+            "price_requests": self.price_requests,
+        })
+
+    async def handle_reset_stats(self, request):
+        self.calls = {}
+        self.http_requests = 0
+        self.injected_failures = 0
+        self.fault_requests = {}
+        self.price_requests = 0
+        return web.json_response({"status": "ok"})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/", self.handle_rpc)
+        app.router.add_post("/fault/{mode}", self.handle_rpc)
+        app.router.add_get("/api/v3/simple/price", self.handle_price)
+        app.router.add_get("/stats", self.handle_stats)
+        app.router.add_post("/stats/reset", self.handle_reset_stats)
+
+        async def start_blocks(app):
+            app["blocks"] = asyncio.create_task(self.produce_blocks())
+
+        async def stop_blocks(app):
+            app["blocks"].cancel()
+
+        app.on_startup.append(start_blocks)
+        app.on_cleanup.append(stop_blocks)
+        return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mock Starknet JSON-RPC node for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mean response delay (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Std deviation of the delay (seconds)")
+    parser.add_argument("--block-time", type=float, default=2.0, help="Seconds between blocks")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of HTTP requests answered with 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of HTTP requests delayed by --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=2.0, help="Delay of slow requests and of /fault/stalled")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    node = MockNode(
+        latency=args.latency,
+        jitter=args.jitter,
+        block_time=args.block_time,
+        fail_rate=args.fail_rate,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+    )
+    web.run_app(node.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+from mock_node import ACCOUNT_CLASS_HASH, ETH_CONTRACT, FAULT_MODES, POOL_CONTRACT, STRK_CONTRACT
+import aiohttp
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+# Constants
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ["balances", "price", "transfer", "gift", "stake", "create-deploy"]
+# Throwaway treasury for the spawned backend; the mock checks no signatures
+BENCH_WALLET_ADDRESS = "0x0b3c4f00d5e7a1e0b3c4f00d5e7a1e0b3c4f00d5e7a1e0b3c4f00d5e7a1e0"
+BENCH_PRIVATE_KEY = "0x5eed"
+STARTUP_TIMEOUT = 30
+# Metrics compared against a baseline: (key, True when higher is better)
+COMPARED_METRICS = [("p50_ms", False), ("p99_ms", False), ("requests_per_s", True)]
+
+
+def _random_address():
+    return hex(random.getrandbits(251))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class Bench:
+    # Drives the backend over HTTP at a fixed concurrency and reads the mock
+    # node's call counters around each scenario
+
+    def __init__(self, session, api_url, node_url, concurrency):
+        self.session = session
+        self.api_url = api_url.rstrip("/")
+        self.node_url = node_url.rstrip("/") if node_url else None
+        self.concurrency = concurrency
+        self.senders = []
+
+    async def node_stats(self, reset=False):
+        if self.node_url is None:
+            return None
+        if reset:
+            async with self.session.post(f"{self.node_url}/stats/reset") as response:
+                response.raise_for_status()
+        async with self.session.get(f"{self.node_url}/stats") as response:
+            return await response.json()
+
+    async def request(self, method, path, **kwargs):
+        start = time.perf_counter()
+        async with self.session.request(method, f"{self.api_url}{path}", **kwargs) as response:
+            body = await response.json(content_type=None)
+            return response.status, body, time.perf_counter() - start
+
+    def build(self, scenario, i):
+        # (method, path, kwargs) for the i-th request of a scenario
+        headers = {"Idempotency-Key": uuid.uuid4().hex}
+        if scenario == "balances":
+            addresses = ",".join([BENCH_WALLET_ADDRESS] + [_random_address() for _ in range(4)])
+            return "GET", "/balances", {"params": {"addresses": addresses}}
+        if scenario == "price":
+            return "GET", "/price", {"params": {"symbols": "ETH,STRK"}}
+        if scenario == "transfer":
+            body = {"address": _random_address(), "amount_strk": 0.001}
+            return "POST", "/execute-transfer", {"json": body, "headers": headers}
+        if scenario == "gift":
+            body = {"address": _random_address(), "amount_strk": 0.001, "from_address": self.senders[i % len(self.senders)]}
+            return "POST", "/send-gift", {"json": body, "headers": headers}
+        if scenario == "stake":
+            return "POST", "/stake", {"json": {"amount_strk": 0.01, "validator_address": POOL_CONTRACT}}
+        if scenario == "create-deploy":
+            return "POST", "/create-deploy", {}
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+    async def setup(self, scenarios):
+        # Gifts are sent from child accounts, one per worker so they do not
+        # all queue behind a single sender
+        if "gift" in scenarios and not self.senders:
+            for _ in range(min(self.concurrency, 8)):
+                status, body, _ = await self.request("POST", "/create-deploy", params={"wait": "true"})
+                if status != 200:
+                    raise Exception(f"Could not create a gift sender: {status} {body}")
+                self.senders.append(body["data"]["address"])
+
+    async def run(self, scenario, requests):
+        await self.node_stats(reset=True)
+        latencies = []
+        statuses = {}
+        errors = []
+        queue = asyncio.Queue()
+        for i in range(requests):
+            queue.put_nowait(i)
+
+        async def worker():
+            while not queue.empty():
+                i = queue.get_nowait()
+                method, path, kwargs = self.build(scenario, i)
+                try:
+                    status, body, elapsed = await self.request(method, path, **kwargs)
+                except Exception as e:
+                    errors.append(repr(e))
+                    continue
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+                if status >= 400 and len(errors) < 5:
+                    errors.append(f"{status}: {body}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(self.concurrency)])
+        elapsed = time.perf_counter() - start
+        stats = await self.node_stats()
+
+        succeeded = statuses.get(200, 0)
+        result = {
+            "requests": requests,
+            "concurrency": self.concurrency,
+            "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            "succeeded": succeeded,
+            "elapsed_s": round(elapsed, 3),
+            "requests_per_s": round(succeeded / elapsed, 2) if elapsed else None,
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+            "errors": errors[:5],
+        }
+        if scenario not in ("balances", "price"):
+            # Every successful write answers with a submitted transaction
+            result["tx_per_s"] = result["requests_per_s"]
+        if stats is not None:
+            result["rpc_calls"] = stats["rpc_calls"]
+            result["rpc_calls_per_request"] = round(stats["rpc_calls"] / requests, 2)
+            result["rpc_http_requests"] = stats["http_requests"]
+            result["rpc_calls_by_method"] = stats["calls_by_method"]
+            result["price_requests"] = stats["price_requests"]
+            result["rpc_fault_requests"] = stats["fault_requests"]
+        return result
+
+    async def backend_stats(self):
+        # The backend's view of each node endpoint (breaker state, requests
+        # and failures) and of the history index, which a lagging endpoint
+        # must not make re-index
+        stats = {}
+        for key, path in (("transport", "/rpc/endpoints"), ("history_index", "/history-index/stats")):
+            async with self.session.get(f"{self.api_url}{path}") as response:
+                response.raise_for_status()
+                stats[key] = await response.json()
+        return stats
+
+
+def compare(results, baseline, max_regression):
+    # Lines describing every metric that got worse than the baseline by more
+    # than max_regression (a fraction)
+    regressions = []
+    for scenario, result in results.items():
+        previous = baseline.get(scenario)
+        if not previous:
+            continue
+        for key, higher_is_better in COMPARED_METRICS:
+            old, new = previous.get(key), result.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > max_regression:
+                regressions.append(f"{scenario} {key}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def print_table(results):
+    print(f"{'scenario':<15}{'ok/total':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'rpc/req':>10}")
+    for scenario, result in results.items():
+        print(
+            f"{scenario:<15}{str(result['succeeded']) + '/' + str(result['requests']):>10}"
+            f"{result['requests_per_s']!s:>10}{result['p50_ms']!s:>10}{result['p99_ms']!s:>10}"
+            f"{result.get('rpc_calls_per_request', '-')!s:>10}"
+        )
+        for error in result["errors"]:
+            print(f"  {error}")
+
+
+def print_backend_stats(stats):
+    transport, history_index = stats["transport"], stats["history_index"]
+    print(f"{'endpoint':<40}{'state':>10}{'requests':>10}{'failures':>10}")
+    for endpoint in transport["endpoints"]:
+        print(f"{endpoint['url']:<40}{endpoint['state']:>10}{endpoint['requests']:>10}{endpoint['failures']:>10}")
+    print(f"hedges {transport['hedges']}, retries {transport['retries']}, history index reorgs {history_index['reorgs']}")
+
+
+async def wait_until_up(session, url, process):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise Exception(f"{url} exited with code {process.returncode}")
+        try:
+            async with session.get(url) as response:
+                if response.status < 500:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise Exception(f"{url} did not start within {STARTUP_TIMEOUT}s")
+
+
+def spawn(args, workdir):
+    # Mock node plus a backend pointed at it, with state files in workdir
+    node_port, api_port = _free_port(), _free_port()
+    node = subprocess.Popen([
+        sys.executable, os.path.join(BENCH_DIR, "mock_node.py"),
+        "--port", str(node_port),
+        "--latency", str(args.latency),
+        "--block-time", str(args.block_time),
+        "--fail-rate", str(args.fail_rate),
+        "--slow-rate", str(args.slow_rate),
+        "--slow-latency", str(args.slow_latency),
+    ])
+    node_url = f"http://127.0.0.1:{node_port}"
+    # A faulty endpoint goes first, next to a healthy one on the same chain
+    node_urls = [f"{node_url}/fault/{args.faulty_endpoint}"] if args.faulty_endpoint else []
+    node_urls.append(node_url)
+    env = {
+        **os.environ,
+        "NODE_URL": node_url,
+        "NODE_URLS": ",".join(node_urls),
+        "WALLET_ADDRESS": BENCH_WALLET_ADDRESS,
+        "PRIVATE_KEY": BENCH_PRIVATE_KEY,
+        "STRK_CONTRACT_ADDRESS": STRK_CONTRACT,
+        "ETH_CONTRACT_ADDRESS": ETH_CONTRACT,
+        "VALIDATOR_ADDRESS": POOL_CONTRACT,
+        "ACCOUNT_CLASS_HASH": hex(ACCOUNT_CLASS_HASH),
+        "ACCOUNT_DB_FILE": os.path.join(workdir, "accounts.db"),
+        "JOB_DB_FILE": os.path.join(workdir, "jobs.db"),
+        "EVENT_DB_FILE": os.path.join(workdir, "events.db"),
+        "SCHEDULE_DB_FILE": os.path.join(workdir, "schedules.db"),
+        "ABI_CACHE_FILE": os.path.join(workdir, "abi_cache.json"),
+        "PRICE_API_URL": f"{node_url}/api/v3",
+        "LOG_LEVEL": args.log_level,
+    }
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(api_port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    return node, node_url, api, f"http://127.0.0.1:{api_port}"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the backend against a mock Starknet node")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma separated, from {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--spawn", action="store_true", help="Start a mock node and a backend instead of using --api/--node")
+    parser.add_argument("--api", default="http://127.0.0.1:8000", help="Backend URL")
+    parser.add_argument("--node", default=None, help="Mock node URL, for RPC call counts")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed slowdown vs the baseline (fraction)")
+    # Passed to the mock node with --spawn
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--block-time", type=float, default=2.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument(
+        "--faulty-endpoint", choices=FAULT_MODES,
+        help="Also give the backend a node endpoint that misbehaves this way, to exercise failover and breakers"
+    )
+    parser.add_argument("--fail-on-errors", action="store_true", help="Exit with 1 when any request did not succeed")
+    parser.add_argument("--log-level", default="WARNING", help="Backend LOG_LEVEL with --spawn")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    processes = []
+    workdir = tempfile.TemporaryDirectory(prefix="bench-")
+    timeout = aiohttp.ClientTimeout(total=120)
+    async with aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(limit=0)) as session:
+        try:
+            api_url, node_url = args.api, args.node
+            if args.spawn:
+                node, node_url, api, api_url = spawn(args, workdir.name)
+                processes = [api, node]
+                await wait_until_up(session, f"{node_url}/stats", node)
+                # /ready answers 503 until warm-up has finished
+                await wait_until_up(session, f"{api_url}/ready", api)
+
+            bench = Bench(session, api_url, node_url, args.concurrency)
+            await bench.setup(scenarios)
+            results = {}
+            for scenario in scenarios:
+                results[scenario] = await bench.run(scenario, args.requests)
+            backend_stats = await bench.backend_stats()
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait()
+            workdir.cleanup()
+
+    print_table(results)
+    print_backend_stats(backend_stats)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    if args.fail_on_errors and any(result["succeeded"] < result["requests"] for result in results.values()):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,242 @@
+from balances import get_balances
+from staking import staking_engine
+from read_cache import read_cache
+from tx_tracker import tracker
+from account_store import normalize_address
+from log_setup import get_logger
+from config import settings
+import asyncio
+
+logger = get_logger(__name__)
+
+# Constants
+# Head probe interval while at least one client is subscribed
+FEED_BLOCK_POLL = settings.feed_block_poll
+# Accounts and transactions one subscription may watch
+FEED_MAX_ACCOUNTS = settings.feed_max_accounts
+FEED_MAX_TRANSACTIONS = settings.feed_max_transactions
+# Messages buffered per client; a client that falls this far behind is
+# disconnected rather than holding memory
+FEED_QUEUE_SIZE = settings.feed_queue_size
+FEED_TOKENS = ("ETH", "STRK")
+
+
+class Subscription:
+    # One connected client: what it watches and its outgoing messages. A
+    # None in the queue means the feed dropped the client
+
+    def __init__(self):
+        self.accounts = set()
+        self.positions = False
+        self.transactions = set()
+        self.queue = asyncio.Queue(maxsize=FEED_QUEUE_SIZE)
+        self.closed = False
+
+    def send(self, message):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Dropping a feed client that stopped reading")
+            self.closed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class BlockFeed:
+    # Fans block-by-block updates out to any number of clients. One watcher
+    # probes the head while anyone is subscribed and, on each new block,
+    # reads the balances and delegation positions of the union of watched
+    # accounts once (one batch through the block read cache), then pushes
+    # only the values that changed to the clients watching them.
+    # Transaction statuses come from the tracker's own per-block poll. Node
+    # load is therefore per block and per watched account, not per client
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._balances = {}
+        self._positions = {}
+        self._task = None
+        self._wakeup = asyncio.Event()
+        self.block_number = None
+        self.blocks = 0
+        self.messages = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscription in list(self._subscriptions):
+            self.unsubscribe(subscription)
+
+    def _watched(self):
+        accounts, positions = set(), set()
+        for subscription in self._subscriptions:
+            accounts |= subscription.accounts
+            if subscription.positions:
+                positions |= subscription.accounts
+        return accounts, positions
+
+    async def subscribe(self, accounts=(), positions=False, transactions=()):
+        subscription = Subscription()
+        self._subscriptions.add(subscription)
+        try:
+            await self.update(subscription, accounts, positions, transactions)
+        except Exception:
+            self.unsubscribe(subscription)
+            raise
+        self.start()
+        self._wakeup.set()
+        return subscription
+
+    async def update(self, subscription, accounts=(), positions=False, transactions=()):
+        # Replaces what a subscription watches and sends it the current
+        # value of everything it did not watch before
+        accounts = {normalize_address(address) for address in accounts}
+        transactions = {int(tx_hash, 16) for tx_hash in transactions}
+        if len(accounts) > FEED_MAX_ACCOUNTS:
+            raise ValueError(f"At most {FEED_MAX_ACCOUNTS} accounts per subscription")
+        if len(transactions) > FEED_MAX_TRANSACTIONS:
+            raise ValueError(f"At most {FEED_MAX_TRANSACTIONS} transactions per subscription")
+
+        new_accounts = accounts - subscription.accounts
+        if not positions:
+            new_positions = set()
+        elif not subscription.positions:
+            new_positions = accounts
+        else:
+            new_positions = new_accounts
+        new_transactions = transactions - subscription.transactions
+        subscription.accounts, subscription.positions, subscription.transactions = accounts, positions, transactions
+        self._forget_unwatched()
+
+        block_number = self.block_number or await read_cache.current_block()
+        await self._refresh(
+            [address for address in new_accounts if address not in self._balances],
+            [address for address in new_positions if address not in self._positions],
+            block_number
+        )
+        for address in new_accounts:
+            if address in self._balances:
+                subscription.send(self._balance_message(address, self._balances[address], block_number))
+        for address in new_positions:
+            if address in self._positions:
+                subscription.send(self._position_message(address, self._positions[address], block_number))
+        for tx_hash in new_transactions:
+            record = tracker.get(tx_hash)
+            if record is None:
+                # Not submitted by this process (or since forgotten): have
+                # the tracker follow it like our own
+                record = tracker.track(hex(tx_hash), "watched")
+            subscription.send({"type": "transaction", **record})
+
+    def unsubscribe(self, subscription):
+        self._subscriptions.discard(subscription)
+        self._forget_unwatched()
+
+    def _forget_unwatched(self):
+        accounts, positions = self._watched()
+        self._balances = {address: value for address, value in self._balances.items() if address in accounts}
+        self._positions = {address: value for address, value in self._positions.items() if address in positions}
+
+    def _balance_message(self, address, balances, block_number):
+        return {"type": "balances", "block_number": block_number, "address": address, "balances": balances}
+
+    def _position_message(self, address, positions, block_number):
+        return {"type": "positions", "block_number": block_number, "address": address, "positions": positions}
+
+    async def _refresh(self, accounts, positions, block_number):
+        # Reads the given accounts at block_number; returns the addresses
+        # whose balances and positions changed
+        balances_result, positions_result = await asyncio.gather(
+            get_balances(accounts, FEED_TOKENS, block_number) if accounts else asyncio.sleep(0),
+            staking_engine.get_positions(positions) if positions else asyncio.sleep(0),
+        )
+        changed_balances, changed_positions = [], []
+        if balances_result is not None:
+            for address, balances in balances_result["balances"].items():
+                # Keep the last good value rather than pushing a read error
+                if any("error" in value for value in balances.values()) and address in self._balances:
+                    continue
+                if self._balances.get(address) != balances:
+                    self._balances[address] = balances
+                    changed_balances.append(address)
+        if positions_result is not None:
+            by_account = {}
+            for position in positions_result:
+                by_account.setdefault(position["account_address"], []).append(position)
+            for address, account_positions in by_account.items():
+                if any("error" in position for position in account_positions) and address in self._positions:
+                    continue
+                if self._positions.get(address) != account_positions:
+                    self._positions[address] = account_positions
+                    changed_positions.append(address)
+        return changed_balances, changed_positions
+
+    async def _on_block(self, block_number):
+        accounts, positions = self._watched()
+        changed_balances, changed_positions = await self._refresh(sorted(accounts), sorted(positions), block_number)
+        self.block_number = block_number
+        self.blocks += 1
+        for subscription in list(self._subscriptions):
+            messages = [{"type": "block", "block_number": block_number}]
+            messages += [
+                self._balance_message(address, self._balances[address], block_number)
+                for address in changed_balances if address in subscription.accounts
+            ]
+            if subscription.positions:
+                messages += [
+                    self._position_message(address, self._positions[address], block_number)
+                    for address in changed_positions if address in subscription.accounts
+                ]
+            for message in messages:
+                subscription.send(message)
+            self.messages += len(messages)
+
+    def on_transaction_update(self, record):
+        tx_hash = int(record["transaction_hash"], 16)
+        for subscription in self._subscriptions:
+            if tx_hash in subscription.transactions:
+                subscription.send({"type": "transaction", **record})
+                self.messages += 1
+
+    async def _run(self):
+        while True:
+            try:
+                if not self._subscriptions:
+                    # Nobody listening: no RPC until someone subscribes
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                block_number = await read_cache.current_block()
+                if block_number != self.block_number:
+                    await self._on_block(block_number)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Error refreshing subscriptions: {e}")
+            await asyncio.sleep(FEED_BLOCK_POLL)
+
+    def stats(self):
+        accounts, positions = self._watched()
+        return {
+            "subscribers": len(self._subscriptions),
+            "watched_accounts": len(accounts),
+            "watched_positions": len(positions),
+            "block_number": self.block_number,
+            "blocks": self.blocks,
+            "messages": self.messages,
+        }
+
+
+block_feed = BlockFeed()
+tracker.add_listener(block_feed.on_transaction_update)
@@ -0,0 +1,207 @@
+from CreateAcc import generate_account_data
+from batch_transfer import transfer_batch, BATCH_MAX_CALLS_PER_TX
+from deployAcc import deploy_after_funding
+from tx_tracker import tracker, wait_for_tx
+from node_client import registry
+from account_store import account_store
+from job_queue import job_queue
+from log_setup import get_logger
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+from config import settings
+import json
+
+logger = get_logger(__name__)
+
+# Constants
+BULK_MAX_ACCOUNTS = settings.bulk_max_accounts
+# Processes generating keypairs and counterfactual addresses
+BULK_KEYGEN_WORKERS = settings.bulk_keygen_workers
+# Accounts generated per task sent to a worker process
+BULK_KEYGEN_CHUNK = settings.bulk_keygen_chunk
+# Deployments being signed and submitted at the same time
+BULK_DEPLOY_CONCURRENCY = settings.bulk_deploy_concurrency
+BULK_FUND_AMOUNT_ETH = settings.bulk_fund_amount_eth
+# Funding multicalls sent for the same accounts before giving up
+BULK_FUND_MAX_ATTEMPTS = settings.bulk_fund_max_attempts
+BULK_FUND_JOB_PRIORITY = 0
+
+
+def _generate_chunk(count):
+    # Runs in a worker process
+    return [generate_account_data() for _ in range(count)]
+
+
+def account_line(account_data, **extra):
+    # Public fields of a provisioned account, one NDJSON line
+    line = {
+        "address": account_data["address"],
+        "public_key": account_data["public_key"],
+        "parent": account_data["parent"],
+        "status": account_data["status"],
+        **extra,
+    }
+    return json.dumps(line) + "\n"
+
+
+def funding_batches(accounts, size=BATCH_MAX_CALLS_PER_TX):
+    # Addresses grouped into one funding multicall each
+    addresses = [account["address"] for account in accounts]
+    return [addresses[i:i + size] for i in range(0, len(addresses), size)]
+
+
+class BulkProvisioner:
+    # Creates child accounts in bulk: keypairs and addresses are computed in
+    # a process pool and stored in one transaction; funding goes out as
+    # multicalls of up to BATCH_MAX_CALLS_PER_TX transfers and deployments
+    # follow each confirmed funding, at most BULK_DEPLOY_CONCURRENCY
+    # submissions at a time
+
+    def __init__(self, store=account_store, queue=job_queue):
+        self.store = store
+        self.queue = queue
+        self._executor = None
+        self._deploy_slots = asyncio.Semaphore(BULK_DEPLOY_CONCURRENCY)
+        self._tasks = set()
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=BULK_KEYGEN_WORKERS)
+        return self._executor
+
+    def start(self):
+        # Deploy accounts whose funding or deployment was cut short by a
+        # restart, including claimed onboarding accounts
+        for status in ("funding", "funded"):
+            for account_data in self.store.list_by_status(status):
+                self._spawn(self._deploy(account_data))
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def drain(self):
+        # Wait for every funding and deployment started so far
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def generate(self, count):
+        loop = asyncio.get_running_loop()
+        sizes = [min(BULK_KEYGEN_CHUNK, count - i) for i in range(0, count, BULK_KEYGEN_CHUNK)]
+        chunks = await asyncio.gather(*[
+            loop.run_in_executor(self._pool(), _generate_chunk, size) for size in sizes
+        ])
+        return [account_data for chunk in chunks for account_data in chunk]
+
+    async def create(self, count, parent=None):
+        if not 0 < count <= BULK_MAX_ACCOUNTS:
+            raise ValueError(f"count must be between 1 and {BULK_MAX_ACCOUNTS}")
+        accounts = await self.generate(count)
+        stored = self.store.add_many(accounts, parent=parent or settings.wallet_address)
+        logger.info(f"Created {len(stored)} accounts", extra={"parent": stored[0]["parent"]})
+        return stored
+
+    def enqueue_funding(self, addresses, attempt=1):
+        # One "bulk-fund" job, on the treasury's lane
+        return self.queue.enqueue(
+            "bulk-fund",
+            {"addresses": addresses, "attempt": attempt},
+            account=settings.treasury_address,
+            priority=BULK_FUND_JOB_PRIORITY
+        )
+
+    async def fund(self, addresses, attempt=1):
+        # Funds the accounts still in "created" with one multicall; accounts
+        # already funding or funded are skipped, so a retried job never
+        # funds twice
+        accounts = [self.store.get(address) for address in addresses]
+        accounts = [account_data for account_data in accounts if account_data and account_data["status"] == "created"]
+        if not accounts:
+            return {"transaction_hash": None, "accounts": 0}
+        results = await transfer_batch(
+            [
+                {"address": account_data["address"], "amount": BULK_FUND_AMOUNT_ETH, "token": "ETH"}
+                for account_data in accounts
+            ],
+            max_calls_per_tx=len(accounts),
+            wait=False
+        )
+        if results[0]["status"] == "failed":
+            raise Exception(f"Funding failed: {results[0]['error']}")
+        tx_hash = results[0]["transaction_hash"]
+        for account_data in accounts:
+            self.store.transition(account_data["address"], "funding", funding_tx_hash=tx_hash)
+        tracker.track(tx_hash, "bulk-fund", accounts=len(accounts))
+        self._spawn(self._settle_funding(tx_hash, [account_data["address"] for account_data in accounts], attempt))
+        return {"transaction_hash": tx_hash, "accounts": len(accounts)}
+
+    async def _settle_funding(self, tx_hash, addresses, attempt=1):
+        try:
+            await wait_for_tx(tx_hash)
+        except Exception as e:
+            logger.error(f"Funding transaction {tx_hash} failed: {e}")
+            addresses = [address for address in addresses if self.store.transition(address, "created")]
+            if not addresses:
+                return
+            # The job that sent it has already succeeded, so queue another
+            if attempt < BULK_FUND_MAX_ATTEMPTS:
+                job = self.enqueue_funding(addresses, attempt + 1)
+                tracker.update(tx_hash, funding_error=str(e), retry_job_id=job["id"])
+            else:
+                logger.error(f"Gave up funding {len(addresses)} accounts after {attempt} attempts")
+                tracker.update(tx_hash, funding_error=f"{e}; gave up after {attempt} attempts")
+            return
+        for address in addresses:
+            self.store.transition(address, "funded")
+            self._spawn(self._deploy(self.store.get(address)))
+
+    async def _deploy(self, account_data):
+        await deploy_after_funding(account_data, submit_slots=self._deploy_slots)
+
+
+bulk_provisioner = BulkProvisioner()
+
+
+async def run_bulk_fund_job(payload):
+    # One funding multicall; deployments follow in the background
+    return await bulk_provisioner.fund(payload["addresses"], payload.get("attempt", 1))
+
+
+job_queue.register("bulk-fund", run_bulk_fund_job)
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create child accounts in bulk")
+    parser.add_argument("count", type=int)
+    parser.add_argument("--parent", help="Parent address, the treasury wallet by default")
+    parser.add_argument("--fund", action="store_true", help="Fund and deploy the accounts, and wait until done")
+    args = parser.parse_args(argv)
+
+    accounts = await bulk_provisioner.create(args.count, args.parent)
+    for account_data in accounts:
+        print(account_line(account_data), end="")
+    if args.fund:
+        tracker.start()
+        try:
+            for addresses in funding_batches(accounts):
+                await bulk_provisioner.fund(addresses)
+            await bulk_provisioner.drain()
+        finally:
+            await tracker.stop()
+            await registry.close()
+    await bulk_provisioner.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,56 +1,34 @@
-from starknet_py.net.full_node_client import FullNodeClient
-from starknet_py.contract import Contract
+from node_client import rpc_call
+from balances import balance_of_request, get_balances, parse_u256
 import asyncio
-from starknet_py.net.account.account import Account
-from starknet_py.net.signer.stark_curve_signer import KeyPair
-from starknet_py.net.models import StarknetChainId
-from dotenv import load_dotenv
-import os
-
-# Load environment variables
-load_dotenv()
+from config import settings
 
 # Get environment variables
-NODE_URL = os.getenv("NODE_URL")
 # WALLET_ADDRESS = os.getenv("WALLET_ADDRESS")
 WALLET_ADDRESS = "0x75642f63d8eab5519e7130d929844b40cf102553ed3a3359ceef1a7beada861"
-STRK_CONTRACT_ADDRESS = os.getenv("STRK_CONTRACT_ADDRESS")
-ETH_CONTRACT_ADDRESS = os.getenv("ETH_CONTRACT_ADDRESS")
+STRK_CONTRACT_ADDRESS = settings.strk_contract_address
+ETH_CONTRACT_ADDRESS = settings.eth_contract_address
 
-async def get_token_balance(client, contract_address, wallet_address):
+async def get_token_balance(contract_address, wallet_address, block_number="latest"):
     try:
-        contract = await Contract.from_address(contract_address, client)
-        response = await contract.functions["balanceOf"].call(wallet_address)
+        # Raw balanceOf call, no Contract/ABI needed
+        method, params = balance_of_request(contract_address, wallet_address, block_number)
+        response = await rpc_call(method, params)
         # Convert balance to readable units (assuming 18 decimals)
-        return response["balance"] / (10 ** 18)
+        return parse_u256(response) / (10 ** 18)
     except Exception as e:
         print(f"Error fetching balance for contract {contract_address}: {e}")
         return 0
 
 async def main():
-    # Initialize client with Sepolia
-    client = FullNodeClient(node_url=NODE_URL)
-    
     try:
-        # Create account instance
-        account = Account(
-            client=client,
-            address=WALLET_ADDRESS,
-            key_pair=KeyPair(private_key=0, public_key=0),
-            chain=StarknetChainId.SEPOLIA,
-        )
-        
-        # Get ETH balance
-        eth_balance = await account.get_balance()
-        eth_balance_in_eth = eth_balance / (10 ** 18)
-        
-        # Get STRK balance
-        strk_balance = await account.get_balance(STRK_CONTRACT_ADDRESS)
-        strk_balance_in_strk = strk_balance / (10 ** 18)
+        # ETH and STRK balances in one batched request
+        result = await get_balances([WALLET_ADDRESS], ("ETH", "STRK"))
+        balances = result["balances"][WALLET_ADDRESS]
         
         print(f"Wallet: {WALLET_ADDRESS}")
-        print(f"ETH Balance: {eth_balance_in_eth} ETH")
-        print(f"STRK Balance: {strk_balance_in_strk} STRK")
+        print(f"ETH Balance: {balances['ETH']['balance']} ETH")
+        print(f"STRK Balance: {balances['STRK']['balance']} STRK")
     except Exception as e:
         print(f"Error getting balance: {e}")
 
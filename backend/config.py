@@ -0,0 +1,182 @@
+from dataclasses import dataclass, fields
+from typing import Optional, Tuple, Union, get_args, get_origin
+from dotenv import load_dotenv
+import os
+
+# Load environment variables, once for the whole backend
+load_dotenv()
+
+
+def _parse(annotation, raw):
+    if get_origin(annotation) is Union:
+        # Optional[X]
+        annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+    if get_origin(annotation) is tuple:
+        return tuple(item.strip() for item in raw.split(",") if item.strip())
+    return annotation(raw)
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Every setting of the backend, read from the environment (and .env)
+    # once at import. Each field is filled from the upper-cased variable of
+    # the same name; unset or empty variables keep the default
+
+    # Treasury wallet and network
+    wallet_address: Optional[str] = None
+    private_key: Optional[str] = None
+    node_url: Optional[str] = None
+    # Comma separated; falls back to the single NODE_URL
+    node_urls: Tuple[str, ...] = ()
+    strk_contract_address: str = "0x04718f5a0fc34cc1af16a1cdee98ffb20c31f5cd61d6ab07201858f4287c938d"
+    eth_contract_address: str = "0x049d36570d4e46f48e99674bd3fcc84644ddd6b96f7c741b1562b82f9e004dc7"
+    # Class of the child accounts; their addresses derive from it, so
+    # accounts created under another class will not deploy
+    account_class_hash: str = "0x04d07e40e93398ed3c76981e72dd1fd22557a78ce36c0515f679e27f0bb5bc5f"
+    validator_address: str = "0x00f5857f8976347f66a56b6da5de85784b2b12d7722eba29e1ff659cb04b57e7"
+
+    # Local state
+    account_db_file: str = "accounts.db"
+    job_db_file: str = "jobs.db"
+    event_db_file: str = "events.db"
+    abi_cache_file: str = "abi_cache.json"
+    abi_cache_revalidate: float = 300.0
+
+    # Logging
+    log_level: str = "INFO"
+    log_format: str = "json"
+
+    # Node connections and RPC transport
+    node_pool_limit: int = 100
+    node_pool_limit_per_host: int = 50
+    node_keepalive_timeout: float = 60.0
+    node_request_timeout: float = 30.0
+    node_batch_limit: int = 100
+    rpc_retries: int = 2
+    rpc_retry_base: float = 0.2
+    rpc_hedge_delay: float = 0.5
+    rpc_breaker_failures: int = 5
+    rpc_breaker_cooldown: float = 30.0
+
+    # Transaction tracking, caches and sends
+    tx_poll_min_interval: float = 1.0
+    tx_poll_max_interval: float = 10.0
+    tx_poll_backoff: float = 1.5
+    tx_track_timeout: float = 900.0
+    tx_retention: float = 3600.0
+    read_cache_block_poll: float = 2.0
+    read_cache_max_entries: int = 10000
+    fee_cache_blocks: int = 10
+    fee_safety_multiplier: float = 1.5
+    fee_batch_window: float = 0.01
+    nonce_retries: int = 2
+    batch_max_calls_per_tx: int = 50
+
+    # Job queue
+    job_workers: int = 4
+    job_max_attempts: int = 3
+    job_retry_base: float = 2.0
+    job_retry_max: float = 60.0
+    job_idle_poll: float = 1.0
+    job_response_timeout: float = 30.0
+
+    # Accounts
+    onboarding_pool_size: int = 5
+    onboarding_refill_threshold: int = 2
+    onboarding_fund_amount_eth: float = 0.003
+    bulk_max_accounts: int = 1000
+    # Defaults to the CPU count
+    bulk_keygen_workers: Optional[int] = None
+    bulk_keygen_chunk: int = 25
+    bulk_deploy_concurrency: int = 4
+    # Defaults to ONBOARDING_FUND_AMOUNT_ETH
+    bulk_fund_amount_eth: Optional[float] = None
+    bulk_fund_max_attempts: int = 3
+
+    # Staking
+    default_stake_amount_strk: float = 1.0
+
+    # History indexer
+    indexer_block_range: int = 1000
+    indexer_chunk_size: int = 1000
+    indexer_poll_interval: float = 10.0
+    indexer_start_block: Optional[int] = None
+    indexer_reorg_depth: int = 20
+    indexer_key_filter_size: int = 100
+    indexer_pool_addresses: Tuple[str, ...] = ()
+
+    # Push updates
+    feed_block_poll: float = 2.0
+    feed_max_accounts: int = 100
+    feed_max_transactions: int = 100
+    feed_queue_size: int = 1000
+
+    # Transaction signing
+    # Defaults to the CPU count; 0 signs on the event loop
+    signer_workers: Optional[int] = None
+    signer_batch_window: float = 0.005
+    signer_batch_size: int = 16
+
+    # Price quotes
+    price_api_url: str = "https://api.coingecko.com/api/v3"
+    price_ttl: float = 60.0
+    price_max_stale: float = 3600.0
+    price_retry_interval: float = 10.0
+    price_request_timeout: float = 10.0
+
+    # Scheduled allowances
+    schedule_db_file: str = "schedules.db"
+    schedule_poll_interval: float = 2.0
+    schedule_min_interval: float = 60.0
+    schedule_max_due: int = 10000
+    schedule_max_catch_up: int = 52
+    schedule_job_payouts: int = 500
+    schedule_retry_delay: float = 300.0
+    schedule_max_failures: int = 5
+
+    # Warm-up
+    warmup_timeout: float = 30.0
+
+    def __post_init__(self):
+        if not self.node_urls and self.node_url:
+            object.__setattr__(self, "node_urls", (self.node_url,))
+        if self.bulk_keygen_workers is None:
+            object.__setattr__(self, "bulk_keygen_workers", os.cpu_count() or 1)
+        if self.signer_workers is None:
+            object.__setattr__(self, "signer_workers", os.cpu_count() or 1)
+        if self.bulk_fund_amount_eth is None:
+            object.__setattr__(self, "bulk_fund_amount_eth", self.onboarding_fund_amount_eth)
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        values = {}
+        errors = []
+        for field in fields(cls):
+            name = field.name.upper()
+            raw = environ.get(name)
+            if raw is None or raw.strip() == "":
+                continue
+            try:
+                values[field.name] = _parse(field.type, raw)
+            except ValueError as e:
+                errors.append(f"{name}: {e}")
+        if errors:
+            raise ValueError("Invalid configuration: " + "; ".join(errors))
+        return cls(**values)
+
+    @property
+    def treasury_address(self):
+        # Normalized WALLET_ADDRESS, or None when unset
+        return hex(int(self.wallet_address, 16)) if self.wallet_address else None
+
+    def missing(self):
+        # Settings the write path cannot work without
+        required = {
+            "WALLET_ADDRESS": self.wallet_address,
+            "PRIVATE_KEY": self.private_key,
+            "NODE_URLS or NODE_URL": self.node_urls,
+        }
+        return [name for name, value in required.items() if not value]
+
+
+settings = Settings.from_env()
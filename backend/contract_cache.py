@@ -0,0 +1,160 @@
+from starknet_py.net.client_models import SierraContractClass
+from node_client import get_client, registry
+from log_setup import get_logger
+from config import settings
+import asyncio
+import json
+import os
+import time
+
+logger = get_logger(__name__)
+
+# Constants
+ABI_CACHE_FILE = settings.abi_cache_file
+# How often (seconds) a cached entry re-checks the class hash on chain
+ABI_CACHE_REVALIDATE = settings.abi_cache_revalidate
+
+
+def _parse_address(address):
+    if isinstance(address, str):
+        return int(address, 16)
+    return address
+
+
+def _provider_key(provider):
+    # Accounts and clients are long-lived objects owned by node_client, and a
+    # cached Contract keeps its provider alive, so the id stays unique
+    return id(provider)
+
+
+class ContractCache:
+    # ABIs keyed by address -> (class hash, abi); Contract objects keyed by
+    # (address, class hash, provider) so hot paths never refetch or reparse
+
+    def __init__(self, snapshot_file=ABI_CACHE_FILE):
+        self.snapshot_file = snapshot_file
+        self._abis = {}
+        self._contracts = {}
+        self._locks = {}
+
+    def load_snapshot(self):
+        if not self.snapshot_file or not os.path.exists(self.snapshot_file):
+            return
+        try:
+            with open(self.snapshot_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable ABI snapshot {self.snapshot_file}: {e}")
+            return
+        now = time.monotonic()
+        for address, entry in data.items():
+            self._abis[int(address, 16)] = {
+                "class_hash": int(entry["class_hash"], 16),
+                "abi": entry["abi"],
+                "cairo_version": entry["cairo_version"],
+                "checked_at": now,
+            }
+
+    def save_snapshot(self):
+        if not self.snapshot_file:
+            return
+        data = {
+            hex(address): {
+                "class_hash": hex(entry["class_hash"]),
+                "abi": entry["abi"],
+                "cairo_version": entry["cairo_version"],
+            }
+            for address, entry in self._abis.items()
+        }
+        tmp_file = f"{self.snapshot_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_file, self.snapshot_file)
+
+    async def _fetch(self, address, class_hash=None):
+        client = await get_client()
+        if class_hash is None:
+            class_hash = await client.get_class_hash_at(contract_address=address)
+        contract_class = await client.get_class_by_hash(class_hash=class_hash)
+        if isinstance(contract_class, SierraContractClass):
+            abi, cairo_version = json.loads(contract_class.abi), 1
+        else:
+            abi, cairo_version = contract_class.abi, 0
+        self._abis[address] = {
+            "class_hash": class_hash,
+            "abi": abi,
+            "cairo_version": cairo_version,
+            "checked_at": time.monotonic(),
+        }
+        self.save_snapshot()
+
+    async def _revalidate(self, address, entry):
+        client = await get_client()
+        class_hash = await client.get_class_hash_at(contract_address=address)
+        if class_hash != entry["class_hash"]:
+            logger.info(f"Class hash changed for {hex(address)}, refreshing ABI")
+            self.invalidate(address)
+            await self._fetch(address, class_hash)
+        else:
+            entry["checked_at"] = time.monotonic()
+
+    async def get_abi_entry(self, address):
+        address = _parse_address(address)
+        entry = self._abis.get(address)
+        if entry is not None and time.monotonic() - entry["checked_at"] < ABI_CACHE_REVALIDATE:
+            return entry
+
+        lock = self._locks.setdefault(address, asyncio.Lock())
+        async with lock:
+            entry = self._abis.get(address)
+            if entry is None:
+                await self._fetch(address)
+            elif time.monotonic() - entry["checked_at"] >= ABI_CACHE_REVALIDATE:
+                await self._revalidate(address, entry)
+        return self._abis[address]
+
+    async def get_contract(self, address, provider):
+        address = _parse_address(address)
+        entry = await self.get_abi_entry(address)
+        key = (address, entry["class_hash"], _provider_key(provider))
+        contract = self._contracts.get(key)
+        if contract is None:
+            # Imported on first use; it pulls in most of starknet_py
+            from starknet_py.contract import Contract
+
+            contract = Contract(
+                address=address,
+                abi=entry["abi"],
+                provider=provider,
+                cairo_version=entry["cairo_version"],
+            )
+            self._contracts[key] = contract
+        return contract
+
+    def invalidate(self, address=None):
+        if address is None:
+            self._abis = {}
+            self._contracts = {}
+            return
+        address = _parse_address(address)
+        self._abis.pop(address, None)
+        self._contracts = {
+            key: contract for key, contract in self._contracts.items()
+            if key[0] != address
+        }
+
+    def forget_provider(self, provider):
+        provider_key = _provider_key(provider)
+        self._contracts = {
+            key: contract for key, contract in self._contracts.items()
+            if key[2] != provider_key
+        }
+
+
+contract_cache = ContractCache()
+# Contracts built on a dropped client or account are never handed out again
+registry.add_listener(contract_cache.forget_provider)
+
+
+async def get_contract(address, provider):
+    return await contract_cache.get_contract(address, provider)
@@ -1,51 +1,95 @@
-from starknet_py.net.account.account import Account
-from starknet_py.net.signer.stark_curve_signer import KeyPair
-from starknet_py.net.full_node_client import FullNodeClient
-from starknet_py.net.models import StarknetChainId
-import json
-from dotenv import load_dotenv
-import os
+from node_client import get_client
+from tx_tracker import tracker, wait_for_tx
+from account_store import account_store
+from log_setup import get_logger
+from signer import signer_pool
+from config import settings
+import dataclasses
 
-# Load environment variables
-load_dotenv()
+logger = get_logger(__name__)
 
 # Constants
-NODE_URL = os.getenv("NODE_URL")
-ACCOUNT_CLASS_HASH = "0x04d07e40e93398ed3c76981e72dd1fd22557a78ce36c0515f679e27f0bb5bc5f"
+ACCOUNT_CLASS_HASH = settings.account_class_hash
 
-async def deploy_contract():
-    # Load account details from JSON
-    with open('new_account.json', 'r') as file:
-        account_data = json.load(file)
+async def deploy_contract(account_data=None, wait=True):
+    # Deploy the most recently created account unless the caller passes one
+    if account_data is None:
+        account_data = account_store.latest()
+
+    from starknet_py.net.models.chains import StarknetChainId
+    from starknet_py.net.models.transaction import DeployAccountV1
     
-    # Initialize KeyPair from private key
+    # The address is derived from the public key with the private key as salt
+    address = int(account_data['address'], 16)
     private_key = int(account_data['private_key'], 16)
-    key_pair = KeyPair.from_private_key(private_key)
+    public_key = int(account_data['public_key'], 16)
     
-    # Connect to StarkNet
-    client = FullNodeClient(node_url=NODE_URL)
+    # Reuse the pooled client
+    client = await get_client()
     
     # Deploy the account contract with reduced max fee
-    deployment = await Account.deploy_account_v1(
-        address=int(account_data['address'], 16),
+    transaction = DeployAccountV1(
         class_hash=int(ACCOUNT_CLASS_HASH, 16),
-        salt=private_key,
-        key_pair=key_pair,
-        client=client,
-        constructor_calldata=[key_pair.public_key],
-        max_fee=int(0.001 * 1e18)  # Reduced from 1e16 to 0.001 ETH
+        contract_address_salt=private_key,
+        constructor_calldata=[public_key],
+        version=1,
+        max_fee=int(0.001 * 1e18),  # Reduced from 1e16 to 0.001 ETH
+        signature=[],
+        nonce=0
     )
+    # Hashing and signing run in the signer processes
+    signature = await signer_pool.sign(transaction, address, private_key, StarknetChainId.SEPOLIA)
+    deployment = await client.deploy_account(dataclasses.replace(transaction, signature=signature))
     
-    # Wait for transaction
-    await deployment.wait_for_acceptance()
+    account_data['deployment_tx_hash'] = hex(deployment.transaction_hash)
+    account_store.update(account_data['address'], deployment_tx_hash=hex(deployment.transaction_hash))
+    logger.info("Deployment submitted", extra={"tx_hash": hex(deployment.transaction_hash)})
     
-    # Update status in JSON file
-    account_data['status'] = 'deployed'
-    with open('new_account.json', 'w') as file:
-        json.dump(account_data, file, indent=4)
+    # Wait for transaction unless the caller tracks it itself
+    if wait:
+        await wait_for_tx(deployment.transaction_hash)
+        mark_deployed(account_data)
     
-    print(f"Account deployed successfully!")
-    print(f"Transaction hash: {hex(deployment.hash)}")
+    return hex(deployment.transaction_hash)
+
+def mark_deployed(account_data):
+    # Update status in the account store
+    if account_store.transition(account_data['address'], 'deployed'):
+        account_data['status'] = 'deployed'
+        logger.info("Account deployed", extra={"address": account_data['address']})
+    else:
+        logger.warning(f"Account {account_data['address']} was not in a deployable state")
+
+async def deploy_after_funding(account_data, submit_slots=None):
+    # Background half of /create-deploy: wait for the funding transfer, then
+    # submit and track the deployment. submit_slots (a semaphore) limits how
+    # many deployments are signed and sent at once
+    funding_tx_hash = account_data.get('funding_tx_hash')
+    try:
+        if not funding_tx_hash:
+            raise Exception("Account was not funded")
+        if account_data.get('status') != 'funded':
+            await wait_for_tx(funding_tx_hash)
+            account_store.transition(account_data['address'], 'funded')
+            account_data['status'] = 'funded'
+        
+        # A deployment sent before a restart is only waited on; sending the
+        # same one again would be refused
+        deploy_tx_hash = account_data.get('deployment_tx_hash')
+        if not deploy_tx_hash and submit_slots is None:
+            deploy_tx_hash = await deploy_contract(account_data, wait=False)
+        elif not deploy_tx_hash:
+            async with submit_slots:
+                deploy_tx_hash = await deploy_contract(account_data, wait=False)
+        tracker.track(deploy_tx_hash, "deploy", address=account_data['address'], touched=[account_data['address']])
+        tracker.update(funding_tx_hash, deployment_tx=deploy_tx_hash)
+        
+        await wait_for_tx(deploy_tx_hash)
+        mark_deployed(account_data)
+    except Exception as e:
+        logger.error(f"Error deploying account {account_data['address']}: {e}")
+        if funding_tx_hash:
+            tracker.update(funding_tx_hash, deployment_error=str(e))
 
 # Run the deployment
 if __name__ == "__main__":
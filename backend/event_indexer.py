@@ -0,0 +1,388 @@
+from starknet_py.hash.selector import get_selector_from_name
+from node_client import rpc_call
+from account_store import account_store, normalize_address
+from batch_transfer import TOKENS
+from staking import DEFAULT_VALIDATOR_ADDRESS
+from tx_tracker import tracker
+from log_setup import get_logger
+from config import settings
+import asyncio
+import json
+import sqlite3
+
+logger = get_logger(__name__)
+
+# Constants
+EVENT_DB_FILE = settings.event_db_file
+# Blocks covered by one getEvents filter, and events per page within it
+INDEXER_BLOCK_RANGE = settings.indexer_block_range
+INDEXER_CHUNK_SIZE = settings.indexer_chunk_size
+INDEXER_POLL_INTERVAL = settings.indexer_poll_interval
+# First block indexed on an empty database; the head at that time when unset
+INDEXER_START_BLOCK = settings.indexer_start_block
+# Blocks dropped and indexed again when the checkpointed block was reorged
+INDEXER_REORG_DEPTH = settings.indexer_reorg_depth
+# Managed addresses per key filter
+INDEXER_KEY_FILTER_SIZE = settings.indexer_key_filter_size
+# Delegation pools followed besides VALIDATOR_ADDRESS, comma separated
+INDEXER_POOL_ADDRESSES = settings.indexer_pool_addresses
+HISTORY_MAX_LIMIT = 200
+TRANSFER_SELECTOR = hex(get_selector_from_name("Transfer"))
+# Delegation pool events keyed by their pool member; the amount is the last
+# data felt of each
+POOL_EVENTS = {
+    hex(get_selector_from_name(name)): name
+    for name in (
+        "NewPoolMember",
+        "PoolMemberBalanceChanged",
+        "PoolMemberExitIntent",
+        "PoolMemberRewardClaimed",
+    )
+}
+HISTORY_FIELDS = (
+    "address", "block_number", "block_hash", "transaction_hash", "contract", "token",
+    "kind", "direction", "counterparty", "amount", "seq", "data",
+)
+
+
+def _hex(value):
+    return hex(int(value, 16))
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _transfer_rows(events, token, direction, managed):
+    # Rows for the managed side of each Transfer: the sender when following
+    # outgoing transfers, the recipient for incoming ones. seq numbers the
+    # account's transfers of one token and direction within a transaction so
+    # re-indexing the same blocks yields the same keys
+    rows = []
+    seen = {}
+    for event in events:
+        sender, recipient = _hex(event["keys"][1]), _hex(event["keys"][2])
+        address, counterparty = (sender, recipient) if direction == "out" else (recipient, sender)
+        if address not in managed:
+            continue
+        key = (event["transaction_hash"], address)
+        seen[key] = seen.get(key, -1) + 1
+        low, high = (int(value, 16) for value in event["data"][:2])
+        rows.append({
+            "address": address,
+            "block_number": event["block_number"],
+            "block_hash": event["block_hash"],
+            "transaction_hash": event["transaction_hash"],
+            "contract": _hex(event["from_address"]),
+            "token": token,
+            "kind": "transfer",
+            "direction": direction,
+            "counterparty": counterparty,
+            "amount": str(low + (high << 128)),
+            "seq": seen[key],
+            "data": None,
+        })
+    return rows
+
+
+def _pool_rows(events, managed):
+    rows = []
+    seen = {}
+    for event in events:
+        address = _hex(event["keys"][1])
+        if address not in managed:
+            continue
+        kind = POOL_EVENTS[_hex(event["keys"][0])]
+        key = (event["transaction_hash"], address, kind)
+        seen[key] = seen.get(key, -1) + 1
+        rows.append({
+            "address": address,
+            "block_number": event["block_number"],
+            "block_hash": event["block_hash"],
+            "transaction_hash": event["transaction_hash"],
+            "contract": _hex(event["from_address"]),
+            "token": "STRK",
+            "kind": kind,
+            "direction": None,
+            "counterparty": None,
+            "amount": str(int(event["data"][-1], 16)) if event["data"] else None,
+            "seq": seen[key],
+            "data": json.dumps({"keys": event["keys"][2:], "data": event["data"]}),
+        })
+    return rows
+
+
+class EventIndexer:
+    # Follows STRK/ETH Transfer events and delegation pool events of every
+    # managed account (the treasury and the account store) into a local
+    # SQLite history. Blocks are indexed in ranges of INDEXER_BLOCK_RANGE,
+    # with the events filtered by key on the node and paged through with
+    # continuation tokens; each range is written together with the block
+    # cursor, so a restart resumes after the last complete range. If the
+    # checkpointed block's hash changes, the last INDEXER_REORG_DEPTH blocks
+    # are dropped and indexed again
+
+    def __init__(self, db_file=EVENT_DB_FILE, store=account_store):
+        self.db_file = db_file
+        self.store = store
+        self._conn = None
+        self._task = None
+        self._wakeup = asyncio.Event()
+        self.head = None
+        self.reorgs = 0
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_file, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS history (
+                    id INTEGER PRIMARY KEY,
+                    address TEXT NOT NULL,
+                    block_number INTEGER NOT NULL,
+                    block_hash TEXT,
+                    transaction_hash TEXT NOT NULL,
+                    contract TEXT NOT NULL,
+                    token TEXT,
+                    kind TEXT NOT NULL,
+                    direction TEXT,
+                    counterparty TEXT,
+                    amount TEXT,
+                    seq INTEGER NOT NULL,
+                    data TEXT
+                )
+            """)
+            # Identity of an event, so re-indexed blocks are not stored twice
+            self._conn.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_history_event
+                ON history(address, transaction_hash, contract, kind, IFNULL(direction, ''), seq)
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_history_address ON history(address, block_number, id)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_history_block ON history(block_number)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS cursor (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    block_number INTEGER NOT NULL,
+                    block_hash TEXT
+                )
+            """)
+        return self._conn
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def cursor(self):
+        # (last indexed block, its hash or None), or None before the first run
+        row = self.conn.execute("SELECT block_number, block_hash FROM cursor WHERE id = 0").fetchone()
+        return (row["block_number"], row["block_hash"]) if row else None
+
+    def _write(self, rows, block_number, block_hash):
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO history ({', '.join(HISTORY_FIELDS)}) "
+                f"VALUES ({', '.join('?' for _ in HISTORY_FIELDS)})",
+                [tuple(row[field] for field in HISTORY_FIELDS) for row in rows]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO cursor (id, block_number, block_hash) VALUES (0, ?, ?)",
+                (block_number, block_hash)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def rewind(self, block_number):
+        # Forget everything indexed after block_number
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM history WHERE block_number > ?", (block_number,))
+            conn.execute(
+                "INSERT OR REPLACE INTO cursor (id, block_number, block_hash) VALUES (0, ?, NULL)",
+                (block_number,)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def managed_addresses(self):
+        addresses = set(self.store.addresses())
+        if settings.treasury_address:
+            addresses.add(settings.treasury_address)
+        return addresses
+
+    def pool_addresses(self):
+        return sorted({normalize_address(address) for address in [DEFAULT_VALIDATOR_ADDRESS, *INDEXER_POOL_ADDRESSES]})
+
+    async def _get_events(self, contract, keys, from_block, to_block):
+        events = []
+        token = None
+        while True:
+            event_filter = {
+                "from_block": {"block_number": from_block},
+                "to_block": {"block_number": to_block},
+                "address": contract,
+                "keys": keys,
+                "chunk_size": INDEXER_CHUNK_SIZE,
+            }
+            if token:
+                event_filter["continuation_token"] = token
+            page = await rpc_call("starknet_getEvents", {"filter": event_filter})
+            events.extend(page["events"])
+            token = page.get("continuation_token")
+            if not token:
+                return events
+
+    async def _collect(self, from_block, to_block, managed):
+        # One getEvents query per contract, key position and address chunk;
+        # managed addresses only ever appear in one chunk of a query
+        queries = []
+        for chunk in _chunks(sorted(managed), INDEXER_KEY_FILTER_SIZE):
+            for token, contract in TOKENS.items():
+                queries.append((contract, [[TRANSFER_SELECTOR], chunk], "transfer", token, "out"))
+                queries.append((contract, [[TRANSFER_SELECTOR], [], chunk], "transfer", token, "in"))
+            for pool in self.pool_addresses():
+                queries.append((pool, [list(POOL_EVENTS), chunk], "pool", None, None))
+        pages = await asyncio.gather(*[
+            self._get_events(contract, keys, from_block, to_block) for contract, keys, *_ in queries
+        ])
+        rows = []
+        for (_, _, source, token, direction), events in zip(queries, pages):
+            if source == "transfer":
+                rows.extend(_transfer_rows(events, token, direction, managed))
+            else:
+                rows.extend(_pool_rows(events, managed))
+        return rows
+
+    async def _block_hash(self, block_number):
+        block = await rpc_call("starknet_getBlockWithTxHashes", {"block_id": {"block_number": block_number}})
+        return block["block_hash"]
+
+    async def tick(self):
+        # Brings the index up to the current head; returns the blocks indexed
+        head = await rpc_call("starknet_blockHashAndNumber")
+        self.head = head["block_number"]
+        cursor = self.cursor()
+        if cursor is None:
+            start = INDEXER_START_BLOCK if INDEXER_START_BLOCK is not None else head["block_number"]
+            self.rewind(start - 1)
+            cursor = (start - 1, None)
+        block_number, block_hash = cursor
+
+        # A head behind the cursor usually comes from an endpoint that is a
+        # block or two behind; a reorg only shows as a different hash at a
+        # height the node has reached
+        if block_number > head["block_number"]:
+            return 0
+        if block_number == head["block_number"]:
+            if block_hash in (None, head["block_hash"]):
+                return 0
+            reorged = True
+        else:
+            reorged = block_hash is not None and await self._block_hash(block_number) != block_hash
+        if reorged:
+            self.reorgs += 1
+            block_number = max(block_number - INDEXER_REORG_DEPTH, -1)
+            logger.warning(f"Reorg detected at block {cursor[0]}, re-indexing from block {block_number + 1}")
+            self.rewind(block_number)
+
+        managed = self.managed_addresses()
+        indexed = 0
+        while block_number < head["block_number"]:
+            to_block = min(block_number + INDEXER_BLOCK_RANGE, head["block_number"])
+            rows = await self._collect(block_number + 1, to_block, managed) if managed else []
+            # Only the head's hash is known without another request; deeper
+            # checkpoints are past reorg range anyway
+            self._write(rows, to_block, head["block_hash"] if to_block == head["block_number"] else None)
+            indexed += to_block - block_number
+            block_number = to_block
+        return indexed
+
+    def on_transaction_update(self, record):
+        # Index our own transactions as soon as they are accepted
+        if record["status"] == "accepted":
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                indexed = await self.tick()
+                if indexed:
+                    logger.debug(f"Indexed {indexed} blocks up to {self.head}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Error indexing events: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=INDEXER_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def history(self, address, limit=50, before=None, kind=None):
+        # Newest first. before is the next_cursor of the previous page
+        address = normalize_address(address)
+        limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+        query = "SELECT * FROM history WHERE address = ?"
+        params = [address]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        if before:
+            block_number, row_id = (int(part) for part in before.split("-"))
+            query += " AND (block_number < ? OR (block_number = ? AND id < ?))"
+            params += [block_number, block_number, row_id]
+        query += " ORDER BY block_number DESC, id DESC LIMIT ?"
+        rows = self.conn.execute(query, (*params, limit + 1)).fetchall()
+
+        items = []
+        for row in rows[:limit]:
+            item = dict(row)
+            item["data"] = json.loads(item["data"]) if item["data"] else None
+            del item["id"], item["seq"], item["address"]
+            items.append(item)
+        cursor = self.cursor()
+        return {
+            "address": address,
+            "items": items,
+            "next_cursor": f"{rows[limit - 1]['block_number']}-{rows[limit - 1]['id']}" if len(rows) > limit else None,
+            "indexed_block": cursor[0] if cursor else None,
+        }
+
+    def lag(self):
+        # Blocks the index trails the last seen head by
+        cursor = self.cursor()
+        return max(self.head - cursor[0], 0) if cursor and self.head is not None else None
+
+    def stats(self):
+        cursor = self.cursor()
+        return {
+            "indexed_block": cursor[0] if cursor else None,
+            "head": self.head,
+            "lag": self.lag(),
+            "events": self.conn.execute("SELECT COUNT(*) FROM history").fetchone()[0],
+            "reorgs": self.reorgs,
+        }
+
+
+event_indexer = EventIndexer()
+tracker.add_listener(event_indexer.on_transaction_update)
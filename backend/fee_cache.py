@@ -0,0 +1,131 @@
+from starknet_py.net.client_models import ResourceBounds
+from read_cache import read_cache
+from signer import signer_pool
+from log_setup import get_logger
+from config import settings
+import asyncio
+
+logger = get_logger(__name__)
+
+# Constants
+# How many blocks a cached estimate stays usable
+FEE_CACHE_BLOCKS = settings.fee_cache_blocks
+# Safety margin applied to both the estimated amounts and unit prices
+FEE_SAFETY_MULTIPLIER = settings.fee_safety_multiplier
+# Estimates requested within this window (seconds) share one estimateFee call
+FEE_BATCH_WINDOW = settings.fee_batch_window
+FEE_ERROR_MARKERS = ("fee", "resource bounds", "max_amount", "max_price_per_unit", "insufficient")
+
+
+def is_fee_error(error):
+    message = str(error).lower()
+    return any(marker in message for marker in FEE_ERROR_MARKERS)
+
+
+def call_shape(calls):
+    # Calls with the same targets, selectors and calldata lengths cost
+    # (almost) the same, e.g. every single STRK transfer
+    return tuple((call.to_addr, call.selector, len(call.calldata)) for call in calls)
+
+
+class FeeCache:
+    # Resource bounds per call shape, reused for FEE_CACHE_BLOCKS blocks.
+    # Misses are queued and estimated together in one batched estimateFee
+    # request instead of one RPC per transaction
+
+    def __init__(self):
+        self._entries = {}
+        self._queue = []
+        self._flush_task = None
+        self._batches = set()
+        self.hits = 0
+        self.misses = 0
+        self.estimate_requests = 0
+
+    def invalidate(self, calls):
+        self._entries.pop(call_shape(calls), None)
+
+    async def resource_bounds(self, account, calls, nonce, fresh=False):
+        # Returns (l1_resource_bounds, from_cache)
+        shape = call_shape(calls)
+        block_number = await read_cache.current_block()
+        entry = self._entries.get(shape)
+        if not fresh and entry is not None and block_number - entry["block_number"] < FEE_CACHE_BLOCKS:
+            self.hits += 1
+            return entry["resource_bounds"], True
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append({"account": account, "calls": calls, "nonce": nonce, "future": future})
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+        estimated_fee = await future
+        resource_bounds = estimated_fee.to_resource_bounds(
+            amount_multiplier=FEE_SAFETY_MULTIPLIER,
+            unit_price_multiplier=FEE_SAFETY_MULTIPLIER
+        ).l1_gas
+        self._entries[shape] = {"resource_bounds": resource_bounds, "block_number": block_number}
+        return resource_bounds, False
+
+    async def _flush_later(self):
+        await asyncio.sleep(FEE_BATCH_WINDOW)
+        queue, self._queue = self._queue, []
+        # Misses queued while this batch is estimated start the next one
+        task = asyncio.create_task(self._resolve(queue))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _resolve(self, queue):
+        try:
+            estimates = await self._estimate(queue)
+        except Exception as e:
+            for item in queue:
+                if not item["future"].done():
+                    item["future"].set_exception(e)
+            return
+        for item, estimate in zip(queue, estimates):
+            if item["future"].done():
+                continue
+            if isinstance(estimate, Exception):
+                item["future"].set_exception(estimate)
+            else:
+                item["future"].set_result(estimate)
+
+    async def _prepare(self, item):
+        account = item["account"]
+        transaction = await account._prepare_invoke_v3(
+            calls=item["calls"],
+            l1_resource_bounds=ResourceBounds.init_with_zeros(),
+            nonce=item["nonce"]
+        )
+        return await signer_pool.sign_for_fee_estimate(account, transaction)
+
+    async def _estimate(self, queue):
+        transactions = await asyncio.gather(*[self._prepare(item) for item in queue])
+        client = queue[0]["account"].client
+        self.estimate_requests += 1
+        try:
+            estimates = await client.estimate_fee(transactions, block_number="pending")
+            return estimates if isinstance(estimates, list) else [estimates]
+        except Exception as e:
+            if len(transactions) == 1:
+                return [e]
+            # The node rejects the whole batch if one transaction fails to
+            # simulate; estimate separately so the others still go through
+            logger.warning(f"Batched fee estimate failed, estimating individually: {e}")
+            self.estimate_requests += len(transactions)
+            return await asyncio.gather(*[
+                client.estimate_fee(transaction, block_number="pending")
+                for transaction in transactions
+            ], return_exceptions=True)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "estimate_requests": self.estimate_requests,
+        }
+
+
+fee_cache = FeeCache()
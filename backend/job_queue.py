@@ -0,0 +1,343 @@
+from tx_tracker import tracker
+from log_setup import get_logger
+from config import settings
+import asyncio
+import contextvars
+import datetime
+import json
+import sqlite3
+import time
+import uuid
+
+logger = get_logger(__name__)
+
+# Constants
+JOB_DB_FILE = settings.job_db_file
+JOB_WORKERS = settings.job_workers
+JOB_MAX_ATTEMPTS = settings.job_max_attempts
+# Retry delay (seconds) doubles per attempt up to the max
+JOB_RETRY_BASE = settings.job_retry_base
+JOB_RETRY_MAX = settings.job_retry_max
+# Longest a worker sleeps before looking for due jobs again
+JOB_IDLE_POLL = settings.job_idle_poll
+# How long an endpoint waits for its job before answering with the job id
+JOB_RESPONSE_TIMEOUT = settings.job_response_timeout
+# "interrupted": a write failed or stopped after it may have reached the
+# node, so it is not run again automatically
+FINAL_JOB_STATUSES = {"succeeded", "failed", "interrupted"}
+# Columns added after the first release, created on older databases
+ADDED_COLUMNS = {
+    "sends_pending": "INTEGER NOT NULL DEFAULT 0",
+    "tx_hashes": "TEXT",
+}
+
+# Id of the job whose handler is running in this task
+_current_job = contextvars.ContextVar("current_job", default=None)
+
+
+class IdempotencyConflict(Exception):
+    # An idempotency key was reused for a different request
+    pass
+
+
+class JobQueue:
+    # Persistent queue for on-chain writes. A fixed pool of async workers
+    # runs the jobs, highest priority first, with at most one running job per
+    # account so a wallet's writes go out one after another. Failed jobs are
+    # retried with exponential backoff and jobs that were running when the
+    # process died are queued again on start, but only while none of their
+    # transactions may have reached the node. Past that point a failure
+    # marks the job interrupted; its recorded transactions settle it once
+    # they are final, and without them it is left for review
+
+    def __init__(self, db_file=JOB_DB_FILE, workers=JOB_WORKERS):
+        self.db_file = db_file
+        self.workers = workers
+        self._conn = None
+        self._handlers = {}
+        self._tasks = []
+        self._busy_accounts = set()
+        self._running = set()
+        # Transaction hash -> interrupted job waiting on it
+        self._tx_jobs = {}
+        self._waiters = {}
+        self._wakeup = asyncio.Event()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_file, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    account TEXT,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    idempotency_key TEXT UNIQUE,
+                    result TEXT,
+                    error TEXT,
+                    run_after REAL NOT NULL,
+                    created_at TEXT,
+                    updated_at TEXT
+                )
+            """)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)").fetchall()}
+            for column, definition in ADDED_COLUMNS.items():
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs(status, priority, run_after)")
+        return self._conn
+
+    def register(self, kind, handler):
+        # handler(payload) -> JSON-serializable result
+        self._handlers[kind] = handler
+
+    def start(self):
+        # Crash recovery: nothing is running right after start. Jobs that
+        # never sent anything run again; the others may have paid already
+        now = datetime.datetime.now().isoformat()
+        self.conn.execute(
+            "UPDATE jobs SET status = 'queued', updated_at = ? "
+            "WHERE status = 'running' AND sends_pending = 0 AND tx_hashes IS NULL",
+            (now,)
+        )
+        interrupted = self.conn.execute(
+            "UPDATE jobs SET status = 'interrupted', error = ?, updated_at = ? WHERE status = 'running'",
+            ("Stopped after sending a transaction", now)
+        ).rowcount
+        if interrupted:
+            logger.warning(f"{interrupted} jobs were cut short by a restart after sending and are not run again")
+        # The tracker starts empty: follow what they sent
+        for row in self.conn.execute(
+            "SELECT * FROM jobs WHERE status = 'interrupted' AND sends_pending = 0 AND tx_hashes IS NOT NULL"
+        ).fetchall():
+            self._follow(self._job(row))
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["tx_hashes"] = json.loads(job["tx_hashes"]) if job["tx_hashes"] else []
+        return job
+
+    def get(self, job_id):
+        return self._job(self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def counts(self):
+        rows = self.conn.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["count"] for row in rows}
+
+    def get_by_key(self, idempotency_key):
+        return self._job(self.conn.execute(
+            "SELECT * FROM jobs WHERE idempotency_key = ?", (idempotency_key,)
+        ).fetchone())
+
+    def enqueue(self, kind, payload, account=None, priority=0, idempotency_key=None, max_attempts=JOB_MAX_ATTEMPTS):
+        # Returns the new job, or the existing one for a repeated idempotency
+        # key, so duplicates share one job and one transaction
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = datetime.datetime.now().isoformat()
+        job_id = uuid.uuid4().hex
+        cursor = self.conn.execute(
+            """
+            INSERT OR IGNORE INTO jobs (
+                id, kind, payload, account, priority, status, max_attempts,
+                idempotency_key, run_after, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?, ?, ?)
+            """,
+            (job_id, kind, json.dumps(payload), account, priority, max_attempts,
+             idempotency_key, time.time(), now, now)
+        )
+        if cursor.rowcount == 0:
+            return self._existing(idempotency_key, kind, payload, account, priority)
+        self._wakeup.set()
+        return self.get(job_id)
+
+    def _existing(self, idempotency_key, kind, payload, account, priority):
+        job = self.get_by_key(idempotency_key)
+        if job["status"] == "failed":
+            # Nothing was paid (jobs that may have paid end up interrupted
+            # instead), so a retry with the same key runs again
+            self._update(
+                job["id"], kind=kind, payload=json.dumps(payload), account=account, priority=priority,
+                status="queued", attempts=0, error=None, run_after=time.time()
+            )
+            self._wakeup.set()
+            return self.get(job["id"])
+        if job["kind"] != kind or job["payload"] != json.loads(json.dumps(payload)):
+            raise IdempotencyConflict(f"Idempotency key {idempotency_key} was already used for a different request")
+        return job
+
+    async def wait(self, job_id, timeout=None):
+        # Resolves with the job once it succeeded or failed for good
+        job = self.get(job_id)
+        if job is None or job["status"] in FINAL_JOB_STATUSES:
+            return job
+        future = self._waiters.get(job_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters[job_id] = future
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = datetime.datetime.now().isoformat()
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        self.conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _claim_next(self):
+        query = "SELECT * FROM jobs WHERE status = 'queued' AND run_after <= ?"
+        busy = sorted(self._busy_accounts)
+        if busy:
+            # In the query rather than after it, so a backlog of one busy
+            # account cannot hide every other account's jobs
+            query += f" AND (account IS NULL OR account NOT IN ({', '.join('?' for _ in busy)}))"
+        row = self.conn.execute(
+            query + " ORDER BY priority DESC, rowid LIMIT 1", (time.time(), *busy)
+        ).fetchone()
+        if row is None:
+            return None
+        self._update(row["id"], status="running", attempts=row["attempts"] + 1)
+        if row["account"] is not None:
+            self._busy_accounts.add(row["account"])
+        return self.get(row["id"])
+
+    def send_started(self):
+        # Called right before a transaction goes to the node. Returns the
+        # job it belongs to, to pass to send_finished, or None outside jobs
+        job_id = _current_job.get()
+        if job_id not in self._running:
+            return None
+        self.conn.execute(
+            "UPDATE jobs SET sends_pending = sends_pending + 1, updated_at = ? WHERE id = ?",
+            (datetime.datetime.now().isoformat(), job_id)
+        )
+        return job_id
+
+    def send_finished(self, job_id, tx_hash=None):
+        # The node answered the send: accepted as tx_hash, or refused (None).
+        # A send with no answer is never finished and keeps the job from
+        # being run again
+        if job_id is None:
+            return
+        job = self.get(job_id)
+        tx_hashes = [*job["tx_hashes"], tx_hash] if tx_hash else job["tx_hashes"]
+        self._update(
+            job_id,
+            sends_pending=job["sends_pending"] - 1,
+            tx_hashes=json.dumps(tx_hashes) if tx_hashes else None
+        )
+
+    def _follow(self, job):
+        for tx_hash in job["tx_hashes"]:
+            self._tx_jobs[tx_hash] = job["id"]
+            tracker.track(tx_hash, "job", job_id=job["id"])
+
+    def on_transaction_update(self, record):
+        job_id = self._tx_jobs.get(record["transaction_hash"])
+        if job_id is None or record["status"] == "submitted":
+            return
+        job = self.get(job_id)
+        records = [tracker.get(tx_hash) for tx_hash in job["tx_hashes"]]
+        statuses = {record["status"] if record else "submitted" for record in records}
+        if "submitted" in statuses:
+            return
+        for tx_hash in job["tx_hashes"]:
+            self._tx_jobs.pop(tx_hash, None)
+        if statuses == {"accepted"}:
+            result = {"transaction_hash": job["tx_hashes"][-1], "transaction_hashes": job["tx_hashes"], "reconciled": True}
+            self._update(job_id, status="succeeded", result=json.dumps(result), error=None)
+        elif statuses <= {"reverted", "rejected"}:
+            # Nothing was paid
+            self._update(job_id, status="failed", error=f"{job['error']}; transactions {', '.join(sorted(statuses))}")
+        else:
+            self._update(job_id, error=f"{job['error']}; transactions {', '.join(sorted(statuses))}, check before running again")
+            return
+        logger.info(f"Interrupted job {job_id} settled from its transactions", extra={"status": self.get(job_id)["status"]})
+
+    def _idle_timeout(self):
+        row = self.conn.execute("SELECT MIN(run_after) AS next FROM jobs WHERE status = 'queued'").fetchone()
+        if row["next"] is None:
+            return JOB_IDLE_POLL
+        return min(max(row["next"] - time.time(), 0.05), JOB_IDLE_POLL)
+
+    async def _worker(self):
+        while True:
+            try:
+                job = self._claim_next()
+                if job is None:
+                    self._wakeup.clear()
+                    # asyncio.wait rather than wait_for, which on Python 3.11
+                    # can swallow stop()'s cancel when the wakeup lands at
+                    # the same moment and leave the worker running
+                    waiter = asyncio.ensure_future(self._wakeup.wait())
+                    try:
+                        await asyncio.wait({waiter}, timeout=self._idle_timeout())
+                    finally:
+                        waiter.cancel()
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in job worker: {e}")
+                await asyncio.sleep(JOB_IDLE_POLL)
+
+    async def _run(self, job):
+        self._running.add(job["id"])
+        token = _current_job.set(job["id"])
+        try:
+            result = await self._handlers[job["kind"]](job["payload"])
+            self._update(job["id"], status="succeeded", result=json.dumps(result), error=None)
+        except asyncio.CancelledError:
+            # Shutdown: leave it running so the next start picks it up again
+            raise
+        except Exception as e:
+            sent = self.get(job["id"])
+            if sent["sends_pending"] or sent["tx_hashes"]:
+                # A retry could pay twice
+                logger.error(f"Job {job['id']} ({job['kind']}) failed after sending, not retried: {e}")
+                self._update(job["id"], status="interrupted", error=str(e))
+                if not sent["sends_pending"]:
+                    self._follow(sent)
+            elif job["attempts"] < job["max_attempts"]:
+                delay = min(JOB_RETRY_BASE * 2 ** (job["attempts"] - 1), JOB_RETRY_MAX)
+                logger.warning(f"Job {job['id']} ({job['kind']}) failed, retrying in {delay}s: {e}")
+                self._update(job["id"], status="queued", error=str(e), run_after=time.time() + delay)
+            else:
+                logger.error(f"Job {job['id']} ({job['kind']}) failed after {job['attempts']} attempts: {e}")
+                self._update(job["id"], status="failed", error=str(e))
+        finally:
+            _current_job.reset(token)
+            self._running.discard(job["id"])
+            self._busy_accounts.discard(job["account"])
+            # The account is free again, so its next job may now be runnable
+            self._wakeup.set()
+
+        future = self._waiters.get(job["id"])
+        finished = self.get(job["id"])
+        if future is not None and finished["status"] in FINAL_JOB_STATUSES:
+            del self._waiters[job["id"]]
+            if not future.done():
+                future.set_result(finished)
+
+
+job_queue = JobQueue()
+tracker.add_listener(job_queue.on_transaction_update)
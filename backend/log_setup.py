@@ -0,0 +1,56 @@
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import datetime
+import json
+import logging
+import queue
+import sys
+from config import settings
+
+# Constants
+LOG_LEVEL = settings.log_level
+# "json" for one JSON object per line, "text" for plain messages
+LOG_FORMAT = settings.log_format
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging():
+    # Handlers on the request path only put records on a queue; a listener
+    # thread formats and writes them, so logging never blocks the event loop
+    global _listener
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    setup_logging()
+    return logging.getLogger(name)
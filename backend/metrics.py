@@ -0,0 +1,126 @@
+from contextlib import contextmanager
+import time
+
+# Constants
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_metrics = []
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Metric:
+    # Minimal Prometheus-style metric: values keyed by a sorted tuple of
+    # label pairs, rendered in the text exposition format on scrape
+
+    kind = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(sorted(labels.items()))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_labels_text(key)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0, "count": 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry["counts"][i] += 1
+                break
+        entry["sum"] += value
+        entry["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, entry in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry["counts"]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels_text(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels_text(key + (('le', '+Inf'),))} {entry['count']}")
+            lines.append(f"{self.name}_sum{_labels_text(key)} {entry['sum']}")
+            lines.append(f"{self.name}_count{_labels_text(key)} {entry['count']}")
+        return lines
+
+
+def register_collector(collect):
+    # collect() -> list of (name, kind, documentation, [(labels dict, value)]),
+    # for state that is cheaper to read at scrape time than to track
+    _collectors.append(collect)
+
+
+def render():
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        try:
+            families = collect()
+        except Exception as e:
+            lines.append(f"# collector {getattr(collect, '__name__', collect)} failed: {e}")
+            continue
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels_text(tuple(sorted(labels.items())))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Latency of HTTP requests by method, route and status"
+)
+TRANSFER_PHASE_DURATION = Histogram(
+    "transfer_phase_duration_seconds",
+    "Time spent in each phase of a write: abi_fetch, balance_check, estimate, sign, send, confirm"
+)
+RPC_REQUESTS = Counter("rpc_requests_total", "JSON-RPC calls sent to the node by method")
+RPC_ENDPOINT_LATENCY = Histogram("rpc_endpoint_latency_seconds", "Latency of successful node requests by endpoint")
+RPC_ERRORS = Counter("rpc_errors_total", "Transient JSON-RPC transport failures by endpoint")
+NONCE_CONFLICTS = Counter("nonce_conflicts_total", "Transactions rejected by the node for their nonce")
+FEE_REESTIMATES = Counter("fee_reestimates_total", "Sends retried after a cached fee estimate was rejected")
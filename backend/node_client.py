@@ -0,0 +1,168 @@
+from starknet_py.net.client_errors import ClientError
+from rpc_transport import FailoverRpcHttpClient, RpcTransport, NODE_URLS
+import aiohttp
+import asyncio
+from config import settings
+
+# Constants
+NODE_POOL_LIMIT = settings.node_pool_limit
+NODE_POOL_LIMIT_PER_HOST = settings.node_pool_limit_per_host
+NODE_KEEPALIVE_TIMEOUT = settings.node_keepalive_timeout
+NODE_REQUEST_TIMEOUT = settings.node_request_timeout
+# Max JSON-RPC calls packed into one HTTP batch request
+NODE_BATCH_LIMIT = settings.node_batch_limit
+
+
+def _parse_address(address):
+    if isinstance(address, str):
+        return int(address, 16)
+    return address
+
+
+class NodeRegistry:
+    # App-lifetime connection pool to the nodes plus a cache of Account
+    # objects, so requests reuse one aiohttp session and one KeyPair per
+    # address. All traffic goes through the failover transport
+
+    def __init__(self, node_urls=NODE_URLS):
+        self.node_urls = node_urls
+        self.session = None
+        self.transport = None
+        self.client = None
+        self._accounts = {}
+        self._listeners = []
+
+    def add_listener(self, callback):
+        # Called with every client or Account the registry drops, so caches
+        # holding objects bound to them can let go
+        self._listeners.append(callback)
+
+    def _drop_providers(self):
+        dropped = [*self._accounts.values(), self.client]
+        self._accounts = {}
+        for provider in dropped:
+            if provider is not None:
+                for callback in self._listeners:
+                    callback(provider)
+
+    async def start(self):
+        if self.session is not None and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=NODE_POOL_LIMIT,
+            limit_per_host=NODE_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=NODE_KEEPALIVE_TIMEOUT,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=NODE_REQUEST_TIMEOUT),
+        )
+        # starknet_py's client and account modules are slow to import, so
+        # they load here (first use or warm-up) rather than with the app
+        from starknet_py.net.full_node_client import FullNodeClient
+
+        # Accounts hold a reference to the client, so drop any built on an old one
+        self._drop_providers()
+        self.transport = RpcTransport(self.node_urls, self.session)
+        self.client = FullNodeClient(node_url=self.node_urls[0], session=self.session)
+        # FullNodeClient has no hook for a custom HTTP client, so swap it in
+        self.client._client = FailoverRpcHttpClient(self.transport)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+        self.session = None
+        self._drop_providers()
+        self.transport = None
+        self.client = None
+
+    async def get_client(self):
+        if self.client is None:
+            await self.start()
+        return self.client
+
+    async def get_account(self, address, private_key):
+        address = _parse_address(address)
+        account = self._accounts.get(address)
+        if account is None:
+            from starknet_py.net.account.account import Account
+            from starknet_py.net.models.chains import StarknetChainId
+            from starknet_py.net.signer.stark_curve_signer import KeyPair
+
+            client = await self.get_client()
+            account = Account(
+                client=client,
+                address=address,
+                key_pair=KeyPair.from_private_key(_parse_address(private_key)),
+                chain=StarknetChainId.SEPOLIA
+            )
+            self._accounts[address] = account
+        return account
+
+    async def _post_batch(self, calls):
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+            for i, (method, params) in enumerate(calls)
+        ]
+        body = await self.transport.post(payload)
+        if isinstance(body, dict):
+            # Nodes answer a rejected batch with a single error object
+            error = body.get("error", {})
+            raise ClientError(code=error.get("code"), message=error.get("message", str(body)))
+
+        by_id = {item.get("id"): item for item in body}
+        results = []
+        for i in range(len(calls)):
+            item = by_id.get(i)
+            if item is None:
+                results.append(ClientError(message="Missing response in batch"))
+            elif "error" in item:
+                results.append(ClientError(
+                    code=item["error"]["code"],
+                    message=item["error"]["message"],
+                    data=item["error"].get("data")
+                ))
+            else:
+                results.append(item["result"])
+        return results
+
+    async def rpc_batch(self, calls):
+        # calls: list of (method, params). Sends them as JSON-RPC batch requests
+        # of at most NODE_BATCH_LIMIT calls and returns, in order, each result
+        # or the ClientError for that call
+        if not calls:
+            return []
+        await self.get_client()
+        chunks = [calls[i:i + NODE_BATCH_LIMIT] for i in range(0, len(calls), NODE_BATCH_LIMIT)]
+        responses = await asyncio.gather(*[self._post_batch(chunk) for chunk in chunks])
+        return [result for chunk in responses for result in chunk]
+
+    async def rpc_call(self, method, params=None):
+        result = (await self.rpc_batch([(method, params or [])]))[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+registry = NodeRegistry()
+
+
+async def get_client():
+    return await registry.get_client()
+
+
+async def get_account(address, private_key):
+    return await registry.get_account(address, private_key)
+
+
+async def rpc_batch(calls):
+    return await registry.rpc_batch(calls)
+
+
+async def rpc_call(method, params=None):
+    return await registry.rpc_call(method, params)
+
+
+async def get_wallet_account():
+    # Treasury wallet configured in .env
+    return await registry.get_account(settings.wallet_address, settings.private_key)
@@ -0,0 +1,169 @@
+from starknet_py.hash.selector import get_selector_from_name
+from starknet_py.net.client_errors import ClientError
+from rpc_transport import RETRYABLE_STATUSES
+from tx_tracker import tracker
+from job_queue import job_queue
+from fee_cache import fee_cache, is_fee_error
+from signer import signer_pool
+from log_setup import get_logger
+import metrics
+from config import settings
+import asyncio
+
+logger = get_logger(__name__)
+
+# Constants
+NONCE_RETRIES = settings.nonce_retries
+NONCE_ERROR_MARKERS = ("nonce",)
+# Calls whose first calldata element is an account whose balance they change
+RECIPIENT_SELECTORS = {get_selector_from_name("transfer")}
+
+
+def _touched_addresses(account, calls):
+    touched = {hex(account.address)}
+    for call in calls:
+        if call.selector in RECIPIENT_SELECTORS and call.calldata:
+            touched.add(hex(call.calldata[0]))
+        else:
+            # State of non-token contracts (e.g. staking pools) may change
+            touched.add(hex(call.to_addr))
+    return sorted(touched)
+
+
+class SendOutcomeUnknown(Exception):
+    # The send failed without an answer from the node, which may still
+    # have the transaction; sending it again could pay twice
+    pass
+
+
+def _was_refused(error):
+    # The node answered the send with an error, so it does not have the
+    # transaction. Timeouts and dropped connections leave that open
+    return (
+        isinstance(error, ClientError)
+        and error.code is not None
+        and str(error.code) not in {str(status) for status in RETRYABLE_STATUSES}
+    )
+
+
+def _is_nonce_error(error):
+    message = str(error).lower()
+    return any(marker in message for marker in NONCE_ERROR_MARKERS)
+
+
+class NonceManager:
+    # Hands out nonces for one account from memory so several transactions
+    # from the same wallet can be signed concurrently. Sends still go out in
+    # nonce order: the node rejects a nonce ahead of the account's next one
+
+    def __init__(self, account):
+        self.account = account
+        self._lock = asyncio.Lock()
+        self._next_nonce = None
+        # Reserved nonces not yet sent or released, each with an event set
+        # once it is. Sent nonces are not kept: the chain nonce covers them
+        # once they land, and a send the sequencer rejects later must not
+        # hold its nonce forever
+        self._unsent = {}
+
+    async def _chain_nonce(self):
+        return await self.account.get_nonce(block_number="pending")
+
+    async def reserve(self):
+        async with self._lock:
+            if self._next_nonce is None:
+                self._next_nonce = await self._chain_nonce()
+            nonce = self._next_nonce
+            while nonce in self._unsent:
+                nonce += 1
+            self._unsent[nonce] = asyncio.Event()
+            self._next_nonce = nonce + 1
+            return nonce
+
+    async def wait_turn(self, nonce):
+        # Returns once every lower reserved nonce was sent or released
+        for lower, event in list(self._unsent.items()):
+            if lower < nonce:
+                await event.wait()
+
+    def done_sending(self, nonce):
+        event = self._unsent.pop(nonce, None)
+        if event is not None:
+            event.set()
+
+    def release(self, nonce):
+        # The nonce may not have reached the node and left a gap: the next
+        # reservation starts again from the chain nonce so it fills the gap
+        # instead of queueing behind it
+        self.done_sending(nonce)
+        self._next_nonce = None
+
+    async def resync(self):
+        async with self._lock:
+            self._next_nonce = await self._chain_nonce()
+
+
+_managers = {}
+
+
+def get_nonce_manager(account):
+    manager = _managers.get(account.address)
+    if manager is None or manager.account is not account:
+        manager = NonceManager(account)
+        _managers[account.address] = manager
+    return manager
+
+
+async def send_invoke_v3(account, calls, retries=NONCE_RETRIES):
+    # Sign and send with a locally reserved nonce and cached resource bounds.
+    # Resyncs and retries when the node rejects the nonce, and re-estimates
+    # when a cached fee estimate is rejected
+    manager = get_nonce_manager(account)
+    fresh_fee = False
+    for attempt in range(retries + 1):
+        nonce = await manager.reserve()
+        from_cache = False
+        try:
+            with metrics.TRANSFER_PHASE_DURATION.time(phase="estimate"):
+                resource_bounds, from_cache = await fee_cache.resource_bounds(account, calls, nonce, fresh=fresh_fee)
+            with metrics.TRANSFER_PHASE_DURATION.time(phase="sign"):
+                transaction = await signer_pool.sign_invoke_v3(account, calls, nonce, resource_bounds)
+            with metrics.TRANSFER_PHASE_DURATION.time(phase="send"):
+                await manager.wait_turn(nonce)
+                job_id = job_queue.send_started()
+                try:
+                    resp = await account.client.send_transaction(transaction)
+                except Exception as e:
+                    if _was_refused(e):
+                        job_queue.send_finished(job_id)
+                        raise
+                    raise SendOutcomeUnknown(str(e) or repr(e)) from e
+                job_queue.send_finished(job_id, hex(resp.transaction_hash))
+            manager.done_sending(nonce)
+        except (asyncio.CancelledError, SendOutcomeUnknown):
+            # Never retried here, whatever the error message says
+            manager.release(nonce)
+            raise
+        except Exception as e:
+            manager.release(nonce)
+            if _is_nonce_error(e):
+                metrics.NONCE_CONFLICTS.inc()
+            if attempt < retries and _is_nonce_error(e):
+                logger.warning(f"Nonce {nonce} rejected for {hex(account.address)}, resyncing: {e}")
+                continue
+            if attempt < retries and from_cache and is_fee_error(e):
+                logger.warning(f"Cached fee estimate rejected for {hex(account.address)}, re-estimating: {e}")
+                metrics.FEE_REESTIMATES.inc()
+                fee_cache.invalidate(calls)
+                fresh_fee = True
+                continue
+            raise
+        # Every invoke is tracked so its confirmation can invalidate cached
+        # reads of the accounts it touched
+        tracker.track(
+            resp.transaction_hash,
+            "invoke",
+            sender_address=hex(account.address),
+            touched=_touched_addresses(account, calls)
+        )
+        return resp
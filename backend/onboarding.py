@@ -0,0 +1,138 @@
+from CreateAcc import generate_account_data
+from batch_transfer import transfer_batch
+from deployAcc import deploy_after_funding
+from tx_tracker import wait_for_tx
+from account_store import account_store
+from log_setup import get_logger
+import asyncio
+from config import settings
+
+logger = get_logger(__name__)
+
+# Constants
+# Number of pre-created, pre-funded accounts kept ready for /create-deploy
+ONBOARDING_POOL_SIZE = settings.onboarding_pool_size
+# Refill once the ready accounts drop below this
+ONBOARDING_REFILL_THRESHOLD = settings.onboarding_refill_threshold
+# ETH sent to each new account to pay for its deployment
+ONBOARDING_FUND_AMOUNT_ETH = settings.onboarding_fund_amount_eth
+
+
+class OnboardingPool:
+    # Warm pool of counterfactual accounts that are already funded, so
+    # /create-deploy only has to hand one out and deploy it in the background.
+    # Pool accounts live in the account store with pooled=1 until claimed
+
+    def __init__(self, store=account_store):
+        self.store = store
+        self._refill_task = None
+        self._tasks = set()
+        # Background deployments of claimed accounts, by address
+        self._deployments = {}
+
+    def ready_count(self):
+        return len(self.store.list_pooled("funded"))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def start(self):
+        self.ensure_refill()
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def ensure_refill(self):
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = self._spawn(self.refill())
+
+    async def _settle_funding(self, tx_hash, addresses):
+        try:
+            await wait_for_tx(tx_hash)
+            status = "funded"
+        except Exception as e:
+            logger.error(f"Funding transaction {tx_hash} failed: {e}")
+            status = "created"
+        for address in addresses:
+            self.store.transition(address, status)
+
+    async def _fund(self, accounts):
+        # One multicall funds the whole refill batch
+        results = await transfer_batch(
+            [
+                {"address": account["address"], "amount": ONBOARDING_FUND_AMOUNT_ETH, "token": "ETH"}
+                for account in accounts
+            ],
+            wait=False
+        )
+        by_hash = {}
+        for account, result in zip(accounts, results):
+            if result["transaction_hash"]:
+                self.store.transition(account["address"], "funding", funding_tx_hash=result["transaction_hash"])
+                by_hash.setdefault(result["transaction_hash"], []).append(account["address"])
+        await asyncio.gather(*[
+            self._settle_funding(tx_hash, addresses) for tx_hash, addresses in by_hash.items()
+        ])
+
+    async def refill(self):
+        try:
+            # Finish funding left over from a previous run before adding more
+            unfinished = {}
+            for account in self.store.list_pooled("funding"):
+                unfinished.setdefault(account["funding_tx_hash"], []).append(account["address"])
+            await asyncio.gather(*[
+                self._settle_funding(tx_hash, addresses) for tx_hash, addresses in unfinished.items()
+            ])
+
+            if self.ready_count() >= ONBOARDING_REFILL_THRESHOLD and not unfinished:
+                return
+            missing = ONBOARDING_POOL_SIZE - len(self.store.list_pooled())
+            if missing > 0:
+                logger.info(f"Refilling onboarding pool with {missing} accounts")
+                self.store.add_many([generate_account_data() for _ in range(missing)], pooled=True)
+            unfunded = self.store.list_pooled("created")
+            if unfunded:
+                await self._fund(unfunded)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error refilling onboarding pool: {e}")
+
+    async def claim(self, parent=None):
+        # Hand out a ready account, or create and fund one on demand when the
+        # pool is empty; deployment always continues in the background
+        parent = parent or settings.wallet_address
+        account_data = self.store.claim_pooled(parent)
+        if account_data is None:
+            logger.warning("Onboarding pool is empty, creating an account on demand")
+            account_data = self.store.add(generate_account_data(), parent=parent)
+            results = await transfer_batch(
+                [{"address": account_data["address"], "amount": ONBOARDING_FUND_AMOUNT_ETH, "token": "ETH"}],
+                wait=False
+            )
+            if results[0]["status"] == "failed":
+                raise Exception(f"Funding failed: {results[0]['error']}")
+            account_data = self.store.update(account_data["address"], funding_tx_hash=results[0]["transaction_hash"])
+
+        address = account_data["address"]
+        task = self._spawn(deploy_after_funding(account_data))
+        self._deployments[address] = task
+        task.add_done_callback(lambda _: self._deployments.pop(address, None))
+        if self.ready_count() < ONBOARDING_REFILL_THRESHOLD:
+            self.ensure_refill()
+        return account_data
+
+    async def wait_deployed(self, address):
+        # Wait for the background deployment of a claimed account
+        task = self._deployments.get(address)
+        if task is not None:
+            await asyncio.shield(task)
+        return self.store.get(address)
+
+
+onboarding_pool = OnboardingPool()
@@ -0,0 +1,149 @@
+from log_setup import get_logger
+from config import settings
+import aiohttp
+import asyncio
+import datetime
+import time
+
+logger = get_logger(__name__)
+
+# Constants
+# CoinGecko compatible API; point it at a local stand-in for tests
+PRICE_API_URL = settings.price_api_url
+# Quotes younger than this (seconds) are served without a refresh
+PRICE_TTL = settings.price_ttl
+# Older quotes are not served at all
+PRICE_MAX_STALE = settings.price_max_stale
+# Wait after a failed upstream request before trying again
+PRICE_RETRY_INTERVAL = settings.price_retry_interval
+PRICE_REQUEST_TIMEOUT = settings.price_request_timeout
+PRICE_CURRENCY = "usd"
+# Provider ids of the symbols quoted
+PRICE_IDS = {"ETH": "ethereum", "STRK": "starknet"}
+
+
+class PriceUnavailable(Exception):
+    pass
+
+
+class PriceOracle:
+    # USD quotes per symbol, kept in memory. Fresh quotes are served as is;
+    # quotes older than PRICE_TTL are still served while one refresh runs in
+    # the background, and only requests with no usable quote wait for it.
+    # Every refresh fetches all symbols in a single upstream request and
+    # concurrent callers share it, so the upstream sees at most one request
+    # per PRICE_TTL however many clients poll
+
+    def __init__(self, api_url=PRICE_API_URL):
+        self.api_url = api_url.rstrip("/")
+        self.session = None
+        self._quotes = {}
+        self._refresh = None
+        self._attempted_at = None
+        self.last_error = None
+        self.fresh = 0
+        self.stale = 0
+        self.misses = 0
+        self.upstream_requests = 0
+        self.upstream_errors = 0
+
+    async def close(self):
+        if self._refresh is not None:
+            self._refresh.cancel()
+            await asyncio.gather(self._refresh, return_exceptions=True)
+            self._refresh = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _age(self, symbol):
+        quote = self._quotes.get(symbol)
+        return None if quote is None else time.monotonic() - quote["fetched_at"]
+
+    def _start_refresh(self):
+        # The running refresh, a new one, or None while backing off after
+        # a failure
+        if self._refresh is None or self._refresh.done():
+            if self.last_error is not None and time.monotonic() - self._attempted_at < PRICE_RETRY_INTERVAL:
+                return None
+            self._attempted_at = time.monotonic()
+            self._refresh = asyncio.create_task(self._fetch())
+        return self._refresh
+
+    async def _fetch(self):
+        self.upstream_requests += 1
+        try:
+            if self.session is None or self.session.closed:
+                self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=PRICE_REQUEST_TIMEOUT))
+            params = {"ids": ",".join(PRICE_IDS.values()), "vs_currencies": PRICE_CURRENCY}
+            async with self.session.get(f"{self.api_url}/simple/price", params=params) as response:
+                response.raise_for_status()
+                body = await response.json()
+            fetched_at = time.monotonic()
+            updated_at = datetime.datetime.now().isoformat()
+            for symbol, provider_id in PRICE_IDS.items():
+                price = (body.get(provider_id) or {}).get(PRICE_CURRENCY)
+                if price is not None:
+                    self._quotes[symbol] = {"price": float(price), "fetched_at": fetched_at, "updated_at": updated_at}
+            self.last_error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Callers keep getting the last quotes until they expire
+            self.upstream_errors += 1
+            self.last_error = str(e) or repr(e)
+            logger.warning(f"Price refresh failed: {self.last_error}")
+
+    def _quote(self, symbol):
+        quote = self._quotes[symbol]
+        age = self._age(symbol)
+        return {
+            "symbol": symbol,
+            "price": quote["price"],
+            "currency": PRICE_CURRENCY,
+            "age_seconds": round(age, 3),
+            "stale": age > PRICE_TTL,
+            "updated_at": quote["updated_at"],
+        }
+
+    async def get_quotes(self, symbols):
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        if not symbols:
+            raise ValueError("No symbols given")
+        unknown = [symbol for symbol in symbols if symbol not in PRICE_IDS]
+        if unknown:
+            raise ValueError(f"Unknown symbols: {', '.join(unknown)}; supported: {', '.join(PRICE_IDS)}")
+
+        ages = [self._age(symbol) for symbol in symbols]
+        if any(age is None or age > PRICE_MAX_STALE for age in ages):
+            self.misses += 1
+            refresh = self._start_refresh()
+            if refresh is not None:
+                # Shielded: a caller giving up must not cancel the shared refresh
+                await asyncio.shield(refresh)
+            missing = [
+                symbol for symbol in symbols
+                if self._age(symbol) is None or self._age(symbol) > PRICE_MAX_STALE
+            ]
+            if missing:
+                raise PriceUnavailable(f"No price for {', '.join(missing)}: {self.last_error}")
+        elif any(age > PRICE_TTL for age in ages):
+            self.stale += 1
+            self._start_refresh()
+        else:
+            self.fresh += 1
+        return {symbol: self._quote(symbol) for symbol in symbols}
+
+    def stats(self):
+        return {
+            "symbols": {symbol: round(self._age(symbol), 3) for symbol in self._quotes},
+            "fresh": self.fresh,
+            "stale": self.stale,
+            "misses": self.misses,
+            "upstream_requests": self.upstream_requests,
+            "upstream_errors": self.upstream_errors,
+            "last_error": self.last_error,
+        }
+
+
+price_oracle = PriceOracle()
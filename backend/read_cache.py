@@ -0,0 +1,158 @@
+from node_client import rpc_call
+from tx_tracker import tracker
+from config import settings
+import asyncio
+import time
+
+# Constants
+# How long (seconds) the latest block number is trusted before re-probing
+READ_CACHE_BLOCK_POLL = settings.read_cache_block_poll
+READ_CACHE_MAX_ENTRIES = settings.read_cache_max_entries
+
+
+def _normalize(value):
+    if isinstance(value, str) and value.startswith("0x"):
+        return hex(int(value, 16))
+    if isinstance(value, int):
+        return hex(value)
+    return value
+
+
+def make_key(contract, selector, args=()):
+    return (_normalize(contract), selector, tuple(_normalize(arg) for arg in args))
+
+
+class BlockReadCache:
+    # Read results keyed by (contract, selector, args) and tied to the block
+    # they were read at. A new block or a confirmed transaction of ours
+    # touching an address invalidates them; identical in-flight reads share
+    # one request
+
+    def __init__(self):
+        self._entries = {}
+        self._inflight = {}
+        self.block_number = None
+        self._block_checked_at = 0
+        self._block_probe = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def observe_block(self, block_number):
+        self._block_checked_at = time.monotonic()
+        if block_number != self.block_number:
+            self.block_number = block_number
+            # Results read at older blocks can no longer be served as latest
+            self._entries = {
+                key: value for key, value in self._entries.items() if key[0] >= block_number
+            }
+
+    async def current_block(self):
+        if self.block_number is not None and time.monotonic() - self._block_checked_at < READ_CACHE_BLOCK_POLL:
+            return self.block_number
+        if self._block_probe is None:
+            self._block_probe = asyncio.ensure_future(rpc_call("starknet_blockNumber"))
+        try:
+            block_number = await asyncio.shield(self._block_probe)
+        finally:
+            self._block_probe = None
+        self.observe_block(block_number)
+        return block_number
+
+    async def get_many(self, keys, fetch_many, block_number=None):
+        # fetch_many(missing_keys) returns values in the same order; an
+        # Exception value is returned to the caller but never cached
+        if block_number is None:
+            block_number = await self.current_block()
+        results = {}
+        waiting = {}
+        missing = []
+        for key in keys:
+            cache_key = (block_number, key)
+            if cache_key in self._entries:
+                self.hits += 1
+                results[key] = self._entries[cache_key]
+            elif cache_key in self._inflight:
+                self.coalesced += 1
+                waiting[key] = self._inflight[cache_key]
+            elif key not in missing:
+                self.misses += 1
+                missing.append(key)
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            for key, future in futures.items():
+                self._inflight[(block_number, key)] = future
+            try:
+                values = await fetch_many(missing)
+                for key, value in zip(missing, values):
+                    results[key] = value
+                    if not isinstance(value, Exception) and block_number == self.block_number:
+                        self._store((block_number, key), value)
+                    futures[key].set_result(value)
+            except Exception as e:
+                for future in futures.values():
+                    if not future.done():
+                        future.set_exception(e)
+                # Mark the exception as retrieved for futures nobody awaits
+                for future in futures.values():
+                    future.exception()
+                raise
+            finally:
+                for key in missing:
+                    self._inflight.pop((block_number, key), None)
+
+        for key, future in waiting.items():
+            results[key] = await asyncio.shield(future)
+        return [results[key] for key in keys]
+
+    async def get(self, key, fetch, block_number=None):
+        async def fetch_many(_):
+            return [await fetch()]
+        return (await self.get_many([key], fetch_many, block_number))[0]
+
+    def _store(self, cache_key, value):
+        if len(self._entries) >= READ_CACHE_MAX_ENTRIES:
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[cache_key] = value
+
+    def invalidate_address(self, address):
+        address = _normalize(address)
+        before = len(self._entries)
+        self._entries = {
+            key: value for key, value in self._entries.items()
+            if key[1][0] != address and address not in key[1][2]
+        }
+        self.invalidations += before - len(self._entries)
+        # Our transaction landed, so the head has moved: re-probe next read
+        self._block_checked_at = 0
+
+    def on_transaction_update(self, record):
+        if record["status"] not in ("accepted", "reverted"):
+            return
+        for address in record.get("touched", []):
+            self.invalidate_address(address)
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "block_number": self.block_number,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0,
+        }
+
+
+read_cache = BlockReadCache()
+tracker.add_listener(read_cache.on_transaction_update)
+
+
+async def cached_call(contract, function_name, *args):
+    # Contract view call served from the block cache
+    key = make_key(contract.address, function_name, args)
+    return await read_cache.get(key, lambda: contract.functions[function_name].call(*args))
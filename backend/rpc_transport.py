@@ -0,0 +1,242 @@
+from starknet_py.net.client_errors import ClientError
+from starknet_py.net.http_client import RpcHttpClient
+import metrics
+import aiohttp
+import asyncio
+from config import settings
+import random
+import time
+
+# Constants
+# Comma separated node endpoints; falls back to the single NODE_URL
+NODE_URLS = list(settings.node_urls)
+RPC_RETRIES = settings.rpc_retries
+# Full-jitter backoff base (seconds), doubled per retry
+RPC_RETRY_BASE = settings.rpc_retry_base
+# A read still running after this many seconds is also sent to a second node
+RPC_HEDGE_DELAY = settings.rpc_hedge_delay
+# Consecutive transient failures that open an endpoint's circuit, and how
+# long (seconds) it stays open before one trial request is let through
+RPC_BREAKER_FAILURES = settings.rpc_breaker_failures
+RPC_BREAKER_COOLDOWN = settings.rpc_breaker_cooldown
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Assumed latency of an endpoint that has not answered yet
+DEFAULT_LATENCY = 0.2
+WRITE_METHODS = {
+    "starknet_addInvokeTransaction",
+    "starknet_addDeployAccountTransaction",
+    "starknet_addDeclareTransaction",
+}
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TransientError(Exception):
+    # Failure worth retrying on another endpoint. sent is False when the
+    # node cannot have processed the request
+    def __init__(self, endpoint, error, sent=True):
+        super().__init__(str(error))
+        self.endpoint = endpoint
+        self.error = error
+        self.sent = sent
+
+
+class Endpoint:
+    # One node URL with its latency histogram, EWMA latency and breaker
+
+    def __init__(self, url):
+        self.url = url
+        self.latency = None
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= RPC_BREAKER_COOLDOWN:
+            return "half-open"
+        return "open"
+
+    def available(self):
+        state = self.state
+        return state == "closed" or (state == "half-open" and not self.trial_in_flight)
+
+    def weight(self):
+        return 1 / max(self.latency or DEFAULT_LATENCY, 0.001)
+
+    def record_success(self, elapsed):
+        self.requests += 1
+        self.latency_sum += elapsed
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+        metrics.RPC_ENDPOINT_LATENCY.observe(elapsed, endpoint=self.url)
+        self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        metrics.RPC_ERRORS.inc(endpoint=self.url)
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= RPC_BREAKER_FAILURES or self.opened_at is not None:
+            # Open, or re-open after a failed half-open trial
+            self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "state": self.state,
+            "latency_ewma": self.latency,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_histogram": {
+                **{str(bound): count for bound, count in zip(LATENCY_BUCKETS, self.buckets)},
+                "+Inf": self.buckets[-1],
+            },
+            "latency_sum": self.latency_sum,
+        }
+
+
+class RpcTransport:
+    # Sends JSON-RPC payloads to the healthiest of several nodes: endpoints
+    # are picked at random weighted by inverse latency, skipping open
+    # circuits; reads are hedged to a second node after RPC_HEDGE_DELAY and
+    # transient failures are retried elsewhere with jittered backoff
+
+    def __init__(self, urls, session):
+        if not urls:
+            raise ValueError("No node URL configured (NODE_URLS or NODE_URL)")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.session = session
+        self.hedges = 0
+        self.retries = 0
+
+    def _choose(self, exclude=(), write=False):
+        candidates = [e for e in self.endpoints if e not in exclude and e.available()]
+        if write:
+            # A write that reached a node is never resent, so it skips
+            # endpoints whose last request failed while others are healthy
+            candidates = [e for e in candidates if not e.consecutive_failures] or candidates
+        if not candidates:
+            # Every circuit is open: try the one that opened longest ago
+            # rather than failing without a request
+            others = [e for e in self.endpoints if e not in exclude] or self.endpoints
+            endpoint = min(others, key=lambda e: e.opened_at or 0)
+        else:
+            endpoint = random.choices(candidates, weights=[e.weight() for e in candidates])[0]
+        if endpoint.state == "half-open":
+            endpoint.trial_in_flight = True
+        return endpoint
+
+    async def _post_once(self, endpoint, payload):
+        start = time.monotonic()
+        try:
+            async with self.session.post(endpoint.url, json=payload) as response:
+                if response.status in RETRYABLE_STATUSES:
+                    error = ClientError(code=str(response.status), message=await response.text())
+                    endpoint.record_failure()
+                    # A 429 is refused before any processing
+                    raise TransientError(endpoint, error, sent=response.status != 429)
+                if response.status >= 300:
+                    endpoint.record_success(time.monotonic() - start)
+                    raise ClientError(code=str(response.status), message=await response.text())
+                body = await response.json(content_type=None)
+        except aiohttp.ClientConnectorError as e:
+            endpoint.record_failure()
+            raise TransientError(endpoint, ClientError(message=f"{endpoint.url}: {e}"), sent=False)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            endpoint.record_failure()
+            raise TransientError(endpoint, ClientError(message=f"{endpoint.url}: {e!r}"))
+        except asyncio.CancelledError:
+            # Lost a hedge race; not a verdict on the endpoint
+            endpoint.trial_in_flight = False
+            raise
+        endpoint.record_success(time.monotonic() - start)
+        return body
+
+    async def _hedged(self, payload, exclude):
+        primary_endpoint = self._choose(exclude)
+        tasks = {asyncio.ensure_future(self._post_once(primary_endpoint, payload))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=RPC_HEDGE_DELAY)
+            if not done and len(self.endpoints) - len(exclude) > 1:
+                self.hedges += 1
+                secondary_endpoint = self._choose(set(exclude) | {primary_endpoint})
+                tasks.add(asyncio.ensure_future(self._post_once(secondary_endpoint, payload)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def post(self, payload):
+        # payload: one JSON-RPC request or a batch; returns the decoded body
+        items = payload if isinstance(payload, list) else [payload]
+        read_only = all(item["method"] not in WRITE_METHODS for item in items)
+        for item in items:
+            metrics.RPC_REQUESTS.inc(method=item["method"])
+        tried = set()
+        for attempt in range(RPC_RETRIES + 1):
+            try:
+                if read_only:
+                    return await self._hedged(payload, tried)
+                return await self._post_once(self._choose(tried, write=True), payload)
+            except TransientError as e:
+                # A write the node may already have accepted is not resent:
+                # the nonce manager would see the nonce as used and re-sign,
+                # sending the transfer twice
+                if attempt == RPC_RETRIES or (not read_only and e.sent):
+                    raise e.error
+                self.retries += 1
+                tried.add(e.endpoint)
+                if len(tried) == len(self.endpoints):
+                    tried = set()
+                await asyncio.sleep(random.uniform(0, RPC_RETRY_BASE * 2 ** attempt))
+
+    async def probe(self):
+        # One cheap call to every endpoint: opens a pooled connection to each
+        # and seeds the latency estimates routing relies on. Returns the
+        # number of endpoints that answered
+        payload = {"jsonrpc": "2.0", "id": 0, "method": "starknet_blockNumber", "params": []}
+        results = await asyncio.gather(*[
+            self._post_once(endpoint, payload) for endpoint in self.endpoints
+        ], return_exceptions=True)
+        metrics.RPC_REQUESTS.inc(len(self.endpoints), method=payload["method"])
+        return sum(not isinstance(result, Exception) for result in results)
+
+    def stats(self):
+        return {
+            "hedges": self.hedges,
+            "retries": self.retries,
+            "endpoints": [endpoint.stats() for endpoint in self.endpoints],
+        }
+
+
+class FailoverRpcHttpClient(RpcHttpClient):
+    # starknet_py's HTTP client with requests routed through the transport,
+    # so FullNodeClient and Account calls get failover too
+
+    def __init__(self, transport):
+        super().__init__(url=transport.endpoints[0].url, session=transport.session)
+        self.transport = transport
+
+    async def request(self, address, http_method, params=None, payload=None):
+        return await self.transport.post(payload)
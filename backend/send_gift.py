@@ -1,60 +1,49 @@
-from starknet_py.net.account.account import Account
-from starknet_py.net.full_node_client import FullNodeClient
-from starknet_py.net.models.chains import StarknetChainId
-from starknet_py.net.signer.stark_curve_signer import KeyPair
-from starknet_py.contract import Contract
+from contract_cache import get_contract
+from nonce_manager import send_invoke_v3
+from tx_tracker import wait_for_tx
+from read_cache import cached_call
+from node_client import get_account
+from account_store import account_store
+from log_setup import get_logger
+import metrics
 import asyncio
-from dotenv import load_dotenv
-import os
-import json
+from config import settings
 
-# Load environment variables
-load_dotenv()
+logger = get_logger(__name__)
 
 # Constants
-NODE_URL = os.getenv("NODE_URL")
-STRK_CONTRACT = "0x04718f5a0fc34cc1af16a1cdee98ffb20c31f5cd61d6ab07201858f4287c938d"
+STRK_CONTRACT = settings.strk_contract_address
 
-async def send_gift(to_address, amount_strk):
+async def send_gift(to_address, amount_strk, wait=True, from_address=None):
     try:
-        # Read the sender's details from new_account.json
-        with open('new_account.json', 'r') as f:
-            account_data = json.load(f)
-            
-        sender_address = account_data['address']
-        sender_private_key = int(account_data['private_key'], 16)
+        # Look up the sender, defaulting to the most recently created account
+        account_data = account_store.get(from_address) if from_address else account_store.latest()
+        if account_data is None:
+            raise Exception("Sender account not found")
         
-        print(f"\nSending gift from: {sender_address}")
+        sender_address = account_data['address']
         
-        # Initialize client
-        client = FullNodeClient(node_url=NODE_URL)
         
-        # Set up account
-        key_pair = KeyPair.from_private_key(sender_private_key)
-        account = Account(
-            client=client,
-            address=sender_address,
-            key_pair=key_pair,
-            chain=StarknetChainId.SEPOLIA
-        )
+        # Reuse the pooled client and cached sender account
+        account = await get_account(sender_address, account_data['private_key'])
         
         # Convert STRK to smallest unit (18 decimals)
         amount_wei = int(float(amount_strk) * 10**18)
         
-        print(f"Sending {amount_strk} STRK to {to_address}")
+        logger.info(f"Sending {amount_strk} STRK gift", extra={"from_address": sender_address, "to_address": to_address})
         
         # Create STRK token contract instance
-        contract = await Contract.from_address(STRK_CONTRACT, account)
+        with metrics.TRANSFER_PHASE_DURATION.time(phase="abi_fetch"):
+            contract = await get_contract(STRK_CONTRACT, account)
         
-        # Get current balance
-        balance_response = await contract.functions["balanceOf"].call(int(sender_address, 16))
+        # Get current balance, cached for the current block
+        with metrics.TRANSFER_PHASE_DURATION.time(phase="balance_check"):
+            balance_response = await cached_call(contract, "balanceOf", int(sender_address, 16))
         balance = balance_response[0]
-        print(f"Current sender balance: {balance / 1e18} STRK")
+        logger.debug(f"Current sender balance: {balance / 1e18} STRK")
         
         # Add some tolerance for gas fees (0.0001 STRK)
         if balance < (amount_wei + int(0.0001 * 10**18)):
-            print(f"Required: {amount_wei / 1e18} STRK")
-            print(f"Available: {balance / 1e18} STRK")
             raise Exception(f"Insufficient STRK balance. Need {amount_strk} STRK plus gas fees.")
         
         # Prepare transfer
@@ -63,24 +52,20 @@ async def send_gift(to_address, amount_strk):
             amount=amount_wei
         )
         
-        # Send transaction
-        transaction = await account.sign_invoke_v3(
-            calls=[call],
-            auto_estimate=True
-        )
-        
-        resp = await account.client.send_transaction(transaction)
+        # Sign and send with a locally reserved nonce
+        resp = await send_invoke_v3(account, [call])
         tx_hash = hex(resp.transaction_hash)
-        print(f"Gift sent! Transaction hash: {tx_hash}")
+        logger.info("Gift sent", extra={"tx_hash": tx_hash})
         
-        # Wait for transaction
-        await account.client.wait_for_tx(resp.transaction_hash)
-        print("Gift transfer complete! 🎁")
+        # Wait for transaction unless the caller tracks it itself
+        if wait:
+            await wait_for_tx(resp.transaction_hash)
+            logger.info("Gift transfer complete", extra={"tx_hash": tx_hash})
         
         return tx_hash
         
     except Exception as e:
-        print(f"Error sending gift: {e}")
+        logger.error(f"Error sending gift: {e}")
         raise
 
 # Update the FastAPI endpoint to use this function
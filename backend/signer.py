@@ -0,0 +1,211 @@
+from starknet_py.constants import QUERY_VERSION_BASE
+from config import settings
+from log_setup import get_logger
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import dataclasses
+import os
+
+logger = get_logger(__name__)
+
+# Constants
+# Processes computing transaction hashes and signatures
+SIGNER_WORKERS = settings.signer_workers
+# Requests made within this window (seconds) are sent to the workers together
+SIGNER_BATCH_WINDOW = settings.signer_batch_window
+# Most transactions signed in one worker task
+SIGNER_BATCH_SIZE = settings.signer_batch_size
+
+# Worker process state: private keys handed over at start, by account address
+_worker_keys = {}
+
+
+def _init_worker(keys):
+    _worker_keys.update(keys)
+
+
+def _warm():
+    # Runs in a worker process: loads the hashing and signing code
+    import starknet_py.hash.utils
+    import starknet_py.net.models.transaction
+    return os.getpid()
+
+
+def _sign_batch(items):
+    # Runs in a worker process. Hashes and signs each (transaction, chain_id,
+    # address, private_key) item; the private key is None for accounts whose
+    # key the workers got at start. Failures come back as strings, one per item
+    from starknet_py.hash.utils import message_signature
+
+    results = []
+    for transaction, chain_id, address, private_key in items:
+        try:
+            if private_key is None:
+                private_key = _worker_keys.get(address)
+            if private_key is None:
+                raise ValueError(f"No key for {hex(address)}")
+            tx_hash = transaction.calculate_hash(chain_id)
+            r, s = message_signature(msg_hash=tx_hash, priv_key=private_key)
+            results.append([r, s])
+        except Exception as e:
+            results.append(str(e) or repr(e))
+    return results
+
+
+class SignerPool:
+    # Computes transaction hashes and ECDSA signatures in worker processes.
+    # Both are CPU bound (a few hundred ms per transaction) and used to run
+    # on the event loop, stalling every other request meanwhile. Requests
+    # made within SIGNER_BATCH_WINDOW are split over the workers in batches;
+    # the treasury key is handed to each worker once at start, child account
+    # keys travel with each transaction. With SIGNER_WORKERS=0 signing
+    # stays on the event loop
+
+    def __init__(self, workers=SIGNER_WORKERS):
+        self.workers = workers
+        self._executor = None
+        # Addresses whose key every worker already holds
+        self._resident = set()
+        self._queue = []
+        self._flush_task = None
+        self._batches = set()
+        self.in_flight = 0
+        self.signed = 0
+        self.failed = 0
+        self.batch_count = 0
+        self.restarts = 0
+
+    def _pool(self):
+        if self._executor is None:
+            keys = {}
+            if settings.wallet_address and settings.private_key:
+                keys[int(settings.wallet_address, 16)] = int(settings.private_key, 16)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(keys,)
+            )
+            self._resident = set(keys)
+        return self._executor
+
+    def _discard(self, executor):
+        # A worker died: the executor refuses all further work, so the next
+        # call builds a fresh one. Concurrent batches see the same broken
+        # executor; only the first replaces it
+        if self._executor is executor:
+            self.restarts += 1
+            logger.warning("Signer worker died, restarting the pool")
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._resident = set()
+
+    async def start(self):
+        # Spawns the workers ahead of the first transaction
+        if not self.workers:
+            return
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self._pool(), _warm) for _ in range(self.workers)])
+
+    async def stop(self):
+        for task in [self._flush_task, *self._batches]:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*[task for task in [self._flush_task, *self._batches] if task is not None], return_exceptions=True)
+        for _, future in self._queue:
+            if not future.done():
+                future.set_exception(Exception("Signer stopped"))
+        self._queue = []
+        self._flush_task = None
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+            self._resident = set()
+
+    async def sign(self, transaction, address, private_key, chain_id):
+        # [r, s] signature of transaction's hash on chain_id
+        if not self.workers:
+            from starknet_py.hash.utils import message_signature
+
+            r, s = message_signature(msg_hash=transaction.calculate_hash(chain_id), priv_key=private_key)
+            return [r, s]
+        self._pool()
+        key = None if address in self._resident else private_key
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append(((transaction, chain_id, address, key), future))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(SIGNER_BATCH_WINDOW)
+        queue, self._queue = self._queue, []
+        # Spread the requests over the workers, at most SIGNER_BATCH_SIZE each
+        size = max(1, min(SIGNER_BATCH_SIZE, -(-len(queue) // self.workers)))
+        for i in range(0, len(queue), size):
+            task = asyncio.create_task(self._sign_batch(queue[i:i + size]))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _sign_batch(self, batch):
+        self.in_flight += len(batch)
+        self.batch_count += 1
+        items = [item for item, _ in batch]
+        try:
+            executor = self._pool()
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(executor, _sign_batch, items)
+            except BrokenProcessPool:
+                self._discard(executor)
+                # Once more on a fresh pool; its workers get the treasury key
+                # at start like the old ones
+                results = await asyncio.get_running_loop().run_in_executor(self._pool(), _sign_batch, items)
+        except Exception as e:
+            logger.error(f"Signing batch of {len(batch)} failed: {e}")
+            results = [str(e) or repr(e)] * len(batch)
+        finally:
+            self.in_flight -= len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, str):
+                self.failed += 1
+                future.set_exception(Exception(f"Signing failed: {result}"))
+            else:
+                self.signed += 1
+                future.set_result(result)
+
+    async def sign_for_account(self, account, transaction):
+        # Transaction with its signature by account, like Account.signer
+        # would produce it
+        signer = account.signer
+        signature = await self.sign(transaction, signer.address, signer.private_key, signer.chain_id)
+        return dataclasses.replace(transaction, signature=signature)
+
+    async def sign_invoke_v3(self, account, calls, nonce, l1_resource_bounds):
+        # Account.sign_invoke_v3 with the signing done off the event loop
+        transaction = await account._prepare_invoke_v3(
+            calls=calls,
+            l1_resource_bounds=l1_resource_bounds,
+            nonce=nonce
+        )
+        return await self.sign_for_account(account, transaction)
+
+    async def sign_for_fee_estimate(self, account, transaction):
+        # Account.sign_for_fee_estimate with the signing done off the event loop
+        transaction = dataclasses.replace(transaction, version=transaction.version + QUERY_VERSION_BASE)
+        return await self.sign_for_account(account, transaction)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queued": len(self._queue),
+            "in_flight": self.in_flight,
+            "signed": self.signed,
+            "failed": self.failed,
+            "batches": self.batch_count,
+            "restarts": self.restarts,
+        }
+
+
+signer_pool = SignerPool()
@@ -0,0 +1,193 @@
+from contract_cache import get_contract
+from nonce_manager import send_invoke_v3
+from tx_tracker import tracker, wait_for_tx
+from read_cache import cached_call
+from node_client import get_account, get_wallet_account
+from account_store import account_store, normalize_address
+from batch_transfer import STRK_CONTRACT
+from log_setup import get_logger
+import metrics
+import asyncio
+from config import settings
+
+logger = get_logger(__name__)
+
+# Constants
+# Delegation pool used when a request does not name one
+DEFAULT_VALIDATOR_ADDRESS = settings.validator_address
+DEFAULT_STAKE_AMOUNT_STRK = settings.default_stake_amount_strk
+POOL_MEMBER_EXISTS = "Pool member exists"
+
+
+async def resolve_account(account_address=None):
+    # The treasury wallet, or a child account from the account store
+    treasury = settings.wallet_address
+    if not account_address or normalize_address(account_address) == normalize_address(treasury):
+        return await get_wallet_account()
+    account_data = account_store.get(account_address)
+    if account_data is None:
+        raise Exception(f"Unknown account: {account_address}")
+    return await get_account(account_data['address'], account_data['private_key'])
+
+
+class StakingEngine:
+    # Stakes in one transaction: approve (when the allowance is short) and
+    # enter_delegation_pool / add_to_delegation_pool go out as a single
+    # multicall. Pool membership is cached per (account, pool) so the right
+    # entry point is picked without a failed estimate
+
+    def __init__(self):
+        self._members = {}
+        # tx hash -> (account, pool) for entries not yet confirmed
+        self._pending_entries = {}
+        tracker.add_listener(self._on_transaction_update)
+
+    def _on_transaction_update(self, record):
+        key = self._pending_entries.get(int(record["transaction_hash"], 16))
+        if key is None or record["status"] not in ("accepted", "reverted", "rejected", "failed", "timeout"):
+            return
+        del self._pending_entries[int(record["transaction_hash"], 16)]
+        if record["status"] != "accepted":
+            # Unknown again: re-read from the pool on the next stake
+            self._members.pop(key, None)
+
+    async def is_member(self, account_address, pool_contract):
+        key = (account_address, pool_contract.address)
+        if key not in self._members:
+            # get_pool_member_info returns an Option, None when not a member
+            info = await cached_call(pool_contract, "get_pool_member_info", account_address)
+            self._members[key] = info[0] is not None
+        return self._members[key]
+
+    async def stake(self, amount_strk=None, validator_address=None, account_address=None, wait=True):
+        if amount_strk is None:
+            amount_strk = DEFAULT_STAKE_AMOUNT_STRK
+        if amount_strk <= 0:
+            raise ValueError("amount_strk must be positive")
+        amount_wei = int(float(amount_strk) * 10**18)
+        validator_address = validator_address or DEFAULT_VALIDATOR_ADDRESS
+        account = await resolve_account(account_address)
+
+        logger.info(f"Preparing to stake {amount_strk} STRK from {hex(account.address)} with pool {validator_address}...")
+
+        with metrics.TRANSFER_PHASE_DURATION.time(phase="abi_fetch"):
+            token_contract, pool_contract = await asyncio.gather(
+                get_contract(STRK_CONTRACT, account),
+                get_contract(validator_address, account)
+            )
+        with metrics.TRANSFER_PHASE_DURATION.time(phase="balance_check"):
+            balance, allowance, member = await asyncio.gather(
+                cached_call(token_contract, "balanceOf", account.address),
+                cached_call(token_contract, "allowance", account.address, pool_contract.address),
+                self.is_member(account.address, pool_contract)
+            )
+        logger.debug(f"Current STRK balance: {balance[0] / 1e18} STRK, allowance: {allowance[0] / 1e18} STRK")
+        if balance[0] < amount_wei:
+            raise Exception(f"Insufficient STRK balance. Need {amount_strk} STRK to stake.")
+
+        approve_calls = []
+        if allowance[0] < amount_wei:
+            approve_calls.append(token_contract.functions["approve"].prepare_call(
+                pool_contract.address,
+                amount_wei
+            ))
+
+        def stake_call(member):
+            if member:
+                return pool_contract.functions["add_to_delegation_pool"].prepare_call(
+                    account.address,  # pool_member
+                    amount_wei
+                )
+            return pool_contract.functions["enter_delegation_pool"].prepare_call(
+                account.address,  # reward_address
+                amount_wei
+            )
+
+        try:
+            resp = await send_invoke_v3(account, approve_calls + [stake_call(member)])
+        except Exception as e:
+            if member or POOL_MEMBER_EXISTS not in str(e):
+                raise
+            # Membership changed outside this process
+            logger.info("Already a pool member. Adding to existing position...")
+            member = True
+            resp = await send_invoke_v3(account, approve_calls + [stake_call(member)])
+
+        key = (account.address, pool_contract.address)
+        self._members[key] = True
+        if not member:
+            self._pending_entries[resp.transaction_hash] = key
+        logger.info("Staking submitted", extra={"tx_hash": hex(resp.transaction_hash)})
+        if wait:
+            await wait_for_tx(resp.transaction_hash)
+            logger.info("Staking successful", extra={"tx_hash": hex(resp.transaction_hash)})
+
+        return {
+            "transaction_hash": hex(resp.transaction_hash),
+            "account_address": hex(account.address),
+            "validator_address": hex(pool_contract.address),
+            "amount_strk": amount_strk,
+            "action": "add" if member else "enter",
+            "approved": bool(approve_calls),
+        }
+
+    async def get_positions(self, account_addresses, validator_addresses=None):
+        # Delegation positions for every (account, pool) pair, read
+        # concurrently and served from the block cache
+        validator_addresses = validator_addresses or [DEFAULT_VALIDATOR_ADDRESS]
+        provider = await get_wallet_account()
+        pools = await asyncio.gather(*[
+            get_contract(validator_address, provider) for validator_address in validator_addresses
+        ])
+        pairs = [
+            (normalize_address(account_address), pool)
+            for account_address in account_addresses
+            for pool in pools
+        ]
+        infos = await asyncio.gather(*[
+            cached_call(pool, "get_pool_member_info", int(account_address, 16))
+            for account_address, pool in pairs
+        ], return_exceptions=True)
+
+        positions = []
+        for (account_address, pool), info in zip(pairs, infos):
+            position = {"account_address": account_address, "validator_address": hex(pool.address)}
+            if isinstance(info, Exception):
+                logger.warning(f"Error reading position of {account_address} in pool {hex(pool.address)}: {info}")
+                position["error"] = str(info)
+            else:
+                self._members[(int(account_address, 16), pool.address)] = info[0] is not None
+                position.update(_parse_position(info[0]))
+            positions.append(position)
+        return positions
+
+
+def _parse_position(info):
+    # PoolMemberInfo, or None for an account that never delegated to the pool
+    if info is None:
+        return {"is_member": False, "staked_amount": "0", "unclaimed_rewards": "0", "unpool_amount": "0", "unpool_time": None}
+    unpool_time = info.get("unpool_time")
+    if isinstance(unpool_time, dict):
+        unpool_time = unpool_time.get("seconds")
+    return {
+        "is_member": True,
+        "staked_amount": str(info["amount"]),
+        "unclaimed_rewards": str(info["unclaimed_rewards"]),
+        "unpool_amount": str(info["unpool_amount"]),
+        "unpool_time": unpool_time,
+    }
+
+
+staking_engine = StakingEngine()
+
+
+async def get_staked_amount(account_address=None, validator_address=None):
+    # Total staked by one account (the treasury by default) in one pool
+    account_address = account_address or settings.wallet_address
+    positions = await staking_engine.get_positions(
+        [account_address],
+        [validator_address] if validator_address else None
+    )
+    if "error" in positions[0]:
+        raise Exception(positions[0]["error"])
+    return int(positions[0]["staked_amount"])
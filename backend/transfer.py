@@ -1,49 +1,34 @@
-from starknet_py.net.account.account import Account
-from starknet_py.net.full_node_client import FullNodeClient
-from starknet_py.net.models.chains import StarknetChainId
-from starknet_py.net.signer.stark_curve_signer import KeyPair
-from starknet_py.contract import Contract
+from contract_cache import get_contract
+from nonce_manager import send_invoke_v3
+from tx_tracker import wait_for_tx
+from node_client import get_wallet_account
+from account_store import account_store
+from log_setup import get_logger
 import asyncio
-from dotenv import load_dotenv
-import os
-import json
+from config import settings
 
-# Load environment variables
-load_dotenv()
+logger = get_logger(__name__)
 
 # Constants
-NODE_URL = os.getenv("NODE_URL")
-ETH_CONTRACT = os.getenv("ETH_CONTRACT_ADDRESS")
-PRIVATE_KEY = int(os.getenv("PRIVATE_KEY"), 16)
-WALLET_ADDRESS = os.getenv("WALLET_ADDRESS")
+ETH_CONTRACT = settings.eth_contract_address
+WALLET_ADDRESS = settings.wallet_address
 
-async def transfer_eth(to_address, amount_eth=0.003):
-    print("\nUsing sender wallet:", WALLET_ADDRESS)
-    
-    # Initialize client
-    client = FullNodeClient(node_url=NODE_URL)
-    
-    # Set up account
-    key_pair = KeyPair.from_private_key(PRIVATE_KEY)
-    account = Account(
-        client=client,
-        address=WALLET_ADDRESS,
-        key_pair=key_pair,
-        chain=StarknetChainId.SEPOLIA
-    )
+async def transfer_eth(to_address, amount_eth=0.003, wait=True):
+    # Reuse the pooled client and cached treasury account
+    account = await get_wallet_account()
     
     # Convert ETH to Wei
     amount_wei = int(amount_eth * 10**18)
     
-    print(f"Transferring {amount_eth} ETH to {to_address}")
+    logger.info(f"Transferring {amount_eth} ETH", extra={"to_address": to_address})
     
     try:
         # Get current balance
         balance = await account.get_balance()
-        print(f"Current sender balance: {balance / 1e18} ETH")
+        logger.debug(f"Current sender balance: {balance / 1e18} ETH")
         
         # Create contract instance
-        contract = await Contract.from_address(ETH_CONTRACT, account)
+        contract = await get_contract(ETH_CONTRACT, account)
         
         # Prepare call
         call = contract.functions["transfer"].prepare_call(
@@ -51,50 +36,47 @@ async def transfer_eth(to_address, amount_eth=0.003):
             amount=amount_wei
         )
         
-        # Sign the transaction
-        transaction = await account.sign_invoke_v3(
-            calls=[call],
-            auto_estimate=True
-        )
-        
-        # Send the transaction
-        resp = await account.client.send_transaction(transaction)
+        # Sign and send with a locally reserved nonce
+        resp = await send_invoke_v3(account, [call])
         tx_hash = hex(resp.transaction_hash)
-        print(f"Transaction hash: {tx_hash}")
+        logger.info("Transfer submitted", extra={"tx_hash": tx_hash})
         
-        # Wait for transaction
-        await account.client.wait_for_tx(resp.transaction_hash)
-        print("Transfer complete!")
+        # Wait for transaction unless the caller tracks it itself
+        if wait:
+            await wait_for_tx(resp.transaction_hash)
+            logger.info("Transfer complete", extra={"tx_hash": tx_hash})
         
         return tx_hash
         
     except Exception as e:
-        print(f"Error during transfer: {e}")
+        logger.error(f"Error during transfer: {e}")
         raise
 
-async def main():
+async def main(wait=True, account_data=None):
     try:
-        # Read the new account address from file
-        with open('new_account.json', 'r') as f:
-            account_data = json.load(f)
+        # Fund the given account, or the most recently created one
+        if account_data is None:
+            account_data = account_store.latest()
+        if account_data is None:
+            logger.error("Please run CreateAcc.py first to generate the account")
+            return
         
         # Get the address to send to
         to_address = account_data['address']
         
-        print(f"Sending ETH to newly created account: {to_address}")
-        tx_hash = await transfer_eth(to_address)
+        logger.info("Funding newly created account", extra={"address": to_address})
+        tx_hash = await transfer_eth(to_address, wait=wait)
         
-        # Save transaction hash to the JSON file
-        account_data['funding_tx_hash'] = tx_hash
-        with open('new_account.json', 'w') as f:
-            json.dump(account_data, f, indent=4)
+        # Save transaction hash to the account store
+        if wait:
+            account_store.transition(to_address, "funded", funding_tx_hash=tx_hash)
+        else:
+            account_store.update(to_address, funding_tx_hash=tx_hash)
         
-        print(f"\nTransaction hash saved to new_account.json")
+        logger.info("Funding transaction saved", extra={"address": to_address, "tx_hash": tx_hash})
         
-    except FileNotFoundError:
-        print("Error: Please run CreateAcc.py first to generate the account")
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error(f"Error funding account: {e}")
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
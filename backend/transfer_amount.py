@@ -1,50 +1,39 @@
-from starknet_py.net.account.account import Account
-from starknet_py.net.full_node_client import FullNodeClient
-from starknet_py.net.models.chains import StarknetChainId
-from starknet_py.net.signer.stark_curve_signer import KeyPair
-from starknet_py.contract import Contract
+from contract_cache import get_contract
+from nonce_manager import send_invoke_v3
+from tx_tracker import wait_for_tx
+from read_cache import cached_call
+from node_client import get_wallet_account
+from log_setup import get_logger
+import metrics
 import asyncio
-from dotenv import load_dotenv
-import os
+from config import settings
 import json
 
-# Load environment variables
-load_dotenv()
+logger = get_logger(__name__)
 
 # Constants
-NODE_URL = os.getenv("NODE_URL")
-STRK_CONTRACT = "0x04718f5a0fc34cc1af16a1cdee98ffb20c31f5cd61d6ab07201858f4287c938d"  # STRK token contract
-PRIVATE_KEY = int(os.getenv("PRIVATE_KEY"), 16)
-WALLET_ADDRESS = os.getenv("WALLET_ADDRESS")
+STRK_CONTRACT = settings.strk_contract_address  # STRK token contract
+WALLET_ADDRESS = settings.wallet_address
 
-async def transfer_exact_amount(to_address, amount_strk):
-    print(f"\nUsing sender wallet: {WALLET_ADDRESS}")
-    
-    # Initialize client
-    client = FullNodeClient(node_url=NODE_URL)
-    
-    # Set up account
-    key_pair = KeyPair.from_private_key(PRIVATE_KEY)
-    account = Account(
-        client=client,
-        address=WALLET_ADDRESS,
-        key_pair=key_pair,
-        chain=StarknetChainId.SEPOLIA
-    )
+async def transfer_exact_amount(to_address, amount_strk, wait=True):
+    # Reuse the pooled client and cached treasury account
+    account = await get_wallet_account()
     
     # Convert STRK to smallest unit (18 decimals)
     amount_wei = int(float(amount_strk) * 10**18)
     
-    print(f"Transferring {amount_strk} STRK to {to_address}")
+    logger.info(f"Transferring {amount_strk} STRK", extra={"to_address": to_address})
     
     try:
         # Create STRK token contract instance
-        contract = await Contract.from_address(STRK_CONTRACT, account)
+        with metrics.TRANSFER_PHASE_DURATION.time(phase="abi_fetch"):
+            contract = await get_contract(STRK_CONTRACT, account)
         
-        # Get current STRK balance - fixed balance access
-        balance_response = await contract.functions["balanceOf"].call(int(WALLET_ADDRESS, 16))
+        # Get current STRK balance, cached for the current block
+        with metrics.TRANSFER_PHASE_DURATION.time(phase="balance_check"):
+            balance_response = await cached_call(contract, "balanceOf", int(WALLET_ADDRESS, 16))
         balance = balance_response[0]  # Access first element of tuple
-        print(f"Current sender STRK balance: {balance / 1e18}")
+        logger.debug(f"Current sender STRK balance: {balance / 1e18}")
         
         if balance < amount_wei:
             raise Exception("Insufficient STRK balance for transfer")
@@ -55,22 +44,18 @@ async def transfer_exact_amount(to_address, amount_strk):
             amount=amount_wei
         )
         
-        # Sign and send transaction
-        transaction = await account.sign_invoke_v3(
-            calls=[call],
-            auto_estimate=True
-        )
-        
-        resp = await account.client.send_transaction(transaction)
+        # Sign and send with a locally reserved nonce
+        resp = await send_invoke_v3(account, [call])
         tx_hash = hex(resp.transaction_hash)
-        print(f"Transaction hash: {tx_hash}")
+        logger.info("Transfer submitted", extra={"tx_hash": tx_hash})
         
-        # Wait for transaction
-        await account.client.wait_for_tx(resp.transaction_hash)
-        print("Transfer complete!")
+        # Wait for transaction unless the caller tracks it itself
+        if wait:
+            await wait_for_tx(resp.transaction_hash)
+            logger.info("Transfer complete", extra={"tx_hash": tx_hash})
         
         return tx_hash
         
     except Exception as e:
-        print(f"Error during transfer: {e}")
+        logger.error(f"Error during transfer: {e}")
         raise 
\ No newline at end of file
@@ -0,0 +1,222 @@
+from starknet_py.transaction_errors import (
+    TransactionNotReceivedError,
+    TransactionRejectedError,
+    TransactionRevertedError,
+)
+from node_client import rpc_batch, rpc_call
+from log_setup import get_logger
+import metrics
+from config import settings
+import asyncio
+import datetime
+import time
+
+logger = get_logger(__name__)
+
+# Constants
+# Block-head probe interval: starts at the minimum, backs off while the head
+# does not move and resets as soon as a new block shows up
+TX_POLL_MIN_INTERVAL = settings.tx_poll_min_interval
+TX_POLL_MAX_INTERVAL = settings.tx_poll_max_interval
+TX_POLL_BACKOFF = settings.tx_poll_backoff
+TX_TRACK_TIMEOUT = settings.tx_track_timeout
+# How long settled transactions stay queryable
+TX_RETENTION = settings.tx_retention
+FINAL_STATUSES = {"accepted", "reverted", "rejected", "failed", "timeout"}
+
+
+def _parse_hash(tx_hash):
+    if isinstance(tx_hash, str):
+        return int(tx_hash, 16)
+    return tx_hash
+
+
+def _status_from_response(response):
+    if response["finality_status"] == "REJECTED":
+        return "rejected"
+    if response["finality_status"] == "RECEIVED":
+        return "received"
+    if response.get("execution_status") == "REVERTED":
+        return "reverted"
+    return "accepted"
+
+
+class TxTracker:
+    # One service tracking every submitted transaction. On each block tick it
+    # checks all pending hashes in batched JSON-RPC requests and resolves the
+    # futures callers are waiting on, so RPC volume follows blocks rather than
+    # the number of pending transactions
+
+    def __init__(self):
+        self._txs = {}
+        self._subscribers = set()
+        self._listeners = []
+        self._task = None
+        self._wakeup = asyncio.Event()
+        self.block_number = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def track(self, tx_hash, kind, **details):
+        tx_hash = _parse_hash(tx_hash)
+        entry = self._txs.get(tx_hash)
+        if entry is not None:
+            entry["record"].update(details)
+            if entry["record"]["kind"] in ("internal", "invoke") and kind != "internal":
+                entry["record"]["kind"] = kind
+            return entry["record"]
+        record = {
+            "transaction_hash": hex(tx_hash),
+            "kind": kind,
+            "status": "submitted",
+            "finality_status": None,
+            "execution_status": None,
+            "submitted_at": datetime.datetime.now().isoformat(),
+            "updated_at": datetime.datetime.now().isoformat(),
+            **details,
+        }
+        self._txs[tx_hash] = {
+            "record": record,
+            "started": time.monotonic(),
+            "future": asyncio.get_running_loop().create_future(),
+        }
+        self._publish(record)
+        self.start()
+        self._wakeup.set()
+        return record
+
+    def get(self, tx_hash):
+        entry = self._txs.get(_parse_hash(tx_hash))
+        return entry["record"] if entry else None
+
+    def update(self, tx_hash, **changes):
+        entry = self._txs.get(_parse_hash(tx_hash))
+        if entry is None:
+            return
+        entry["record"].update(changes)
+        entry["record"]["updated_at"] = datetime.datetime.now().isoformat()
+        self._publish(entry["record"])
+        if entry["record"]["status"] in FINAL_STATUSES and not entry["future"].done():
+            entry["future"].set_result(dict(entry["record"]))
+
+    async def wait(self, tx_hash, kind="internal"):
+        # Drop-in for client.wait_for_tx: resolves once the transaction is
+        # accepted and raises the starknet_py error if it is not
+        self.track(tx_hash, kind)
+        with metrics.TRANSFER_PHASE_DURATION.time(phase="confirm"):
+            record = await asyncio.shield(self._txs[_parse_hash(tx_hash)]["future"])
+        if record["status"] == "reverted":
+            raise TransactionRevertedError(message=record.get("revert_reason") or "")
+        if record["status"] == "rejected":
+            raise TransactionRejectedError()
+        if record["status"] in ("timeout", "failed"):
+            raise TransactionNotReceivedError()
+        return record
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def add_listener(self, callback):
+        # In-process hook called synchronously with every record change
+        self._listeners.append(callback)
+
+    def _publish(self, record):
+        for queue in self._subscribers:
+            queue.put_nowait(dict(record))
+        for callback in self._listeners:
+            try:
+                callback(record)
+            except Exception as e:
+                logger.error(f"Error in transaction listener: {e}")
+
+    def pending_count(self):
+        return len(self._pending())
+
+    def _pending(self):
+        return [
+            tx_hash for tx_hash, entry in self._txs.items()
+            if entry["record"]["status"] not in FINAL_STATUSES
+        ]
+
+    def _prune(self):
+        now = time.monotonic()
+        for tx_hash in list(self._txs):
+            entry = self._txs[tx_hash]
+            if entry["record"]["status"] in FINAL_STATUSES and now - entry["started"] > TX_RETENTION:
+                del self._txs[tx_hash]
+
+    async def _check(self, pending):
+        responses = await rpc_batch([
+            ("starknet_getTransactionStatus", {"transaction_hash": hex(tx_hash)})
+            for tx_hash in pending
+        ])
+        now = time.monotonic()
+        for tx_hash, response in zip(pending, responses):
+            entry = self._txs.get(tx_hash)
+            if entry is None:
+                continue
+            if isinstance(response, Exception):
+                # Not yet known to the node
+                if now - entry["started"] > TX_TRACK_TIMEOUT:
+                    self.update(tx_hash, status="timeout", error=str(response))
+                continue
+            status = _status_from_response(response)
+            record = entry["record"]
+            changes = {
+                "status": status,
+                "finality_status": response["finality_status"],
+                "execution_status": response.get("execution_status"),
+            }
+            if response.get("failure_reason"):
+                changes["revert_reason"] = response["failure_reason"]
+            if any(record.get(key) != value for key, value in changes.items()):
+                self.update(tx_hash, block_number=self.block_number, **changes)
+
+    async def _run(self):
+        interval = TX_POLL_MIN_INTERVAL
+        last_check = 0
+        while True:
+            try:
+                self._prune()
+                if not self._pending():
+                    # Nothing to track: no RPC until a new hash arrives
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    last_check = 0
+
+                block_number = await rpc_call("starknet_blockNumber")
+                new_block = block_number != self.block_number
+                self.block_number = block_number
+                if new_block or time.monotonic() - last_check >= TX_POLL_MAX_INTERVAL:
+                    await self._check(self._pending())
+                    last_check = time.monotonic()
+                interval = TX_POLL_MIN_INTERVAL if new_block else min(interval * TX_POLL_BACKOFF, TX_POLL_MAX_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Error polling transaction statuses: {e}")
+                interval = min(interval * TX_POLL_BACKOFF, TX_POLL_MAX_INTERVAL)
+            await asyncio.sleep(interval)
+
+
+tracker = TxTracker()
+
+
+async def wait_for_tx(tx_hash):
+    return await tracker.wait(tx_hash)
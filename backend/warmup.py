@@ -0,0 +1,143 @@
+from config import settings
+from node_client import registry, get_wallet_account
+from contract_cache import get_contract
+from nonce_manager import get_nonce_manager
+from read_cache import read_cache
+from signer import signer_pool
+from batch_transfer import TOKENS
+from staking import DEFAULT_VALIDATOR_ADDRESS
+from log_setup import get_logger
+import asyncio
+import importlib
+import time
+
+logger = get_logger(__name__)
+
+# Constants
+# Bound on each warm-up attempt (seconds)
+WARMUP_TIMEOUT = settings.warmup_timeout
+# Delay before failed stages are tried again
+WARMUP_RETRY_INTERVAL = 5
+# starknet_py modules the app imports lazily; loaded here ahead of the first
+# write instead
+HEAVY_MODULES = (
+    "starknet_py.net.full_node_client",
+    "starknet_py.net.account.account",
+    "starknet_py.contract",
+)
+
+
+class WarmUp:
+    # Gets the process ready for its first request in the background, so the
+    # server accepts connections straight away: loads the heavy starknet_py
+    # modules, spawns the signer processes, opens a connection to every node, builds the treasury account,
+    # and prefetches the token and pool ABIs and the treasury nonce. Failed
+    # stages are retried until they pass; /ready reports the outcome
+
+    def __init__(self):
+        self.stages = {}
+        self._task = None
+        self.started_at = None
+        self.ready_at = None
+
+    @property
+    def ready(self):
+        return self.ready_at is not None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self.started_at = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _imports(self):
+        for name in HEAVY_MODULES:
+            # Off the event loop, so health checks keep answering meanwhile
+            await asyncio.to_thread(importlib.import_module, name)
+
+    async def _signer(self):
+        await signer_pool.start()
+
+    async def _node(self):
+        await registry.get_client()
+        if not await registry.transport.probe():
+            raise Exception("No node endpoint answered")
+        await read_cache.current_block()
+
+    async def _account(self):
+        account = await get_wallet_account()
+        # Account reads its class on first use to pick the calldata format
+        await account.cairo_version
+
+    async def _abis(self):
+        account = await get_wallet_account()
+        await asyncio.gather(*[
+            get_contract(address, account) for address in [*TOKENS.values(), DEFAULT_VALIDATOR_ADDRESS]
+        ])
+
+    async def _nonce(self):
+        await get_nonce_manager(await get_wallet_account()).resync()
+
+    def _pending(self):
+        steps = [
+            ("config", None),
+            ("imports", self._imports),
+            ("signer", self._signer),
+            ("node", self._node),
+            ("account", self._account),
+            ("abis", self._abis),
+            ("nonce", self._nonce),
+        ]
+        return [(name, step) for name, step in steps if self.stages.get(name, {}).get("status") != "ok"]
+
+    async def _stage(self, name, step):
+        start = time.monotonic()
+        try:
+            if step is None:
+                missing = settings.missing()
+                if missing:
+                    raise Exception(f"Missing settings: {', '.join(missing)}")
+            else:
+                await asyncio.wait_for(step(), timeout=WARMUP_TIMEOUT)
+            self.stages[name] = {"status": "ok", "seconds": round(time.monotonic() - start, 3)}
+            return True
+        except asyncio.TimeoutError:
+            error = f"timed out after {WARMUP_TIMEOUT}s"
+        except Exception as e:
+            error = str(e) or repr(e)
+        self.stages[name] = {"status": "failed", "seconds": round(time.monotonic() - start, 3), "error": error}
+        logger.warning(f"Warm-up stage {name} failed: {error}")
+        return False
+
+    async def _run(self):
+        while True:
+            for name, step in self._pending():
+                if not await self._stage(name, step):
+                    # Later stages depend on the earlier ones
+                    break
+            if not self._pending():
+                self.ready_at = time.monotonic()
+                logger.info(f"Warm-up done in {self.ready_at - self.started_at:.2f}s", extra={"stages": self.stages})
+                return
+            if self.stages["config"]["status"] == "failed":
+                # Settings are read once; retrying cannot fix them
+                return
+            await asyncio.sleep(WARMUP_RETRY_INTERVAL)
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "seconds": round((self.ready_at or time.monotonic()) - self.started_at, 3) if self.started_at else None,
+            "stages": self.stages,
+        }
+
+
+warmup = WarmUp()
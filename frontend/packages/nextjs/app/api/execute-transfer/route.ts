@@ -1,10 +1,8 @@
 import { NextResponse } from 'next/server';
-import fs from 'fs';
-import path from 'path';
 
 export async function POST(request: Request) {
   try {
-    const { amount_strk } = await request.json();
+    const { amount_strk, idempotency_key } = await request.json();
 
     if (!amount_strk) {
       return NextResponse.json(
@@ -13,10 +11,15 @@ export async function POST(request: Request) {
       );
     }
 
-    // Read address from new_account.json
-    const accountData = JSON.parse(
-      fs.readFileSync(path.join(process.cwd(), '../../../backend/new_account.json'), 'utf8')
-    );
+    // Look up the latest child account from the backend account store
+    const accountResponse = await fetch("http://localhost:8000/get-account");
+    if (!accountResponse.ok) {
+      return NextResponse.json(
+        { message: 'Account not found' },
+        { status: 404 }
+      );
+    }
+    const accountData = await accountResponse.json();
 
     const address = accountData.address;
 
@@ -25,6 +28,7 @@ export async function POST(request: Request) {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
+        ...(idempotency_key ? { "Idempotency-Key": idempotency_key } : {}),
       },
       body: JSON.stringify({
         address: address,
@@ -36,6 +40,14 @@ export async function POST(request: Request) {
     const data = await response.json();
     console.log('Response data:', data);
 
+    if (response.status === 202) {
+      // Still queued or sending: the caller polls the job
+      return NextResponse.json(
+        { message: data.message, job_id: data.job_id },
+        { status: 202 }
+      );
+    }
+
     if (data.status === "success") {
       return NextResponse.json({
         message: 'Transfer successful',
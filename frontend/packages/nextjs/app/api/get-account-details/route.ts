@@ -1,16 +1,16 @@
 import { NextResponse } from 'next/server';
-import fs from 'fs';
-import path from 'path';
 
 export async function GET() {
   try {
-    const accountData = JSON.parse(
-      fs.readFileSync(path.join(process.cwd(), '../../../backend/new_account.json'), 'utf8')
-    );
+    // Account details now live in the backend account store
+    const response = await fetch("http://localhost:8000/get-account");
+    if (!response.ok) {
+      throw new Error(`backend response status: ${response.status}`);
+    }
+    const accountData = await response.json();
 
     return NextResponse.json({
-      address: accountData.address,
-      private_key: accountData.private_key
+      address: accountData.address
     });
   } catch (error) {
     console.error('Error reading account data:', error);
@@ -19,4 +19,4 @@ export async function GET() {
       { status: 500 }
     );
   }
-} 
\ No newline at end of file
+}
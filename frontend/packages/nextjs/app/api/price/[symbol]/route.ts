@@ -1,27 +1,30 @@
+// Quotes come from the backend price cache, which refreshes them from
+// coingecko once per TTL however many clients poll
+const PROVIDER_IDS: Record<string, string> = {
+  ETH: "ethereum",
+  STRK: "starknet",
+};
+
 export async function GET(
   _: Request,
   { params: { symbol } }: { params: { symbol: string } },
 ) {
-  let apiUrl = "";
-  if (symbol === "ETH") {
-    apiUrl =
-      "https://api.coingecko.com/api/v3/simple/price?ids=ethereum&vs_currencies=usd";
-  } else if (symbol === "STRK") {
-    apiUrl =
-      "https://api.coingecko.com/api/v3/simple/price?ids=starknet&vs_currencies=usd";
-  } else {
+  const providerId = PROVIDER_IDS[symbol];
+  if (!providerId) {
     return Response.json({
       ethereum: { usd: 0 },
       starknet: { usd: 0 },
     });
   }
   try {
-    const response = await fetch(apiUrl);
+    const response = await fetch(`http://localhost:8000/price/${symbol}`, {
+      cache: "no-store",
+    });
     if (!response.ok) {
-      throw new Error(`coingecko response status: ${response.status}`);
+      throw new Error(`price response status: ${response.status}`);
     }
-    const json = await response.json();
-    return Response.json(json);
+    const quote = await response.json();
+    return Response.json({ [providerId]: { usd: quote.price } });
   } catch (e) {
     return Response.json({
       ethereum: { usd: 0 },
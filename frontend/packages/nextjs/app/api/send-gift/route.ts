@@ -4,13 +4,14 @@ import path from 'path';
 
 export async function POST(request: Request) {
   try {
-    const { address, amount_strk } = await request.json();
+    const { address, amount_strk, idempotency_key } = await request.json();
 
     // Make request to FastAPI backend
     const response = await fetch("http://localhost:8000/send-gift", {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
+        ...(idempotency_key ? { "Idempotency-Key": idempotency_key } : {}),
       },
       body: JSON.stringify({
         address: address,
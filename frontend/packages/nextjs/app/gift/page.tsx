@@ -1,8 +1,10 @@
 "use client";
 
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useRouter } from "next/navigation";
 import { useEthStarkAccount } from "~~/hooks/scaffold-stark/useEthStarkAccount";
+import { loadGiftAccount } from "~~/utils/giftAccount";
+import { waitForJob } from "~~/utils/jobs";
 import {
   UserCircleIcon,
   ClockIcon,
@@ -42,6 +44,9 @@ export default function WalletPage() {
   const [customAmount, setCustomAmount] = useState("");
   const [isValidAddress, setIsValidAddress] = useState(true);
   const [showAmountInput, setShowAmountInput] = useState(false);
+  // Reused until a gift succeeds, so double clicks and retries after an
+  // error cannot send the same gift twice
+  const giftKey = useRef<string>(crypto.randomUUID());
 
   const validateAddress = (address: string) => {
     // Check for Starknet hex address
@@ -84,7 +89,14 @@ export default function WalletPage() {
         }
 
         const result = await response.json();
-        setAccountData(result);
+        // /get-account leaves the key out; it is only known to the browser
+        // that created the account
+        const stored = loadGiftAccount();
+        setAccountData({
+          ...result,
+          private_key:
+            stored?.address === result.address ? stored.private_key : undefined,
+        });
       } catch (error) {
         console.error("Error fetching account data:", error);
       }
@@ -107,6 +119,7 @@ export default function WalletPage() {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          "Idempotency-Key": giftKey.current,
         },
         body: JSON.stringify({
           address: resolvedAddress,
@@ -119,9 +132,12 @@ export default function WalletPage() {
       if (!response.ok) {
         throw new Error(data.detail || "Failed to send gift");
       }
+      // 202: still queued or sending; the key is kept until it settles
+      const result = response.status === 202 ? await waitForJob(data.job_id) : data;
 
-      setTxHash(data.transaction_hash);
+      setTxHash(result.transaction_hash);
       setShowSuccessModal(true);
+      giftKey.current = crypto.randomUUID();
 
       // Update UI with the sent gift details
       const newContact: Contact = {
@@ -152,6 +168,7 @@ export default function WalletPage() {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          "Idempotency-Key": giftKey.current,
         },
         body: JSON.stringify({
           address: selectedContact.address,
@@ -164,9 +181,12 @@ export default function WalletPage() {
       if (!response.ok) {
         throw new Error(data.detail || "Failed to send gift");
       }
+      // 202: still queued or sending; the key is kept until it settles
+      const result = response.status === 202 ? await waitForJob(data.job_id) : data;
 
-      setTxHash(data.transaction_hash);
+      setTxHash(result.transaction_hash);
       setShowSuccessModal(true);
+      giftKey.current = crypto.randomUUID();
     } catch (error: any) {
       console.error("Error sending gift:", error);
       setErrorMessage(error.message || "Failed to send gift");
@@ -410,7 +430,9 @@ export default function WalletPage() {
             <p className="text-white">Private Key:</p>
             <p className="text-white text-sm font-mono break-all bg-[#1a1f38] p-3 rounded-lg">
               {showPrivateKey
-                ? accountData?.private_key || "Loading..."
+                ? accountData
+                  ? accountData.private_key || "Not available in this browser"
+                  : "Loading..."
                 : "••••••••••••••••"}
             </p>
             <button
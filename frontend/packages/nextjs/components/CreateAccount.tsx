@@ -1,6 +1,7 @@
 "use client";
 
 import { useState } from "react";
+import { saveGiftAccount } from "~~/utils/giftAccount";
 
 export default function CreateAccount() {
   const [isProcessing, setIsProcessing] = useState(false);
@@ -21,6 +22,7 @@ export default function CreateAccount() {
       const data = await response.json();
 
       if (data.status === "success") {
+        saveGiftAccount(data.data);
         setMessage("Account created and deployed successfully!");
       } else {
         setMessage(`Error: ${data.message}`);
@@ -10,6 +10,7 @@ import {
   ChevronDownIcon,
 } from "@heroicons/react/24/outline";
 import { useOutsideClick } from "~~/hooks/scaffold-stark";
+import { saveGiftAccount } from "~~/utils/giftAccount";
 import { CustomConnectButton } from "~~/components/scaffold-stark/CustomConnectButton";
 import { useTheme } from "next-themes";
 import { SwitchTheme } from "./SwitchTheme";
@@ -108,6 +109,9 @@ export const Header = () => {
 
       const data = await response.json();
       setAccountData(data.data);
+      if (data.data?.private_key) {
+        saveGiftAccount(data.data);
+      }
 
       // Connect with just the connector instance
       const connector = new InjectedConnector({
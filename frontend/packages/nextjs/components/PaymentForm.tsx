@@ -9,6 +9,7 @@ import {
 import { CheckCircleIcon } from "@heroicons/react/24/solid";
 import { useAccount } from "../hooks/useAccount";
 import { useRouter } from "next/navigation";
+import { waitForJob } from "~~/utils/jobs";
 
 interface PaymentSuccessData {
   recipientAddress: string;
@@ -106,6 +107,8 @@ export const PaymentForm = () => {
             },
             body: JSON.stringify({
               amount_strk: amount * 2.54,
+              // One transfer per payment, even if this request is retried
+              idempotency_key: paymentIntent.id,
             }),
           });
 
@@ -113,12 +116,17 @@ export const PaymentForm = () => {
             throw new Error("Transfer failed");
           }
 
-          const transferData = await transferResponse.json();
+          let transferData = await transferResponse.json();
+          if (transferResponse.status === 202) {
+            transferData = await waitForJob(transferData.job_id);
+          }
           console.log("Transfer successful:", transferData);
           setShowSuccessModal(true);
         } catch (error) {
           console.error("Transfer error:", error);
-          setErrorMessage("Payment succeeded but token transfer failed");
+          setErrorMessage(
+            `Payment succeeded but token transfer failed: ${error instanceof Error ? error.message : "unknown error"}`
+          );
         }
       }
     } catch (error) {
@@ -0,0 +1,20 @@
+// The backend hands out a new account's private key only once, in the
+// /create-deploy response, so the browser keeps it for the gift page
+const GIFT_ACCOUNT_KEY = "giftAccount";
+
+export type GiftAccount = {
+  address: string;
+  private_key: string;
+};
+
+export const saveGiftAccount = (account: GiftAccount) => {
+  localStorage.setItem(
+    GIFT_ACCOUNT_KEY,
+    JSON.stringify({ address: account.address, private_key: account.private_key }),
+  );
+};
+
+export const loadGiftAccount = (): GiftAccount | null => {
+  const stored = localStorage.getItem(GIFT_ACCOUNT_KEY);
+  return stored ? (JSON.parse(stored) as GiftAccount) : null;
+};
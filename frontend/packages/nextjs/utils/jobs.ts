@@ -0,0 +1,31 @@
+// Write endpoints answer 202 with a job id when the job is still running
+// after a few seconds; the job itself says how it ended
+const JOB_POLL_INTERVAL_MS = 2000;
+const JOB_POLL_TIMEOUT_MS = 5 * 60 * 1000;
+
+export const waitForJob = async (jobId: string) => {
+  const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    const response = await fetch(`http://localhost:8000/jobs/${jobId}`, {
+      cache: "no-store",
+    });
+    if (!response.ok) {
+      throw new Error(`job status response status: ${response.status}`);
+    }
+    const job = await response.json();
+    if (job.status === "succeeded") {
+      return job.result;
+    }
+    if (job.status === "failed") {
+      throw new Error(job.error || "Request failed");
+    }
+    if (job.status === "interrupted") {
+      // Retrying could send it twice
+      throw new Error(
+        "Sending was interrupted and may have gone through; check the transaction history before trying again",
+      );
+    }
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
+  throw new Error("Still processing; check the transaction history later");
+};